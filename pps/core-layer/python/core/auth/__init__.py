@@ -1 +1,2 @@
 from .cognito import CognitoService
+from .tokens import TokenService, TokenType, tokens
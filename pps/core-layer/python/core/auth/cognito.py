@@ -2,9 +2,8 @@ import os
 from abc import ABC
 from typing import Dict, List
 
-import boto3
-
 from core import JSONResponse
+from core.aws.clients import clients
 from core.aws.errors import HTTPError
 from core.exceptions.invalid import InvalidException
 from core.utils import join_key
@@ -55,7 +54,6 @@ class User:
 
 class CognitoService(ABC):
     __user_pool_id__: str
-    _client: boto3.client = None
 
     @classmethod
     def get_client_id(cls):
@@ -63,9 +61,7 @@ class CognitoService(ABC):
 
     @classmethod
     def get_client(cls):
-        if cls._client is None:
-            cls._client = boto3.client('cognito-idp', region_name='us-west-2')
-        return cls._client
+        return clients.client('cognito-idp')
 
     @classmethod
     def get_user_by_email(cls, creator_email: str):
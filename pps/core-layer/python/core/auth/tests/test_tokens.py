@@ -0,0 +1,68 @@
+import json
+from datetime import timedelta
+
+import jwt
+import pytest
+
+from core.exceptions.invalid import InvalidException
+from ..tokens import TokenService, KeyRing
+
+OLD_KEY = {'kty': 'oct', 'use': 'sig', 'kid': 'old', 'k': 'b2xkLXNlY3JldC1rZXktbWF0ZXJpYWw', 'alg': 'HS256'}
+NEW_KEY = {'kty': 'oct', 'use': 'sig', 'kid': 'new', 'k': 'bmV3LXNlY3JldC1rZXktbWF0ZXJpYWw', 'alg': 'HS256'}
+
+
+def header(token: str) -> dict:
+    return json.loads(jwt.utils.b64decode(token.split('.')[0]))
+
+
+def test_encode_decode(tmp_path):
+    path = tmp_path / 'jwk.json'
+    path.write_text(json.dumps(OLD_KEY))
+    service = TokenService(str(path))
+
+    token = service.encode_task('u-sub', 'puberty::corporality::1.1')
+    assert header(token)['kid'] == 'old'
+    decoded = service.decode_task(token)
+    assert decoded['sub'] == 'u-sub' and decoded['objective'] == 'puberty::corporality::1.1'
+    assert decoded['exp'] - decoded['iat'] == 24 * 60 * 60
+
+    reward = service.decode_reward(service.encode_reward('u-sub', {'index': 3}, timedelta(hours=1)))
+    assert reward['index'] == 3 and reward['exp'] - reward['iat'] == 60 * 60
+
+    # the key file is read once
+    path.write_text('not json')
+    service.encode_task('u-sub', 'objective')
+
+    with pytest.raises(InvalidException):
+        service.decode_task(service.encode_reward('u-sub', {'index': 3}))
+    with pytest.raises(InvalidException):
+        service.decode(token[:-2])
+    with pytest.raises(InvalidException):
+        service.decode('garbage')
+
+
+def test_rotation():
+    service = TokenService()
+    service.configure(keys=KeyRing([OLD_KEY]))
+    old_token = service.encode_task('u-sub', 'objective')
+    legacy_token = jwt.JWT().encode({'sub': 'u-sub', 'objective': 'objective', 'iat': 1, 'exp': 2 ** 33},
+                                    jwt.jwk_from_dict(OLD_KEY))
+
+    service.configure(keys=KeyRing([OLD_KEY, NEW_KEY], active_kid='new'))
+    new_token = service.encode_task('u-sub', 'objective')
+    assert header(new_token)['kid'] == 'new'
+    assert service.decode_task(old_token)['objective'] == 'objective'
+    assert service.decode_task(new_token)['objective'] == 'objective'
+    with pytest.raises(InvalidException):
+        # tokens without key id are verified with the active key
+        service.decode_task(legacy_token)
+
+    service.configure(keys=KeyRing([NEW_KEY]))
+    with pytest.raises(InvalidException):
+        service.decode_task(old_token)
+
+    service.configure(keys=KeyRing([OLD_KEY]))
+    assert service.decode_task(legacy_token)['sub'] == 'u-sub'
+
+    with pytest.raises(ValueError):
+        KeyRing([OLD_KEY], active_kid='missing')
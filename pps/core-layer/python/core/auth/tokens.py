@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone, timedelta
+from enum import Enum
+from typing import Dict, List, Optional, Tuple, Any
+
+from core.exceptions.invalid import InvalidException
+from core.router.environment import ENVIRONMENT
+from core.utils.lazy import lazy_import
+
+jwt = lazy_import('jwt')
+
+__all__ = ['TokenType', 'KeyRing', 'TokenService', 'tokens']
+
+DEFAULT_JWK_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../services/jwk.json')
+DEFAULT_ALGORITHM = 'HS256'
+
+
+class TokenType(Enum):
+    TASK = 'TASK'
+    REWARD = 'REWARD'
+
+    @property
+    def duration(self) -> timedelta:
+        return timedelta(days=1) if self == TokenType.TASK else timedelta(days=7)
+
+
+class KeyRing:
+    """
+    Signing keys by key id. The key file holds a single JWK or a JWK set ({"keys": [...]}); tokens are signed with the
+    active key and verified with the key named by their kid header, so keys can be rotated by adding the new key to
+    the set and activating it while the old one still verifies the tokens it signed
+    """
+
+    def __init__(self, keys: List[dict], active_kid: str = None):
+        if len(keys) == 0:
+            raise ValueError("The key ring needs at least one key")
+        self._keys: Dict[Optional[str], Tuple[Any, str]] = {}
+        for key in keys:
+            self._keys[key.get('kid')] = (jwt.jwk_from_dict(key), key.get('alg', DEFAULT_ALGORITHM))
+        if active_kid is None:
+            active_kid = keys[0].get('kid')
+        if active_kid not in self._keys:
+            raise ValueError(f"Unknown active key id: {active_kid}")
+        self.active_kid = active_kid
+
+    @staticmethod
+    def from_file(path: str, active_kid: str = None) -> 'KeyRing':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return KeyRing(data['keys'] if 'keys' in data else [data], active_kid)
+
+    def signing_key(self) -> Tuple[Optional[str], Any, str]:
+        key, algorithm = self._keys[self.active_kid]
+        return self.active_kid, key, algorithm
+
+    def verifying_key(self, kid: Optional[str]) -> Tuple[Any, str]:
+        """
+        Key that verifies a token with the given kid header. Tokens signed before key ids were used have none and
+        are verified with the active key
+        """
+        if kid is None:
+            kid = self.active_kid
+        if kid not in self._keys:
+            raise InvalidException('Invalid token: unknown key')
+        return self._keys[kid]
+
+
+class TokenService:
+    """
+    Signs and verifies the task and reward tokens. The key ring is read once per container and the JWT instance is
+    reused by every call
+    """
+
+    def __init__(self, path: str = DEFAULT_JWK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys: Optional[KeyRing] = None
+        self._jwt = None
+
+    @property
+    def keys(self) -> KeyRing:
+        if self._keys is None:
+            with self._lock:
+                if self._keys is None:
+                    self._jwt = jwt.JWT()
+                    self._keys = KeyRing.from_file(self.path, ENVIRONMENT.token_signing_kid)
+        return self._keys
+
+    def configure(self, path: str = None, keys: KeyRing = None):
+        """
+        Use another key file, or an already built key ring, from the next token on
+        """
+        with self._lock:
+            if path is not None:
+                self.path = path
+            self._keys = keys
+            self._jwt = jwt.JWT()
+
+    def reload(self):
+        """
+        Read the key file again, to pick up rotated keys
+        """
+        with self._lock:
+            self._keys = None
+
+    def encode(self, token_type: TokenType, sub: str, claims: Dict[str, Any], duration: timedelta = None) -> str:
+        if duration is None:
+            duration = token_type.duration
+        kid, key, algorithm = self.keys.signing_key()
+        now = datetime.now(timezone.utc)
+        payload = {
+            'sub': sub,
+            'iat': jwt.utils.get_int_from_datetime(now),
+            'exp': jwt.utils.get_int_from_datetime(now + duration),
+            **claims
+        }
+        return self._jwt.encode(payload, key, alg=algorithm, optional_headers=None if kid is None else {'kid': kid})
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        try:
+            header = json.loads(jwt.utils.b64decode(token.split('.')[0]))
+        except (ValueError, AttributeError):
+            raise InvalidException('Invalid token: malformed header')
+        key, algorithm = self.keys.verifying_key(header.get('kid'))
+        try:
+            return self._jwt.decode(token, key, algorithms={algorithm})
+        except (jwt.exceptions.JWTDecodeError, ValueError) as e:
+            raise InvalidException(f'Invalid token: {e.args}')
+
+    def encode_task(self, sub: str, objective: str, duration: timedelta = None) -> str:
+        return self.encode(TokenType.TASK, sub, {'objective': objective}, duration)
+
+    def decode_task(self, token: str) -> Dict[str, Any]:
+        from schema import Schema, SchemaError
+        decoded = self.decode(token)
+        try:
+            Schema({
+                "sub": str,
+                "objective": str,
+                "exp": int,
+                "iat": int
+            }).validate(decoded)
+        except SchemaError:
+            raise InvalidException("The given task token is not valid")
+        return decoded
+
+    def encode_reward(self, sub: str, claims: Dict[str, Any], duration: timedelta = None) -> str:
+        return self.encode(TokenType.REWARD, sub, claims, duration)
+
+    def decode_reward(self, token: str) -> Dict[str, Any]:
+        return self.decode(token)
+
+
+tokens = TokenService()
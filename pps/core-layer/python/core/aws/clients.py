@@ -0,0 +1,123 @@
+import threading
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+
+from core.router.environment import ENVIRONMENT
+
+if TYPE_CHECKING:
+    import boto3
+    from botocore.config import Config
+
+__all__ = ['ClientRegistry', 'clients']
+
+_CacheKey = Tuple[str, str, Optional[str], Optional[str]]
+
+
+class ClientRegistry:
+    """
+    Lazily creates AWS clients and resources from a single session and keeps them for the lifetime of the
+    container, so warm invocations reuse their connection pools instead of opening new TCP/TLS connections
+    """
+
+    def __init__(self, max_pool_connections: int = None, connect_timeout: float = None,
+                 read_timeout: float = None, max_attempts: int = None):
+        self._lock = threading.RLock()
+        self._session: Optional['boto3.session.Session'] = None
+        self._cache: Dict[_CacheKey, object] = {}
+        self._options = {
+            'max_pool_connections': max_pool_connections,
+            'connect_timeout': connect_timeout,
+            'read_timeout': read_timeout,
+            'max_attempts': max_attempts
+        }
+        self._config: Optional['Config'] = None
+
+    def configure(self, **options):
+        """
+        Change the connection options of the clients created from now on
+        """
+        with self._lock:
+            self._options.update(options)
+            self._config = None
+
+    @property
+    def config(self) -> 'Config':
+        with self._lock:
+            if self._config is None:
+                self._config = self._build_config()
+            return self._config
+
+    def _option(self, name: str, default):
+        value = self._options.get(name)
+        return default if value is None else value
+
+    def _build_config(self) -> 'Config':
+        from botocore.config import Config
+
+        arguments = {
+            'max_pool_connections': self._option('max_pool_connections', ENVIRONMENT.aws_max_pool_connections),
+            'connect_timeout': self._option('connect_timeout', ENVIRONMENT.aws_connect_timeout),
+            'read_timeout': self._option('read_timeout', ENVIRONMENT.aws_read_timeout),
+            'retries': {'total_max_attempts': self._option('max_attempts', ENVIRONMENT.aws_max_attempts),
+                        'mode': 'standard'}
+        }
+        # socket keep-alive is only available on newer botocore versions
+        if 'tcp_keepalive' in Config.OPTION_DEFAULTS:
+            arguments['tcp_keepalive'] = True
+        return Config(**arguments)
+
+    @property
+    def session(self) -> 'boto3.session.Session':
+        with self._lock:
+            if self._session is None:
+                import boto3
+
+                self._session = boto3.session.Session()
+            return self._session
+
+    def create_client(self, service: str, region_name: str = None, endpoint_url: str = None):
+        """
+        Create a new client that isn't shared, from the registry's session and configuration
+        """
+        with self._lock:
+            return self.session.client(service, region_name=region_name or ENVIRONMENT.aws_region,
+                                       endpoint_url=endpoint_url, config=self.config)
+
+    def create_resource(self, service: str, region_name: str = None, endpoint_url: str = None):
+        """
+        Create a new resource that isn't shared, from the registry's session and configuration
+        """
+        with self._lock:
+            return self.session.resource(service, region_name=region_name or ENVIRONMENT.aws_region,
+                                         endpoint_url=endpoint_url, config=self.config)
+
+    def client(self, service: str, region_name: str = None, endpoint_url: str = None):
+        """
+        Shared client of a service, created on first use
+        """
+        key = ('client', service, region_name, endpoint_url)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = self.create_client(service, region_name, endpoint_url)
+            return self._cache[key]
+
+    def resource(self, service: str, region_name: str = None, endpoint_url: str = None):
+        """
+        Shared resource of a service, created on first use
+        """
+        key = ('resource', service, region_name, endpoint_url)
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = self.create_resource(service, region_name, endpoint_url)
+            return self._cache[key]
+
+    def clear(self):
+        """
+        Forget every client, resource and the session
+        """
+        with self._lock:
+            self._cache = {}
+            self._session = None
+            self._config = None
+
+
+clients = ClientRegistry()
@@ -7,7 +7,9 @@ from typing import Union, List, Optional
 from core.exceptions.invalid import InvalidException
 from core.exceptions.unauthorized import UnauthorizedException
 from core.router.environment import ENVIRONMENT
-from jwt import jwt
+from core.utils.lazy import lazy_import
+
+jwt = lazy_import('jwt')
 
 
 class Authorizer:
@@ -5,9 +5,13 @@ from .errors import HTTPError, ERROR_CODES
 
 
 class JSONResponse:
-    def __init__(self, body: dict, status: int = 200):
+    def __init__(self, body: dict, status: int = 200, serialized_body: str = None):
+        """
+        serialized_body is the body already serialized as JSON, sent as it is instead of serializing body again
+        """
         self.body = body
         self.status = status
+        self.serialized_body = serialized_body
 
     @staticmethod
     def clean_for_json(item):
@@ -29,7 +33,8 @@ class JSONResponse:
                 "Access-Control-Allow-Origin": "*",
                 "Access-Control-Allow-Credentials": True
             },
-            "body": json.dumps(JSONResponse.clean_for_json(self.body))
+            "body": self.serialized_body if self.serialized_body is not None else json.dumps(
+                JSONResponse.clean_for_json(self.body))
         }
 
     @staticmethod
@@ -0,0 +1,27 @@
+from ..clients import ClientRegistry
+
+
+def test_clients_are_shared():
+    registry = ClientRegistry(max_pool_connections=4, connect_timeout=1, read_timeout=3, max_attempts=2)
+    client = registry.client('dynamodb')
+    assert registry.client('dynamodb') is client
+    assert registry.client('dynamodb', endpoint_url='http://localhost:8000') is not client
+    assert registry.create_client('dynamodb') is not client
+    assert registry.resource('s3') is registry.resource('s3')
+
+    config = client.meta.config
+    assert config.max_pool_connections == 4
+    assert config.connect_timeout == 1
+    assert config.read_timeout == 3
+    assert config.retries['total_max_attempts'] == 2
+
+
+def test_configure():
+    registry = ClientRegistry(max_pool_connections=4)
+    assert registry.config.max_pool_connections == 4
+    registry.configure(max_pool_connections=8)
+    assert registry.client('cognito-idp').meta.config.max_pool_connections == 8
+
+    registry.clear()
+    assert registry.config.max_pool_connections == 8
+    assert registry.client('cognito-idp') is not None
@@ -1,2 +1,5 @@
 from .db import db
 from .service import ModelService, ModelIndex
+from .transaction import transact_write, TransactionCanceledError
+from .fanout import FanOut, gather
+from .buffer import write_buffer, WriteBufferError
@@ -0,0 +1,187 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Iterator, Callable, Any, Sequence, Dict
+
+from .cache import identity_map
+from .throttle import READ, WRITE, rate_limiter
+
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+
+DEFAULT_MAX_RETRIES = 8
+DEFAULT_BASE_DELAY = 0.05
+DEFAULT_MAX_DELAY = 2.0
+
+
+class UnprocessedKeysError(Exception):
+    def __init__(self, table_name: str, keys: List[dict]):
+        super().__init__(f"{len(keys)} keys from table {table_name} could not be read")
+        self.table_name = table_name
+        self.keys = keys
+
+
+class UnprocessedItemsError(Exception):
+    def __init__(self, table_name: str, requests: List[dict]):
+        super().__init__(f"{len(requests)} write requests to table {table_name} could not be processed")
+        self.table_name = table_name
+        self.requests = requests
+
+
+class BatchWriteStats:
+    def __init__(self, items: int = 0, requests: int = 0, retries: int = 0):
+        self.items = items
+        self.requests = requests
+        self.retries = retries
+
+    def __add__(self, other):
+        return BatchWriteStats(items=self.items + other.items, requests=self.requests + other.requests,
+                               retries=self.retries + other.retries)
+
+    def as_dict(self):
+        return {
+            "items": self.items,
+            "requests": self.requests,
+            "retries": self.retries
+        }
+
+
+def chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def backoff_delay(attempt: int, base: float = DEFAULT_BASE_DELAY, cap: float = DEFAULT_MAX_DELAY) -> float:
+    """
+    Exponential backoff with full jitter: a random delay between zero and base * 2^attempt, capped
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def run_chunks(fn: Callable[[Sequence], Any], items: Sequence, size: int, max_workers: int = None) -> List[Any]:
+    """
+    Split the items in chunks and apply fn to each of them, concurrently when there is more than one worker.
+    Results are returned in chunk order
+    """
+    item_chunks = list(chunks(items, size))
+    if max_workers is None:
+        max_workers = len(item_chunks)
+    if max_workers <= 1 or len(item_chunks) <= 1:
+        return [fn(chunk) for chunk in item_chunks]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(item_chunks))) as executor:
+        return list(executor.map(fn, item_chunks))
+
+
+def batch_get_chunk(client, table_name: str, keys: Sequence[dict], projection: str = None,
+                    attribute_names: dict = None, max_retries: int = DEFAULT_MAX_RETRIES) -> List[dict]:
+    """
+    Get up to BATCH_GET_LIMIT items from a table, retrying the unprocessed keys with a jittered backoff
+    """
+    request = {'Keys': list(keys)}
+    if projection is not None:
+        request['ProjectionExpression'] = projection
+    if attribute_names is not None:
+        request['ExpressionAttributeNames'] = attribute_names
+
+    items = []
+    attempt = 0
+    while True:
+        # eventually consistent reads of items up to 4KB
+        with rate_limiter.paced(table_name, READ, units=0.5 * len(request['Keys'])) as pace:
+            response = client.batch_get_item(RequestItems={table_name: request})
+            pace.consumed(response.get('ConsumedCapacity'))
+            unprocessed = response.get('UnprocessedKeys', {}).get(table_name)
+            if unprocessed is not None and len(unprocessed.get('Keys', [])) > 0:
+                pace.throttled()
+        items += response.get('Responses', {}).get(table_name, [])
+        if unprocessed is None or len(unprocessed.get('Keys', [])) == 0:
+            return items
+        if attempt >= max_retries:
+            raise UnprocessedKeysError(table_name, unprocessed['Keys'])
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+        request = unprocessed
+
+
+def batch_write_chunk(client, table_name: str, requests: Sequence[dict],
+                      max_retries: int = DEFAULT_MAX_RETRIES) -> BatchWriteStats:
+    """
+    Write up to BATCH_WRITE_LIMIT put or delete requests to a table, resubmitting the unprocessed items with a
+    jittered exponential backoff
+    """
+    stats = BatchWriteStats(items=len(requests))
+    pending = list(requests)
+    while True:
+        # writes of items up to 1KB
+        with rate_limiter.paced(table_name, WRITE, units=len(pending)) as pace:
+            response = client.batch_write_item(RequestItems={table_name: pending})
+            pace.consumed(response.get('ConsumedCapacity'))
+            pending = response.get('UnprocessedItems', {}).get(table_name, [])
+            if len(pending) > 0:
+                pace.throttled()
+        stats.requests += 1
+        if len(pending) == 0:
+            return stats
+        if stats.retries >= max_retries:
+            raise UnprocessedItemsError(table_name, pending)
+        time.sleep(backoff_delay(stats.retries))
+        stats.retries += 1
+
+
+class BatchWriter:
+    """
+    Buffers put and delete requests to a table and writes them with batch_write_item in chunks of
+    BATCH_WRITE_LIMIT, submitting up to max_workers chunks in parallel. Requests on the same key are collapsed into
+    the last one, as a batch can't touch the same item twice
+    """
+
+    def __init__(self, client, table_name: str, key_names: Sequence[str], max_workers: int = 1,
+                 max_retries: int = DEFAULT_MAX_RETRIES):
+        self.client = client
+        self.table_name = table_name
+        self.key_names = [name for name in key_names if name is not None]
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.stats = BatchWriteStats()
+        self._requests: Dict[tuple, dict] = {}
+
+    def _key_tuple(self, item: dict) -> tuple:
+        return tuple(item[name] for name in self.key_names)
+
+    def _add(self, key: tuple, request: dict):
+        self._requests.pop(key, None)
+        self._requests[key] = request
+        if len(self._requests) >= BATCH_WRITE_LIMIT * self.max_workers:
+            self.flush()
+
+    def put(self, item: dict):
+        identity_map.invalidate_item(self.table_name, item)
+        self._add(self._key_tuple(item), {'PutRequest': {'Item': item}})
+
+    def delete(self, key: dict):
+        identity_map.invalidate(self.table_name, key)
+        self._add(self._key_tuple(key), {'DeleteRequest': {'Key': key}})
+
+    def flush(self) -> BatchWriteStats:
+        """
+        Write all the buffered requests, returning the stats of this flush
+        """
+        requests = list(self._requests.values())
+        self._requests = {}
+        stats = BatchWriteStats()
+        for chunk_stats in run_chunks(
+                lambda chunk: batch_write_chunk(self.client, self.table_name, chunk, max_retries=self.max_retries),
+                requests, BATCH_WRITE_LIMIT, max_workers=self.max_workers):
+            stats += chunk_stats
+        self.stats += stats
+        return stats
+
+    def __len__(self):
+        return len(self._requests)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,83 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+from .batch import BatchWriter, BatchWriteStats, DEFAULT_MAX_RETRIES
+
+__all__ = ['WriteBuffer', 'WriteBufferError', 'write_buffer']
+
+
+class WriteBufferError(Exception):
+    def __init__(self, failures: List[Tuple[str, Exception]]):
+        tables = ', '.join(table_name for table_name, _ in failures)
+        super().__init__(f"Deferred writes to {tables} could not be flushed")
+        self.failures = failures
+
+
+class WriteBuffer:
+    """
+    Request-scoped buffer of non-conditional puts, for writes that nothing reads back during the request (like
+    logs). Buffered puts are written with batch_write_item when the buffer is flushed, which the Router does when
+    the handler succeeds, and every failure is raised together
+    """
+
+    def __init__(self, max_workers: int = 1, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self._writers: Dict[str, BatchWriter] = {}
+        self._lock = threading.Lock()
+        self._depth = 0
+
+    @property
+    def active(self) -> bool:
+        return self._depth > 0
+
+    @contextmanager
+    def scope(self):
+        """
+        Buffer puts until the outermost scope ends. Writes that weren't flushed by then are discarded
+        """
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._writers = {}
+
+    def put(self, client, table_name: str, key_names: Sequence[str], item: dict):
+        if not self.active:
+            raise RuntimeError("Writes can only be buffered inside a scope")
+        with self._lock:
+            writer = self._writers.get(table_name)
+            if writer is None:
+                writer = BatchWriter(client, table_name, key_names, max_workers=self.max_workers,
+                                     max_retries=self.max_retries)
+                self._writers[table_name] = writer
+            writer.put(item)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(writer) for writer in self._writers.values())
+
+    def flush(self) -> BatchWriteStats:
+        """
+        Write every buffered put, raising a WriteBufferError with the tables that failed after trying all of them
+        """
+        with self._lock:
+            writers = list(self._writers.values())
+        stats = BatchWriteStats()
+        failures = []
+        for writer in writers:
+            try:
+                stats += writer.flush()
+            except Exception as e:
+                failures.append((writer.table_name, e))
+        if len(failures) > 0:
+            raise WriteBufferError(failures)
+        return stats
+
+
+write_buffer = WriteBuffer()
@@ -0,0 +1,108 @@
+import copy
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple, Optional, List, FrozenSet
+
+from .types import DynamoDBKey
+
+__all__ = ['IdentityMap', 'identity_map']
+
+_CacheKey = Tuple[str, tuple]
+
+
+class IdentityMap:
+    """
+    Request-scoped read-through cache of GetItem results. Items are cached by table, key and projected attributes,
+    so a read can be served by a previous read of the same item that projected a superset of its attributes.
+    Writes through the db layer invalidate the written keys, and nothing is cached outside of a scope
+    """
+
+    def __init__(self):
+        self._items: Dict[_CacheKey, Tuple[Optional[FrozenSet[str]], Optional[dict]]] = {}
+        self._lock = threading.Lock()
+        self._depth = 0
+
+    @property
+    def active(self) -> bool:
+        return self._depth > 0
+
+    @contextmanager
+    def scope(self):
+        with self._lock:
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._items = {}
+
+    def clear(self):
+        with self._lock:
+            self._items = {}
+
+    @staticmethod
+    def _cache_key(table_name: str, key: DynamoDBKey) -> _CacheKey:
+        return table_name, tuple(sorted(key.items()))
+
+    @staticmethod
+    def _cacheable(attributes: Optional[List[str]]) -> bool:
+        # nested projections are not tracked
+        return attributes is None or all('.' not in attr for attr in attributes)
+
+    def lookup(self, table_name: str, key: DynamoDBKey, attributes: List[str] = None) -> Tuple[bool, Optional[dict]]:
+        """
+        Look for a cached item, returning whether it was found and a copy of the item projected to the given
+        attributes
+        """
+        if not self.active or not self._cacheable(attributes):
+            return False, None
+        with self._lock:
+            entry = self._items.get(self._cache_key(table_name, key))
+        if entry is None:
+            return False, None
+        cached_attributes, item = entry
+        if item is None:
+            return True, None
+        if cached_attributes is not None and (attributes is None or not cached_attributes.issuperset(attributes)):
+            return False, None
+        if attributes is not None:
+            item = {attr: value for attr, value in item.items() if attr in attributes}
+        return True, copy.deepcopy(item)
+
+    def store(self, table_name: str, key: DynamoDBKey, item: Optional[dict], attributes: List[str] = None):
+        if not self.active or not self._cacheable(attributes):
+            return
+        cache_key = self._cache_key(table_name, key)
+        attributes = frozenset(attributes) if attributes is not None and item is not None else None
+        item = copy.deepcopy(item)
+        with self._lock:
+            entry = self._items.get(cache_key)
+            if entry is not None and item is not None and entry[1] is not None and attributes is not None:
+                # merge projections read after the same version of the item
+                cached_attributes, cached_item = entry
+                attributes = None if cached_attributes is None else attributes | cached_attributes
+                item = {**cached_item, **item}
+            self._items[cache_key] = (attributes, item)
+
+    def invalidate(self, table_name: str, key: DynamoDBKey):
+        if not self.active:
+            return
+        with self._lock:
+            self._items.pop(self._cache_key(table_name, key), None)
+
+    def invalidate_item(self, table_name: str, item: dict):
+        """
+        Invalidate the cached entries whose key matches a written item, for writes that don't know the key names
+        """
+        if not self.active:
+            return
+        with self._lock:
+            for cache_key in list(self._items.keys()):
+                entry_table, key = cache_key
+                if entry_table == table_name and all(k in item and item[k] == v for k, v in key):
+                    del self._items[cache_key]
+
+
+identity_map = IdentityMap()
@@ -1,24 +1,33 @@
-from typing import Dict
+import threading
+import time
+from typing import Dict, List, Union, Optional
+
+READ_OPERATIONS = ('GetItem', 'Query', 'Scan', 'BatchGetItem', 'TransactGetItems')
+WRITE_OPERATIONS = ('PutItem', 'UpdateItem', 'DeleteItem', 'BatchWriteItem', 'TransactWriteItems')
+
+METRICS_NAMESPACE = 'PPS'
 
 
 class CapacityUnits:
-    def __init__(self, all_: float, read: float, write: float):
+    def __init__(self, all_: float, read: Optional[float], write: Optional[float]):
         self.all = all_
         self.read = read
         self.write = write
 
     @staticmethod
-    def from_dict(d: Dict):
-        return CapacityUnits(d['CapacityUnits'], d['ReadCapacityUnits'], d['WriteCapacityUnits'])
+    def from_dict(d: Optional[Dict]):
+        if d is None:
+            return None
+        return CapacityUnits(d.get('CapacityUnits', 0.0), d.get('ReadCapacityUnits'), d.get('WriteCapacityUnits'))
 
 
 class ConsumedCapacity:
     def __init__(self,
                  table_name: str,
                  total: CapacityUnits,
-                 table: CapacityUnits,
-                 local_secondary_indexes: CapacityUnits,
-                 global_secondary_indexes: CapacityUnits,
+                 table: Optional[CapacityUnits],
+                 local_secondary_indexes: Optional[CapacityUnits],
+                 global_secondary_indexes: Optional[CapacityUnits],
                  ):
         self.table_name = table_name
         self.total = total
@@ -27,13 +36,111 @@ class ConsumedCapacity:
         self.global_secondary_indexes = global_secondary_indexes
 
     @staticmethod
-    def from_dict(d: Dict):
+    def from_dict(d: Optional[Dict]):
         if d is None:
             return None
         return ConsumedCapacity(
-            table_name=d['TableName'],
+            table_name=d.get('TableName'),
             total=CapacityUnits.from_dict(d),
             table=CapacityUnits.from_dict(d.get('Table')),
             local_secondary_indexes=CapacityUnits.from_dict(d.get('LocalSecondaryIndexes')),
             global_secondary_indexes=CapacityUnits.from_dict(d.get('GlobalSecondaryIndexes'))
         )
+
+
+class CapacityTracker:
+    """
+    Adds up the read and write capacity units consumed by the DynamoDB requests of an invocation, per table
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Dict[str, Dict[str, float]] = {}
+        self.requests = 0
+
+    def reset(self):
+        with self._lock:
+            self._tables = {}
+            self.requests = 0
+
+    def record(self, operation: str, consumed: Union[Dict, List[Dict], None]):
+        kind = 'read' if operation in READ_OPERATIONS else 'write'
+        if consumed is None:
+            consumed = []
+        elif isinstance(consumed, dict):
+            consumed = [consumed]
+        with self._lock:
+            self.requests += 1
+            for table_consumed in consumed:
+                capacity = ConsumedCapacity.from_dict(table_consumed)
+                table = self._tables.setdefault(capacity.table_name, {'read': 0.0, 'write': 0.0})
+                table[kind] += float(capacity.total.all)
+
+    @property
+    def read(self) -> float:
+        with self._lock:
+            return sum(table['read'] for table in self._tables.values())
+
+    @property
+    def write(self) -> float:
+        with self._lock:
+            return sum(table['write'] for table in self._tables.values())
+
+    def summary(self) -> dict:
+        with self._lock:
+            tables = {name: dict(units) for name, units in self._tables.items()}
+            requests = self.requests
+        return {
+            'requests': requests,
+            'read': sum(table['read'] for table in tables.values()),
+            'write': sum(table['write'] for table in tables.values()),
+            'tables': tables
+        }
+
+    def metrics(self, route: str) -> dict:
+        """
+        Summary of the consumed capacity as a CloudWatch embedded metric format log line, with the route as
+        dimension
+        """
+        summary = self.summary()
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Route']],
+                    'Metrics': [
+                        {'Name': 'ReadCapacityUnits', 'Unit': 'Count'},
+                        {'Name': 'WriteCapacityUnits', 'Unit': 'Count'},
+                        {'Name': 'DynamoDBRequests', 'Unit': 'Count'}
+                    ]
+                }]
+            },
+            'Route': route,
+            'ReadCapacityUnits': summary['read'],
+            'WriteCapacityUnits': summary['write'],
+            'DynamoDBRequests': summary['requests'],
+            'Tables': summary['tables']
+        }
+
+
+capacity_tracker = CapacityTracker()
+
+
+def _request_consumed_capacity(params: dict, **_):
+    params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _record_consumed_capacity(parsed: dict, model, **_):
+    capacity_tracker.record(model.name, parsed.get('ConsumedCapacity'))
+
+
+def track_consumed_capacity(client):
+    """
+    Make every read and write request of a DynamoDB client return its consumed capacity and add it to the tracker
+    """
+    for operation in READ_OPERATIONS + WRITE_OPERATIONS:
+        client.meta.events.register(f'before-parameter-build.dynamodb.{operation}', _request_consumed_capacity,
+                                    unique_id=f'pps-request-capacity-{operation}')
+        client.meta.events.register(f'after-call.dynamodb.{operation}', _record_consumed_capacity,
+                                    unique_id=f'pps-record-capacity-{operation}')
@@ -1,17 +1,96 @@
-import boto3
+import threading
+from typing import Optional
 
-__all__ = ['db']
+__all__ = ['db', 'Database', 'BACKEND_DYNAMODB', 'BACKEND_MEMORY']
 
+from .capacity import track_consumed_capacity
 from .model import create_model, AbstractModel
+from core.aws.clients import clients
 from core.router.environment import ENVIRONMENT
 
+BACKEND_DYNAMODB = 'dynamodb'
+BACKEND_MEMORY = 'memory'
+
 
 class Database:
-    def __init__(self):
+    def __init__(self, backend: str = None):
+        """
+        Connect to DynamoDB, or to in-memory tables created from the template with the memory backend. The backend
+        is read from the DB_BACKEND environment variable by default. Clients are created on first use
+        """
+        self.backend = ENVIRONMENT.db_backend if backend is None else backend
+        if self.backend not in (BACKEND_DYNAMODB, BACKEND_MEMORY):
+            raise ValueError(f"Unknown database backend: {self.backend}")
+        self._lock = threading.RLock()
+        self._db = None
+        self._client = None
+        self._engine = None
+        self.Model: AbstractModel = create_model(self)
+
+    @property
+    def in_memory(self) -> bool:
+        return self.backend == BACKEND_MEMORY
+
+    @property
+    def endpoint_url(self) -> Optional[str]:
+        if self.in_memory:
+            return None
+        if ENVIRONMENT.db_endpoint_url is not None:
+            return ENVIRONMENT.db_endpoint_url
         # noinspection HttpUrlsUsage
-        self._db = boto3.resource('dynamodb', region_name=None if ENVIRONMENT.is_local else ENVIRONMENT.aws_region,
-                                  endpoint_url='http://dynamodb-local:8000' if ENVIRONMENT.is_local else None)
-        self.Model: AbstractModel = create_model(self._db)
+        return 'http://dynamodb-local:8000' if ENVIRONMENT.is_local else None
+
+    @property
+    def engine(self):
+        """
+        Tables of the memory backend, None when connected to DynamoDB
+        """
+        with self._lock:
+            if self._engine is None and self.in_memory:
+                from .memory import MemoryEngine, load_table_definitions
+                self._engine = MemoryEngine(load_table_definitions())
+            return self._engine
+
+    def _prepare(self, client):
+        if self.in_memory:
+            from .memory import attach
+            attach(client, self.engine)
+        track_consumed_capacity(client)
+
+    @property
+    def resource(self):
+        with self._lock:
+            if self._db is None:
+                if self.in_memory:
+                    # the memory backend hooks its clients, so they can't be shared with the registry
+                    resource = clients.create_resource('dynamodb')
+                else:
+                    resource = clients.resource('dynamodb', endpoint_url=self.endpoint_url)
+                self._prepare(resource.meta.client)
+                self._db = resource
+            return self._db
+
+    @property
+    def wire_client(self):
+        """
+        Plain client, without the resource's Decimal (de)serialization hooks, for the fast read path
+        """
+        with self._lock:
+            if self._client is None:
+                if self.in_memory:
+                    client = clients.create_client('dynamodb')
+                else:
+                    client = clients.client('dynamodb', endpoint_url=self.endpoint_url)
+                self._prepare(client)
+                self._client = client
+            return self._client
+
+    @property
+    def client(self):
+        """
+        Client of the resource, (de)serializing native values
+        """
+        return self.resource.meta.client
 
 
 db = Database()
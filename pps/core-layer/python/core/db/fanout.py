@@ -0,0 +1,118 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_EXCEPTION, wait, as_completed
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+__all__ = ['DEFAULT_MAX_IN_FLIGHT', 'FanOut', 'IndexFanOut', 'gather']
+
+# kept below the default size of the clients' connection pools, so requests don't wait for a connection
+DEFAULT_MAX_IN_FLIGHT = 16
+
+
+class FanOut:
+    """
+    Runs independent db calls of a request concurrently on a thread pool, with at most max_in_flight of them running
+    at once. The identity map and the capacity tracker are shared by the workers, so calls behave as they would
+    sequentially, and the models send their requests through the thread-safe clients instead of the table resources.
+    Use it as a context manager, leaving it waits for every submitted call
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: List[Future] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown(cancel=exc_type is not None)
+
+    def shutdown(self, cancel: bool = False):
+        if self._executor is not None:
+            if cancel:
+                # ThreadPoolExecutor.shutdown only takes cancel_futures from Python 3.9 on, and Lambdas run 3.8
+                for future in self._futures:
+                    future.cancel()
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._futures = []
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='fanout')
+        future = self._executor.submit(fn, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable) -> Iterator:
+        """
+        Apply fn to every item concurrently, yielding the results in the order of the items
+        """
+        futures = [self.submit(fn, item) for item in items]
+        for future in futures:
+            yield future.result()
+
+    def completed(self, fn: Callable[[Any], Any], items: Iterable) -> Iterator[Tuple[Any, Any]]:
+        """
+        Apply fn to every item concurrently, yielding (item, result) pairs as soon as each call finishes, so results
+        can be consumed while the slower calls are still running
+        """
+        futures = {self.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def index(self, interface) -> 'IndexFanOut':
+        """
+        The query/get/create/update/delete surface of a ModelIndex or model, submitting each call to this fan-out
+        """
+        return IndexFanOut(interface, self)
+
+
+class IndexFanOut:
+    """
+    Wraps a ModelIndex (or model) so that its data access methods run on a FanOut and return futures
+    """
+    METHODS = ('query', 'get', 'batch_get', 'create', 'update', 'delete')
+
+    def __init__(self, interface, fanout: FanOut):
+        self._interface = interface
+        self._fanout = fanout
+
+    def __getattr__(self, name: str) -> Callable[..., Future]:
+        if name not in IndexFanOut.METHODS:
+            raise AttributeError(f"{name} can't be fanned out")
+        return functools.partial(self._fanout.submit, getattr(self._interface, name))
+
+
+def gather(*calls: Callable[[], Any], max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+           return_exceptions: bool = False) -> List[Any]:
+    """
+    Run argument-less callables concurrently, with at most max_in_flight running at once, and return their results
+    in order. The first error is raised once it happens, cancelling the calls that didn't start, unless
+    return_exceptions is set, in which case errors are returned in place of their results
+    """
+    if len(calls) == 0:
+        return []
+    if max_in_flight <= 1 or len(calls) == 1:
+        results = []
+        for call in calls:
+            try:
+                results.append(call())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    with FanOut(min(max_in_flight, len(calls))) as fanout:
+        futures = [fanout.submit(call) for call in calls]
+        if not return_exceptions:
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = [future for future in futures if future in done and future.exception() is not None]
+            if len(failed) > 0:
+                for future in futures:
+                    future.cancel()
+                raise failed[0].exception()
+        return [future.exception() if future.exception() is not None else future.result() for future in futures]
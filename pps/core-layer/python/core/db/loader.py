@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Optional
+
+from .cache import identity_map
+from .results import GetResult
+
+
+class Deferred:
+    """
+    An item requested to a Loader, fetched together with every other queued item the first time one of them is
+    accessed
+    """
+
+    def __init__(self, loader, key: tuple):
+        self._loader = loader
+        self.key = key
+        self.resolved = False
+        self._item: Optional[dict] = None
+
+    def _resolve(self, item: Optional[dict]):
+        self._item = item
+        self.resolved = True
+
+    @property
+    def item(self) -> Optional[dict]:
+        if not self.resolved:
+            self._loader.dispatch()
+        return self._item
+
+    def result(self) -> GetResult:
+        return GetResult.from_item(self.item)
+
+
+class Loader:
+    """
+    Coalesces independent point reads into batch_get calls: load() queues a key and returns a Deferred item, and all
+    the queued keys are fetched with as few BatchGetItem requests as possible when any of them is first needed
+    """
+
+    def __init__(self, interface, attributes: List[str] = None, max_workers: int = None):
+        self.interface = interface
+        self.attributes = attributes
+        self.max_workers = max_workers
+        self._deferred: Dict[tuple, Deferred] = {}
+        self._queue: List[Deferred] = []
+
+    def load(self, partition_key, sort_key=None) -> Deferred:
+        key = (partition_key,) if sort_key is None else (partition_key, sort_key)
+        deferred = self._deferred.get(key)
+        if deferred is not None:
+            return deferred
+        deferred = Deferred(self, key)
+        self._deferred[key] = deferred
+
+        table_name = self.interface.table_name
+        found, item = identity_map.lookup(table_name, self.interface.generate_key(*key), self.attributes)
+        if found:
+            deferred._resolve(item)
+        else:
+            self._queue.append(deferred)
+        return deferred
+
+    def load_many(self, keys: List[Any]) -> List[Deferred]:
+        return [self.load(*key) if isinstance(key, tuple) else self.load(key) for key in keys]
+
+    def dispatch(self):
+        """
+        Fetch every queued item
+        """
+        queue, self._queue = self._queue, []
+        if len(queue) == 0:
+            return
+        try:
+            items = self.interface.batch_get([deferred.key for deferred in queue], attributes=self.attributes,
+                                             max_workers=self.max_workers)
+        except Exception:
+            self._queue = queue + self._queue
+            raise
+        table_name = self.interface.table_name
+        for deferred, item in zip(queue, items):
+            identity_map.store(table_name, self.interface.generate_key(*deferred.key), item, self.attributes)
+            deferred._resolve(item)
+
+    def clear(self):
+        self._deferred = {}
+        self._queue = []
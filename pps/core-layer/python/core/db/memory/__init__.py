@@ -0,0 +1,3 @@
+from .backend import attach
+from .engine import MemoryEngine, MemoryTable
+from .template import load_table_definitions
@@ -0,0 +1,31 @@
+import json
+import uuid
+
+from botocore.awsrequest import AWSResponse
+
+from .engine import MemoryEngine
+from .errors import MemoryClientError
+
+__all__ = ['attach']
+
+
+def attach(client, engine: MemoryEngine):
+    """
+    Answer every DynamoDB request of a botocore client with an in-memory engine instead of sending it. The requests
+    are still built, serialized and parsed by botocore, so boto3 resources and every client event hook work as usual
+    """
+
+    def answer(model, params, **_):
+        body = params.get('body') or b'{}'
+        request_id = str(uuid.uuid4())
+        try:
+            parsed = engine.execute(model.name, json.loads(body))
+            status = 200
+        except MemoryClientError as e:
+            parsed = {'Error': {'Code': e.code, 'Message': e.message}, 'message': e.message, **e.fields}
+            status = 400
+        parsed['ResponseMetadata'] = {'RequestId': request_id, 'HTTPStatusCode': status, 'HTTPHeaders': {},
+                                      'RetryAttempts': 0}
+        return AWSResponse(params.get('url'), status, {}, None), parsed
+
+    client.meta.events.register('before-call.dynamodb', answer, unique_id='pps-memory-backend')
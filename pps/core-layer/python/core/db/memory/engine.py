@@ -0,0 +1,650 @@
+import bisect
+import copy
+import math
+import threading
+import zlib
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple, Iterator
+
+from .errors import ValidationError, ResourceNotFoundError, ConditionalCheckFailedError, TransactionCanceledError
+from .expressions import parse_condition, parse_update, parse_projection, evaluate_condition, apply_update, \
+    project, Path
+
+__all__ = ['MemoryTable', 'MemoryEngine', 'item_size']
+
+PAGE_SIZE_LIMIT = 1024 * 1024
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+TRANSACT_LIMIT = 100
+
+Item = Dict[str, Dict[str, Any]]
+
+
+def _value_size(value: Dict[str, Any]) -> int:
+    (value_type, data), = value.items()
+    if value_type in ('S', 'B'):
+        return len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+    if value_type == 'N':
+        return (len(data.lstrip('-').replace('.', '')) + 1) // 2 + 1
+    if value_type in ('BOOL', 'NULL'):
+        return 1
+    if value_type in ('SS', 'BS'):
+        return sum(_value_size({value_type[0]: element}) for element in data)
+    if value_type == 'NS':
+        return sum(_value_size({'N': element}) for element in data)
+    if value_type == 'L':
+        return 3 + sum(1 + _value_size(element) for element in data)
+    if value_type == 'M':
+        return 3 + sum(1 + len(name.encode('utf-8')) + _value_size(element) for name, element in data.items())
+    return 0
+
+
+def item_size(item: Optional[Item]) -> int:
+    """
+    Approximate size of an item as DynamoDB accounts it, in bytes
+    """
+    if item is None:
+        return 0
+    return sum(len(name.encode('utf-8')) + _value_size(value) for name, value in item.items())
+
+
+def _read_units(size: int, consistent: bool = False) -> float:
+    return max(1, math.ceil(size / 4096)) * (1.0 if consistent else 0.5)
+
+
+def _write_units(*sizes: int) -> float:
+    return float(max(1, math.ceil(max(sizes) / 1024)))
+
+
+class _Partition:
+    """
+    Items of a partition, kept ordered by their sort key
+    """
+
+    def __init__(self):
+        self.keys: List[Any] = []
+        self.values: Dict[Any, Any] = {}
+
+    def put(self, key, value):
+        if key not in self.values:
+            if key is None:
+                # tables without a sort key hold a single item per partition
+                self.keys.append(key)
+            else:
+                bisect.insort(self.keys, key)
+        self.values[key] = value
+
+    def remove(self, key):
+        if key in self.values:
+            del self.values[key]
+            self.keys.pop(0 if key is None else bisect.bisect_left(self.keys, key))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class _KeySchema:
+    def __init__(self, key_schema: List[dict], attribute_types: Dict[str, str]):
+        self.hash_key = next(key['AttributeName'] for key in key_schema if key['KeyType'] == 'HASH')
+        range_keys = [key['AttributeName'] for key in key_schema if key['KeyType'] == 'RANGE']
+        self.range_key = range_keys[0] if len(range_keys) > 0 else None
+        self.types = {name: attribute_types.get(name) for name in self.names}
+
+    @property
+    def names(self) -> List[str]:
+        return [self.hash_key] if self.range_key is None else [self.hash_key, self.range_key]
+
+    def native(self, name: str, value: Optional[dict], required: bool = True):
+        """
+        Comparable value of a key attribute, or None if the item doesn't have it (and it isn't required)
+        """
+        expected = self.types[name]
+        if value is None or expected not in value:
+            if required or value is not None:
+                raise ValidationError(f"One or more parameter values were invalid: Missing the key {name} or "
+                                      f"type mismatch for key {name}, expected type {expected}")
+            return None
+        data = value[expected]
+        return Decimal(data) if expected == 'N' else data
+
+    def key_of(self, item: Item, required: bool = True) -> Optional[tuple]:
+        hash_value = self.native(self.hash_key, item.get(self.hash_key), required)
+        if hash_value is None:
+            return None
+        if self.range_key is None:
+            return hash_value, None
+        range_value = self.native(self.range_key, item.get(self.range_key), required)
+        if range_value is None:
+            return None
+        return hash_value, range_value
+
+    def key_item(self, item: Item) -> Item:
+        return {name: copy.deepcopy(item[name]) for name in self.names}
+
+
+class _SecondaryIndex:
+    def __init__(self, definition: dict, attribute_types: Dict[str, str], table_schema: _KeySchema):
+        self.name = definition['IndexName']
+        self.schema = _KeySchema(definition['KeySchema'], attribute_types)
+        self.table_schema = table_schema
+        projection = definition.get('Projection', {})
+        self.projection_type = projection.get('ProjectionType', 'ALL')
+        self.non_key_attributes = projection.get('NonKeyAttributes', [])
+        self.partitions: Dict[Any, _Partition] = {}
+
+    def entry_key(self, item: Item) -> Optional[Tuple[Any, tuple]]:
+        # items without the index keys are not indexed
+        key = self.schema.key_of(item, required=False)
+        if key is None:
+            return None
+        index_hash, index_range = key
+        return index_hash, (index_range, self.table_schema.key_of(item))
+
+    def put(self, item: Item):
+        entry = self.entry_key(item)
+        if entry is not None:
+            index_hash, sort = entry
+            self.partitions.setdefault(index_hash, _Partition()).put(sort, self.table_schema.key_of(item))
+
+    def remove(self, item: Item):
+        entry = self.entry_key(item)
+        if entry is not None:
+            index_hash, sort = entry
+            partition = self.partitions.get(index_hash)
+            if partition is not None:
+                partition.remove(sort)
+                if len(partition) == 0:
+                    del self.partitions[index_hash]
+
+    def project(self, item: Item) -> Item:
+        if self.projection_type == 'ALL':
+            return item
+        names = set(self.table_schema.names) | set(self.schema.names)
+        if self.projection_type == 'INCLUDE':
+            names |= set(self.non_key_attributes)
+        return {name: value for name, value in item.items() if name in names}
+
+
+def _projection_paths(request: dict) -> Optional[List[Path]]:
+    expression = request.get('ProjectionExpression')
+    if expression is not None:
+        return parse_projection(expression, request.get('ExpressionAttributeNames'))
+    attributes = request.get('AttributesToGet')
+    if attributes is not None:
+        return [[attribute] for attribute in attributes]
+    return None
+
+
+def _check_condition(request: dict, item: Optional[Item]):
+    expression = request.get('ConditionExpression')
+    if expression is None:
+        return
+    node = parse_condition(expression, request.get('ExpressionAttributeNames'),
+                           request.get('ExpressionAttributeValues'))
+    if not evaluate_condition(node, item or {}):
+        raise ConditionalCheckFailedError()
+
+
+class MemoryTable:
+    """
+    An in-memory table, defined like the arguments of CreateTable or the properties of an AWS::DynamoDB::Table
+    """
+
+    def __init__(self, definition: dict):
+        self.name = definition['TableName']
+        self.definition = copy.deepcopy(definition)
+        attribute_types = {attribute['AttributeName']: attribute['AttributeType']
+                           for attribute in definition.get('AttributeDefinitions', [])}
+        self.schema = _KeySchema(definition['KeySchema'], attribute_types)
+        self.indices: Dict[str, _SecondaryIndex] = {}
+        for index in definition.get('GlobalSecondaryIndexes', []) + definition.get('LocalSecondaryIndexes', []):
+            self.indices[index['IndexName']] = _SecondaryIndex(index, attribute_types, self.schema)
+        self.partitions: Dict[Any, _Partition] = {}
+
+    def __len__(self):
+        return sum(len(partition) for partition in self.partitions.values())
+
+    def get(self, key: tuple) -> Optional[Item]:
+        partition = self.partitions.get(key[0])
+        return partition.values.get(key[1]) if partition is not None else None
+
+    def put(self, item: Item) -> Optional[Item]:
+        key = self.schema.key_of(item)
+        old = self.delete(key)
+        self.partitions.setdefault(key[0], _Partition()).put(key[1], item)
+        for index in self.indices.values():
+            index.put(item)
+        return old
+
+    def delete(self, key: tuple) -> Optional[Item]:
+        partition = self.partitions.get(key[0])
+        if partition is None or key[1] not in partition.values:
+            return None
+        old = partition.values[key[1]]
+        partition.remove(key[1])
+        if len(partition) == 0:
+            del self.partitions[key[0]]
+        for index in self.indices.values():
+            index.remove(old)
+        return old
+
+    def request_key(self, key: Item) -> tuple:
+        if set(key.keys()) != set(self.schema.names):
+            raise ValidationError("The provided key element does not match the schema")
+        return self.schema.key_of(key)
+
+    def _target(self, index_name: Optional[str]):
+        if index_name is None:
+            return self.schema, self.partitions, None
+        index = self.indices.get(index_name)
+        if index is None:
+            raise ValidationError(f"The table does not have the specified index: {index_name}")
+        return index.schema, index.partitions, index
+
+    def _entries(self, partition: _Partition, index: Optional[_SecondaryIndex]) -> Iterator[Tuple[Any, Item]]:
+        for sort in partition.keys:
+            value = partition.values[sort]
+            yield sort, (self.get(value) if index is not None else value)
+
+    def _start_sort(self, start_key: Optional[Item], schema: _KeySchema, index: Optional[_SecondaryIndex]):
+        if start_key is None:
+            return None
+        if index is None:
+            return schema.key_of(start_key)
+        index_hash, sort = index.entry_key(start_key)
+        return index_hash, sort
+
+    def query(self, request: dict) -> Tuple[List[Item], Optional[Item], int, int]:
+        """
+        Run a query, returning the page items, the last evaluated key, the number of scanned items and the size
+        of the scanned items
+        """
+        schema, partitions, index = self._target(request.get('IndexName'))
+        expression = request.get('KeyConditionExpression')
+        if expression is None:
+            raise ValidationError("Either the KeyConditions or KeyConditionExpression parameter must be specified")
+        node = parse_condition(expression, request.get('ExpressionAttributeNames'),
+                               request.get('ExpressionAttributeValues'))
+        hash_value, sort_conditions = self._split_key_condition(node, schema)
+
+        partition = partitions.get(hash_value)
+        entries = [] if partition is None else list(self._entries(partition, index))
+        forward = request.get('ScanIndexForward', True)
+        if not forward:
+            entries.reverse()
+
+        start = self._start_sort(request.get('ExclusiveStartKey'), schema, index)
+        if start is not None:
+            sorts = [sort for sort, _ in entries]
+            if forward:
+                entries = entries[bisect.bisect_right(sorts, start[1]):]
+            else:
+                position = bisect.bisect_left(list(reversed(sorts)), start[1])
+                entries = entries[len(sorts) - position:]
+
+        return self._page((item for sort, item in entries
+                           if all(evaluate_condition(condition, item) for condition in sort_conditions)),
+                          request, schema, index)
+
+    @staticmethod
+    def _split_key_condition(node, schema: _KeySchema):
+        conditions = []
+
+        def flatten(n):
+            if n[0] == 'and':
+                flatten(n[1])
+                flatten(n[2])
+            else:
+                conditions.append(n)
+
+        flatten(node)
+        hash_value = None
+        sort_conditions = []
+        for condition in conditions:
+            kind = condition[0]
+            if kind == 'compare' and condition[1] == '=' and condition[2] == ('path', [schema.hash_key]):
+                hash_value = schema.native(schema.hash_key, condition[3][1])
+            elif kind in ('compare', 'between') and condition[1 if kind == 'between' else 2] == \
+                    ('path', [schema.range_key]) and (kind == 'between' or condition[1] != '<>'):
+                sort_conditions.append(condition)
+            elif kind == 'function' and condition[1] == 'begins_with' and \
+                    condition[2][0] == ('path', [schema.range_key]):
+                sort_conditions.append(condition)
+            else:
+                raise ValidationError("Query key condition not supported")
+        if hash_value is None or len(sort_conditions) > 1:
+            raise ValidationError("Query key condition not supported")
+        return hash_value, sort_conditions
+
+    def scan(self, request: dict) -> Tuple[List[Item], Optional[Item], int, int]:
+        schema, partitions, index = self._target(request.get('IndexName'))
+        total_segments = request.get('TotalSegments')
+        segment = request.get('Segment')
+        if (total_segments is None) != (segment is None):
+            raise ValidationError("Segment and TotalSegments must be given together")
+
+        entries = []
+        for hash_value, partition in partitions.items():
+            order = zlib.crc32(repr(hash_value).encode('utf-8'))
+            if total_segments is not None and order % total_segments != segment:
+                continue
+            entries.extend(((order, hash_value, sort), item) for sort, item in self._entries(partition, index))
+        entries.sort(key=lambda entry: entry[0])
+
+        start = self._start_sort(request.get('ExclusiveStartKey'), schema, index)
+        if start is not None:
+            start_order = (zlib.crc32(repr(start[0]).encode('utf-8')), start[0], start[1])
+            entries = entries[bisect.bisect_right([order for order, _ in entries], start_order):]
+        return self._page((item for _, item in entries), request, schema, index)
+
+    def _page(self, items: Iterator[Item], request: dict, schema: _KeySchema, index: Optional[_SecondaryIndex]):
+        limit = request.get('Limit')
+        paths = _projection_paths(request)
+        filter_node = None
+        if request.get('FilterExpression') is not None:
+            filter_node = parse_condition(request['FilterExpression'], request.get('ExpressionAttributeNames'),
+                                          request.get('ExpressionAttributeValues'))
+
+        page = []
+        scanned = 0
+        size = 0
+        last = None
+        exhausted = True
+        for item in items:
+            if (limit is not None and scanned >= limit) or size >= PAGE_SIZE_LIMIT:
+                exhausted = False
+                break
+            if index is not None:
+                item = index.project(item)
+            scanned += 1
+            size += item_size(item)
+            last = item
+            if filter_node is None or evaluate_condition(filter_node, item):
+                page.append(project(item, paths))
+        else:
+            # the page stops at the limit, even if there are no more items
+            exhausted = limit is None or scanned < limit
+
+        last_key = None
+        if not exhausted and last is not None:
+            last_key = self.schema.key_item(last)
+            if index is not None:
+                last_key.update(schema.key_item(last))
+        return page, last_key, scanned, size
+
+
+class MemoryEngine:
+    """
+    In-memory DynamoDB tables answering the low-level (wire format) requests of the DynamoDB API operations used by
+    the db layer. Every request is atomic
+    """
+
+    def __init__(self, tables: List[dict] = None):
+        self.tables: Dict[str, MemoryTable] = {}
+        self._lock = threading.RLock()
+        for definition in tables or []:
+            self.create_table(definition)
+
+    def create_table(self, definition: dict) -> MemoryTable:
+        with self._lock:
+            if definition['TableName'] in self.tables:
+                raise ValidationError(f"Table already exists: {definition['TableName']}")
+            table = MemoryTable(definition)
+            self.tables[table.name] = table
+            return table
+
+    def table(self, name: str) -> MemoryTable:
+        table = self.tables.get(name)
+        if table is None:
+            raise ResourceNotFoundError(f"Requested resource not found: Table: {name} not found")
+        return table
+
+    def clear(self):
+        """
+        Delete every item, keeping the tables
+        """
+        with self._lock:
+            self.tables = {name: MemoryTable(table.definition) for name, table in self.tables.items()}
+
+    def execute(self, operation: str, request: dict) -> dict:
+        handler = getattr(self, f'_{operation}', None)
+        if handler is None:
+            raise ValidationError(f"Operation not supported by the in-memory backend: {operation}")
+        with self._lock:
+            return handler(request)
+
+    # responses
+
+    @staticmethod
+    def _capacity(request: dict, table_name: str, units: float) -> dict:
+        if request.get('ReturnConsumedCapacity', 'NONE') == 'NONE':
+            return {}
+        return {'ConsumedCapacity': {'TableName': table_name, 'CapacityUnits': units}}
+
+    @staticmethod
+    def _capacities(request: dict, units: Dict[str, float]) -> dict:
+        if request.get('ReturnConsumedCapacity', 'NONE') == 'NONE':
+            return {}
+        return {'ConsumedCapacity': [{'TableName': name, 'CapacityUnits': value} for name, value in units.items()]}
+
+    @staticmethod
+    def _return_values(request: dict, old: Optional[Item], new: Optional[Item], updated: List[Path] = None) -> dict:
+        return_values = request.get('ReturnValues', 'NONE')
+        if return_values == 'ALL_OLD':
+            attributes = project(old, None)
+        elif return_values == 'ALL_NEW':
+            attributes = project(new, None)
+        elif return_values == 'UPDATED_OLD':
+            attributes = project(old, updated)
+        elif return_values == 'UPDATED_NEW':
+            attributes = project(new, updated)
+        else:
+            attributes = None
+        return {'Attributes': attributes} if attributes else {}
+
+    # table operations
+
+    def _CreateTable(self, request: dict) -> dict:
+        table = self.create_table(request)
+        return {'TableDescription': self._describe(table)}
+
+    def _DeleteTable(self, request: dict) -> dict:
+        table = self.table(request['TableName'])
+        del self.tables[table.name]
+        return {'TableDescription': self._describe(table)}
+
+    def _DescribeTable(self, request: dict) -> dict:
+        return {'Table': self._describe(self.table(request['TableName']))}
+
+    def _ListTables(self, _: dict) -> dict:
+        return {'TableNames': sorted(self.tables.keys())}
+
+    @staticmethod
+    def _describe(table: MemoryTable) -> dict:
+        description = {key: value for key, value in table.definition.items()
+                       if key in ('TableName', 'KeySchema', 'AttributeDefinitions', 'GlobalSecondaryIndexes',
+                                  'LocalSecondaryIndexes')}
+        description.update({'TableStatus': 'ACTIVE', 'ItemCount': len(table)})
+        return copy.deepcopy(description)
+
+    # item operations
+
+    def _write(self, table: MemoryTable, request: dict, kind: str) -> Tuple[Optional[Item], Optional[Item], list]:
+        """
+        Compute the result of a put, update or delete without applying it, checking its condition
+        """
+        updated = []
+        if kind == 'Put':
+            item = request['Item']
+            key = table.schema.key_of(item)
+            old = table.get(key)
+            new = item
+        else:
+            key = table.request_key(request['Key'])
+            old = table.get(key)
+            if kind == 'Delete':
+                new = None
+            elif kind == 'ConditionCheck':
+                new = old
+            else:
+                new = old if old is not None else copy.deepcopy(request['Key'])
+                expression = request.get('UpdateExpression')
+                if expression is not None:
+                    actions = parse_update(expression, request.get('ExpressionAttributeNames'),
+                                           request.get('ExpressionAttributeValues'))
+                    for _, path, _ in actions:
+                        if path[0] in table.schema.names:
+                            raise ValidationError(f"Cannot update attribute {path[0]}. This attribute is part of "
+                                                  f"the key")
+                    updated = [path for _, path, _ in actions]
+                    # the condition is checked before the update is applied, like DynamoDB does, so a condition can
+                    # guard document paths that are only valid on existing items
+                    _check_condition(request, old)
+                    return old, apply_update(actions, new), updated
+        _check_condition(request, old)
+        return old, new, updated
+
+    @staticmethod
+    def _apply(table: MemoryTable, old: Optional[Item], new: Optional[Item]):
+        if new is not None:
+            table.put(new)
+        elif old is not None:
+            table.delete(table.schema.key_of(old))
+
+    def _single_write(self, request: dict, kind: str) -> dict:
+        table = self.table(request['TableName'])
+        old, new, updated = self._write(table, request, kind)
+        self._apply(table, old, new)
+        return {
+            **self._return_values(request, old, new, updated),
+            **self._capacity(request, table.name, _write_units(item_size(old), item_size(new)))
+        }
+
+    def _PutItem(self, request: dict) -> dict:
+        return self._single_write(request, 'Put')
+
+    def _UpdateItem(self, request: dict) -> dict:
+        return self._single_write(request, 'Update')
+
+    def _DeleteItem(self, request: dict) -> dict:
+        return self._single_write(request, 'Delete')
+
+    def _GetItem(self, request: dict) -> dict:
+        table = self.table(request['TableName'])
+        item = table.get(table.request_key(request['Key']))
+        response = self._capacity(request, table.name, _read_units(item_size(item), request.get('ConsistentRead')))
+        if item is not None:
+            response['Item'] = project(item, _projection_paths(request))
+        return response
+
+    def _read_page(self, request: dict, scan: bool) -> dict:
+        table = self.table(request['TableName'])
+        items, last_key, scanned, size = table.scan(request) if scan else table.query(request)
+        response = {'Count': len(items), 'ScannedCount': scanned,
+                    **self._capacity(request, table.name, _read_units(size, request.get('ConsistentRead')))}
+        if request.get('Select') != 'COUNT':
+            response['Items'] = items
+        if last_key is not None:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+    def _Query(self, request: dict) -> dict:
+        return self._read_page(request, scan=False)
+
+    def _Scan(self, request: dict) -> dict:
+        return self._read_page(request, scan=True)
+
+    # batch operations
+
+    def _BatchGetItem(self, request: dict) -> dict:
+        requested = request['RequestItems']
+        if sum(len(table_request['Keys']) for table_request in requested.values()) > BATCH_GET_LIMIT:
+            raise ValidationError("Too many items requested for the BatchGetItem call")
+        responses = {}
+        units = {}
+        for table_name, table_request in requested.items():
+            table = self.table(table_name)
+            keys = [table.request_key(key) for key in table_request['Keys']]
+            if len(set(keys)) != len(keys):
+                raise ValidationError("Provided list of item keys contains duplicates")
+            paths = _projection_paths(table_request)
+            items = [table.get(key) for key in keys]
+            responses[table_name] = [project(item, paths) for item in items if item is not None]
+            units[table_name] = sum(_read_units(item_size(item), table_request.get('ConsistentRead'))
+                                    for item in items)
+        return {'Responses': responses, 'UnprocessedKeys': {}, **self._capacities(request, units)}
+
+    def _BatchWriteItem(self, request: dict) -> dict:
+        requested = request['RequestItems']
+        if sum(len(table_requests) for table_requests in requested.values()) > BATCH_WRITE_LIMIT:
+            raise ValidationError("Too many items requested for the BatchWriteItem call")
+        writes = []
+        for table_name, table_requests in requested.items():
+            table = self.table(table_name)
+            keys = set()
+            for write_request in table_requests:
+                if 'PutRequest' in write_request:
+                    old, new, _ = self._write(table, write_request['PutRequest'], 'Put')
+                else:
+                    old, new, _ = self._write(table, write_request['DeleteRequest'], 'Delete')
+                key = table.schema.key_of(new if new is not None else write_request['DeleteRequest']['Key'])
+                if key in keys:
+                    raise ValidationError("Provided list of item keys contains duplicates")
+                keys.add(key)
+                writes.append((table, old, new))
+        units = {}
+        for table, old, new in writes:
+            self._apply(table, old, new)
+            units[table.name] = units.get(table.name, 0) + _write_units(item_size(old), item_size(new))
+        return {'UnprocessedItems': {}, **self._capacities(request, units)}
+
+    # transactions
+
+    def _TransactWriteItems(self, request: dict) -> dict:
+        operations = request['TransactItems']
+        if len(operations) > TRANSACT_LIMIT:
+            raise ValidationError(f"Member must have length less than or equal to {TRANSACT_LIMIT}")
+        writes = []
+        reasons = []
+        keys = set()
+        failed = False
+        for operation in operations:
+            (kind, operation_request), = operation.items()
+            table = self.table(operation_request['TableName'])
+            key_source = operation_request['Item'] if kind == 'Put' else operation_request['Key']
+            key = (table.name, table.schema.key_of(key_source))
+            if key in keys:
+                raise ValidationError("Transaction request cannot include multiple operations on one item")
+            keys.add(key)
+            try:
+                old, new, _ = self._write(table, operation_request, kind)
+                writes.append((table, old, new, kind))
+                reasons.append({'Code': 'None'})
+            except ConditionalCheckFailedError as e:
+                failed = True
+                reasons.append({'Code': 'ConditionalCheckFailed', 'Message': e.message})
+        if failed:
+            codes = ', '.join(reason['Code'] for reason in reasons)
+            raise TransactionCanceledError(f"Transaction cancelled, please refer cancellation reasons for specific "
+                                           f"reasons [{codes}]", CancellationReasons=reasons)
+        units = {}
+        for table, old, new, kind in writes:
+            if kind != 'ConditionCheck':
+                self._apply(table, old, new)
+            # transactions consume twice the units
+            units[table.name] = units.get(table.name, 0) + 2 * _write_units(item_size(old), item_size(new))
+        return self._capacities(request, units)
+
+    def _TransactGetItems(self, request: dict) -> dict:
+        operations = request['TransactItems']
+        if len(operations) > TRANSACT_LIMIT:
+            raise ValidationError(f"Member must have length less than or equal to {TRANSACT_LIMIT}")
+        responses = []
+        units = {}
+        for operation in operations:
+            get_request = operation['Get']
+            table = self.table(get_request['TableName'])
+            item = table.get(table.request_key(get_request['Key']))
+            units[table.name] = units.get(table.name, 0) + 2 * _read_units(item_size(item), True)
+            responses.append({'Item': project(item, _projection_paths(get_request))} if item is not None else {})
+        return {'Responses': responses, **self._capacities(request, units)}
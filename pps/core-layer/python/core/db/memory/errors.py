@@ -0,0 +1,35 @@
+from typing import Any, Dict
+
+__all__ = ['MemoryClientError', 'ValidationError', 'ResourceNotFoundError', 'ConditionalCheckFailedError',
+           'TransactionCanceledError']
+
+
+class MemoryClientError(Exception):
+    """
+    Error answered by the in-memory backend, raised by the client as the DynamoDB error with the same code
+    """
+    code: str = 'InternalServerError'
+
+    def __init__(self, message: str, **fields: Any):
+        super().__init__(message)
+        self.message = message
+        self.fields: Dict[str, Any] = fields
+
+
+class ValidationError(MemoryClientError):
+    code = 'ValidationException'
+
+
+class ResourceNotFoundError(MemoryClientError):
+    code = 'ResourceNotFoundException'
+
+
+class ConditionalCheckFailedError(MemoryClientError):
+    code = 'ConditionalCheckFailedException'
+
+    def __init__(self, message: str = 'The conditional request failed', **fields: Any):
+        super().__init__(message, **fields)
+
+
+class TransactionCanceledError(MemoryClientError):
+    code = 'TransactionCanceledException'
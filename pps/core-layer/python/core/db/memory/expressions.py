@@ -0,0 +1,547 @@
+import copy
+import re
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from .errors import ValidationError
+
+__all__ = ['Path', 'parse_condition', 'parse_update', 'parse_projection', 'evaluate_condition', 'apply_update',
+           'project', 'resolve', 'values_equal', 'compare_values']
+
+_TOKEN = re.compile(r'\s*(?:(?P<number>\d+)|(?P<name>[#:]?[A-Za-z_][A-Za-z0-9_]*)|(?P<op><>|<=|>=|[=<>(),.\[\]+\-]))')
+
+_COMPARATORS = ('=', '<>', '<', '<=', '>', '>=')
+_CONDITION_FUNCTIONS = ('attribute_exists', 'attribute_not_exists', 'attribute_type', 'begins_with', 'contains')
+_UPDATE_CLAUSES = ('SET', 'REMOVE', 'ADD', 'DELETE')
+
+# a path is a list of attribute names (str) and list indexes (int)
+Path = List[Any]
+AttributeValue = Dict[str, Any]
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise ValidationError(f"Invalid expression: unexpected character at {position}: {expression}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression: str, names: Optional[Dict[str, str]], values: Optional[Dict[str, Any]]):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+        self.values = values or {}
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Optional[str]]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def next(self) -> Tuple[Optional[str], Optional[str]]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, value: str):
+        kind, token = self.next()
+        if token is None or token.upper() != value:
+            raise ValidationError(f"Invalid expression: expected {value} but found {token}: {self.expression}")
+
+    def at_keyword(self, *keywords: str) -> bool:
+        kind, token = self.peek()
+        return kind == 'name' and token.upper() in keywords
+
+    def done(self) -> bool:
+        return self.position >= len(self.tokens)
+
+    def finish(self):
+        if not self.done():
+            raise ValidationError(f"Invalid expression: unexpected token {self.peek()[1]}: {self.expression}")
+
+    # operands
+
+    def name(self, token: str) -> str:
+        if token.startswith('#'):
+            if token not in self.names:
+                raise ValidationError(f"Undefined attribute name placeholder {token}")
+            return self.names[token]
+        if token.startswith(':'):
+            raise ValidationError(f"Unexpected value placeholder {token} in a document path")
+        return token
+
+    def path(self) -> Path:
+        kind, token = self.next()
+        if kind != 'name':
+            raise ValidationError(f"Invalid document path: {token}: {self.expression}")
+        path: Path = [self.name(token)]
+        while True:
+            kind, token = self.peek()
+            if token == '.':
+                self.next()
+                kind, token = self.next()
+                if kind != 'name':
+                    raise ValidationError(f"Invalid document path: {self.expression}")
+                path.append(self.name(token))
+            elif token == '[':
+                self.next()
+                kind, token = self.next()
+                if kind != 'number':
+                    raise ValidationError(f"Invalid list index: {self.expression}")
+                path.append(int(token))
+                self.expect(']')
+            else:
+                return path
+
+    def value(self, token: str):
+        if token not in self.values:
+            raise ValidationError(f"Undefined attribute value placeholder {token}")
+        return ('value', self.values[token])
+
+    def operand(self):
+        kind, token = self.peek()
+        if kind == 'name' and token.startswith(':'):
+            self.next()
+            return self.value(token)
+        if kind == 'name' and token.lower() == 'size' and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            path = self.path()
+            self.expect(')')
+            return ('size', path)
+        return ('path', self.path())
+
+    # conditions
+
+    def condition(self):
+        node = self.conjunction()
+        while self.at_keyword('OR'):
+            self.next()
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.at_keyword('AND'):
+            self.next()
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.at_keyword('NOT'):
+            self.next()
+            return ('not', self.negation())
+        return self.primary()
+
+    def primary(self):
+        kind, token = self.peek()
+        if token == '(':
+            self.next()
+            node = self.condition()
+            self.expect(')')
+            return node
+        if kind == 'name' and token.lower() in _CONDITION_FUNCTIONS and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            arguments = [self.operand()]
+            while self.peek()[1] == ',':
+                self.next()
+                arguments.append(self.operand())
+            self.expect(')')
+            return ('function', token.lower(), arguments)
+
+        left = self.operand()
+        kind, token = self.peek()
+        if token in _COMPARATORS:
+            self.next()
+            return ('compare', token, left, self.operand())
+        if self.at_keyword('BETWEEN'):
+            self.next()
+            low = self.operand()
+            self.expect('AND')
+            return ('between', left, low, self.operand())
+        if self.at_keyword('IN'):
+            self.next()
+            self.expect('(')
+            options = [self.operand()]
+            while self.peek()[1] == ',':
+                self.next()
+                options.append(self.operand())
+            self.expect(')')
+            return ('in', left, options)
+        raise ValidationError(f"Invalid condition: expected a comparison after operand: {self.expression}")
+
+    # updates
+
+    def update_operand(self):
+        kind, token = self.peek()
+        if kind == 'name' and token.lower() in ('if_not_exists', 'list_append') and self.peek(1)[1] == '(':
+            self.next()
+            self.expect('(')
+            first = self.path() if token.lower() == 'if_not_exists' else self.update_operand()
+            self.expect(',')
+            second = self.update_operand()
+            self.expect(')')
+            return (token.lower(), first, second)
+        if kind == 'name' and token.startswith(':'):
+            self.next()
+            return self.value(token)
+        return ('path', self.path())
+
+    def update_value(self):
+        node = self.update_operand()
+        kind, token = self.peek()
+        if token in ('+', '-'):
+            self.next()
+            return ('+' if token == '+' else '-', node, self.update_operand())
+        return node
+
+    def update(self):
+        actions = []
+        seen = set()
+        while not self.done():
+            kind, clause = self.next()
+            clause = (clause or '').upper()
+            if clause not in _UPDATE_CLAUSES or clause in seen:
+                raise ValidationError(f"Invalid update expression: {self.expression}")
+            seen.add(clause)
+            while True:
+                path = self.path()
+                if clause == 'SET':
+                    self.expect('=')
+                    actions.append(('SET', path, self.update_value()))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', path, None))
+                else:
+                    kind, token = self.next()
+                    if kind != 'name' or not token.startswith(':'):
+                        raise ValidationError(f"{clause} needs a value placeholder: {self.expression}")
+                    actions.append((clause, path, self.value(token)))
+                if self.peek()[1] != ',':
+                    break
+                self.next()
+        return actions
+
+
+def parse_condition(expression: str, names: Dict[str, str] = None, values: Dict[str, Any] = None):
+    parser = _Parser(expression, names, values)
+    node = parser.condition()
+    parser.finish()
+    return node
+
+
+def parse_update(expression: str, names: Dict[str, str] = None, values: Dict[str, Any] = None):
+    parser = _Parser(expression, names, values)
+    actions = parser.update()
+    if len(actions) == 0:
+        raise ValidationError("Empty update expression")
+    return actions
+
+
+def parse_projection(expression: str, names: Dict[str, str] = None) -> List[Path]:
+    parser = _Parser(expression, names, None)
+    paths = [parser.path()]
+    while parser.peek()[1] == ',':
+        parser.next()
+        paths.append(parser.path())
+    parser.finish()
+    return paths
+
+
+# values
+
+def _number(value: AttributeValue) -> Decimal:
+    return Decimal(value['N'])
+
+
+def _type(value: AttributeValue) -> str:
+    return next(iter(value))
+
+
+def values_equal(a: Optional[AttributeValue], b: Optional[AttributeValue]) -> bool:
+    if a is None or b is None:
+        return False
+    type_a, type_b = _type(a), _type(b)
+    if type_a != type_b:
+        return False
+    if type_a == 'N':
+        return _number(a) == _number(b)
+    if type_a == 'NS':
+        return set(Decimal(n) for n in a['NS']) == set(Decimal(n) for n in b['NS'])
+    if type_a in ('SS', 'BS'):
+        return set(a[type_a]) == set(b[type_b])
+    if type_a == 'M':
+        return a['M'].keys() == b['M'].keys() and all(values_equal(v, b['M'][k]) for k, v in a['M'].items())
+    if type_a == 'L':
+        return len(a['L']) == len(b['L']) and all(values_equal(x, y) for x, y in zip(a['L'], b['L']))
+    return a[type_a] == b[type_b]
+
+
+def compare_values(a: Optional[AttributeValue], b: Optional[AttributeValue]) -> Optional[int]:
+    """
+    Compare two scalar values of the same type, returning None when they can't be ordered
+    """
+    if a is None or b is None:
+        return None
+    type_a, type_b = _type(a), _type(b)
+    if type_a != type_b or type_a not in ('N', 'S', 'B'):
+        return None
+    x, y = (_number(a), _number(b)) if type_a == 'N' else (a[type_a], b[type_b])
+    return (x > y) - (x < y)
+
+
+def resolve(item: Dict[str, AttributeValue], path: Path) -> Optional[AttributeValue]:
+    value = item.get(path[0])
+    for element in path[1:]:
+        if value is None:
+            return None
+        if isinstance(element, int):
+            items = value.get('L')
+            value = items[element] if items is not None and element < len(items) else None
+        else:
+            attributes = value.get('M')
+            value = attributes.get(element) if attributes is not None else None
+    return value
+
+
+def _size(value: Optional[AttributeValue]) -> Optional[AttributeValue]:
+    if value is None:
+        return None
+    value_type = _type(value)
+    if value_type in ('S', 'B'):
+        return {'N': str(len(value[value_type]))}
+    if value_type in ('SS', 'NS', 'BS', 'L', 'M'):
+        return {'N': str(len(value[value_type]))}
+    return None
+
+
+def _operand(node, item: dict) -> Optional[AttributeValue]:
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        return resolve(item, node[1])
+    if kind == 'size':
+        return _size(resolve(item, node[1]))
+    raise ValidationError(f"Invalid operand {kind}")
+
+
+def _contains(container: Optional[AttributeValue], value: Optional[AttributeValue]) -> bool:
+    if container is None or value is None:
+        return False
+    container_type = _type(container)
+    if container_type == 'S':
+        return 'S' in value and value['S'] in container['S']
+    if container_type in ('SS', 'BS'):
+        return value.get(container_type[0]) in container[container_type]
+    if container_type == 'NS':
+        return 'N' in value and _number(value) in set(Decimal(n) for n in container['NS'])
+    if container_type == 'L':
+        return any(values_equal(element, value) for element in container['L'])
+    return False
+
+
+def evaluate_condition(node, item: Dict[str, AttributeValue]) -> bool:
+    kind = node[0]
+    if kind == 'and':
+        return evaluate_condition(node[1], item) and evaluate_condition(node[2], item)
+    if kind == 'or':
+        return evaluate_condition(node[1], item) or evaluate_condition(node[2], item)
+    if kind == 'not':
+        return not evaluate_condition(node[1], item)
+    if kind == 'compare':
+        _, comparator, left, right = node
+        a, b = _operand(left, item), _operand(right, item)
+        if comparator == '=':
+            return values_equal(a, b)
+        if comparator == '<>':
+            # a missing attribute is different from any value
+            return not values_equal(a, b) if a is not None else b is not None
+        order = compare_values(a, b)
+        if order is None:
+            return False
+        return {'<': order < 0, '<=': order <= 0, '>': order > 0, '>=': order >= 0}[comparator]
+    if kind == 'between':
+        _, operand, low, high = node
+        value = _operand(operand, item)
+        lower, upper = compare_values(value, _operand(low, item)), compare_values(value, _operand(high, item))
+        return lower is not None and upper is not None and lower >= 0 and upper <= 0
+    if kind == 'in':
+        value = _operand(node[1], item)
+        return any(values_equal(value, _operand(option, item)) for option in node[2])
+    if kind == 'function':
+        _, function, arguments = node
+        if function in ('attribute_exists', 'attribute_not_exists'):
+            if arguments[0][0] != 'path':
+                raise ValidationError(f"{function} needs a document path")
+            exists = resolve(item, arguments[0][1]) is not None
+            return exists if function == 'attribute_exists' else not exists
+        values = [_operand(argument, item) for argument in arguments]
+        if function == 'attribute_type':
+            return values[0] is not None and values[1] is not None and _type(values[0]) == values[1].get('S')
+        if function == 'begins_with':
+            value, prefix = values
+            if value is None or prefix is None or _type(value) != _type(prefix) or _type(value) not in ('S', 'B'):
+                return False
+            return value[_type(value)].startswith(prefix[_type(prefix)])
+        if function == 'contains':
+            return _contains(*values)
+    raise ValidationError(f"Invalid condition node {kind}")
+
+
+# updates
+
+def _update_value(node, item: dict) -> AttributeValue:
+    kind = node[0]
+    if kind == 'value':
+        return node[1]
+    if kind == 'path':
+        value = resolve(item, node[1])
+        if value is None:
+            raise ValidationError("The provided expression refers to an attribute that does not exist in the item")
+        return value
+    if kind == 'if_not_exists':
+        value = resolve(item, node[1])
+        return value if value is not None else _update_value(node[2], item)
+    if kind == 'list_append':
+        first, second = _update_value(node[1], item), _update_value(node[2], item)
+        if 'L' not in first or 'L' not in second:
+            raise ValidationError("list_append needs two lists")
+        return {'L': first['L'] + second['L']}
+    if kind in ('+', '-'):
+        first, second = _update_value(node[1], item), _update_value(node[2], item)
+        if 'N' not in first or 'N' not in second:
+            raise ValidationError("An operand in the update expression has an incorrect data type")
+        result = _number(first) + _number(second) if kind == '+' else _number(first) - _number(second)
+        return {'N': str(result)}
+    raise ValidationError(f"Invalid update operand {kind}")
+
+
+def _parent(item: dict, path: Path):
+    """
+    Container of the last element of a path, as a dict for names or a list for indexes
+    """
+    if len(path) == 1:
+        return item
+    parent = resolve(item, path[:-1])
+    if parent is None:
+        raise ValidationError("The document path provided in the update expression is invalid for update")
+    container = parent.get('L') if isinstance(path[-1], int) else parent.get('M')
+    if container is None:
+        raise ValidationError("The document path provided in the update expression is invalid for update")
+    return container
+
+
+def _set(item: dict, path: Path, value: AttributeValue):
+    container = _parent(item, path)
+    element = path[-1]
+    if isinstance(element, int):
+        if element < len(container):
+            container[element] = value
+        else:
+            container.append(value)
+    else:
+        container[element] = value
+
+
+def _remove(item: dict, path: Path):
+    container = _parent(item, path)
+    element = path[-1]
+    if isinstance(element, int):
+        if element < len(container):
+            del container[element]
+    else:
+        container.pop(element, None)
+
+
+def _add(current: Optional[AttributeValue], value: AttributeValue) -> AttributeValue:
+    value_type = _type(value)
+    if current is None:
+        return copy.deepcopy(value)
+    if _type(current) != value_type:
+        raise ValidationError("An operand in the update expression has an incorrect data type")
+    if value_type == 'N':
+        return {'N': str(_number(current) + _number(value))}
+    if value_type in ('SS', 'BS'):
+        return {value_type: current[value_type] + [v for v in value[value_type] if v not in current[value_type]]}
+    if value_type == 'NS':
+        numbers = set(Decimal(n) for n in current['NS'])
+        return {'NS': current['NS'] + [n for n in value['NS'] if Decimal(n) not in numbers]}
+    raise ValidationError("ADD can only be used on numbers and sets")
+
+
+def _delete(current: Optional[AttributeValue], value: AttributeValue) -> Optional[AttributeValue]:
+    value_type = _type(value)
+    if current is None:
+        return None
+    if _type(current) != value_type or value_type not in ('SS', 'NS', 'BS'):
+        raise ValidationError("DELETE can only be used on sets")
+    if value_type == 'NS':
+        removed = set(Decimal(n) for n in value['NS'])
+        remaining = [n for n in current['NS'] if Decimal(n) not in removed]
+    else:
+        remaining = [v for v in current[value_type] if v not in value[value_type]]
+    return {value_type: remaining} if len(remaining) > 0 else None
+
+
+def apply_update(actions, item: Dict[str, AttributeValue]) -> Dict[str, AttributeValue]:
+    """
+    Apply parsed update actions to a copy of an item. Every operand is read from the item before the update
+    """
+    values = [(action, path, _update_value(operand, item) if action == 'SET' else operand)
+              for action, path, operand in actions]
+    updated = copy.deepcopy(item)
+    for action, path, value in values:
+        if action == 'SET':
+            _set(updated, path, copy.deepcopy(value))
+        elif action == 'REMOVE':
+            _remove(updated, path)
+        elif action == 'ADD':
+            _set(updated, path, _add(resolve(updated, path), value[1]))
+        elif action == 'DELETE':
+            remaining = _delete(resolve(updated, path), value[1])
+            if remaining is None:
+                _remove(updated, path)
+            else:
+                _set(updated, path, remaining)
+    return updated
+
+
+def project(item: Optional[Dict[str, AttributeValue]], paths: Optional[List[Path]]) -> Optional[dict]:
+    """
+    Copy of an item with only the attributes in the given document paths. Projected list elements are compacted,
+    in the order they were requested
+    """
+    if item is None:
+        return None
+    if paths is None:
+        return copy.deepcopy(item)
+    projected: Dict[str, AttributeValue] = {}
+    for path in paths:
+        value = resolve(item, path)
+        if value is None:
+            continue
+        container = projected
+        for element, following in zip(path, path[1:]):
+            empty = {'L': []} if isinstance(following, int) else {'M': {}}
+            if isinstance(container, list):
+                child = empty
+                container.append(child)
+            else:
+                child = container.setdefault(element, empty)
+            container = child.get('L') if isinstance(following, int) else child.get('M')
+            if container is None:
+                break
+        else:
+            if isinstance(container, list):
+                container.append(copy.deepcopy(value))
+            else:
+                container[path[-1]] = copy.deepcopy(value)
+    return projected
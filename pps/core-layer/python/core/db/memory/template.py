@@ -0,0 +1,31 @@
+import os
+from typing import List
+
+__all__ = ['TEMPLATE_PATH', 'load_table_definitions']
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../../../../../../template.yaml')
+
+
+def load_table_definitions(path: str = None) -> List[dict]:
+    """
+    Read the properties of the AWS::DynamoDB::Table resources of a SAM template, which are valid CreateTable
+    arguments
+    """
+    import yaml
+
+    class TemplateLoader(yaml.SafeLoader):
+        pass
+
+    def any_constructor(loader, _, node):
+        # intrinsic functions (!Ref, !GetAtt, ...) are read as plain values
+        if isinstance(node, yaml.MappingNode):
+            return loader.construct_mapping(node)
+        if isinstance(node, yaml.SequenceNode):
+            return loader.construct_sequence(node)
+        return loader.construct_scalar(node)
+
+    TemplateLoader.add_multi_constructor('!', any_constructor)
+    with open(path or os.environ.get('PPS_TEMPLATE', TEMPLATE_PATH), 'r') as f:
+        template = yaml.load(f, Loader=TemplateLoader)
+    return [resource['Properties'] for resource in template['Resources'].values()
+            if resource['Type'] == 'AWS::DynamoDB::Table']
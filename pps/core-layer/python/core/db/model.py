@@ -1,25 +1,33 @@
 import abc
 import enum
-from typing import List, Dict, Any, Tuple, Union
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Union, Iterator, Callable, TYPE_CHECKING
 
-import boto3
-from boto3 import dynamodb
-from boto3.dynamodb.conditions import Key
-from boto3.dynamodb.table import TableResource
+from .cache import identity_map
 from .results import QueryResult, GetResult
+from .throttle import READ, rate_limiter
 from .types import DynamoDBKey, DynamoDBTypes
+from .wire import encode_item, encode_value
+
+if TYPE_CHECKING:
+    from boto3.dynamodb.table import TableResource
+    from .db import Database
 
 _valid_select_options = ['ALL_ATTRIBUTES', 'ALL_PROJECTED_ATTRIBUTES', 'SPECIFIC_ATTRIBUTES', 'COUNT']
 
 RESERVED_KEYWORDS = ['name', 'unit', 'sub', 'user', 'group']
 
+_table_lock = threading.Lock()
+
+
+def not_none_arguments(**kwargs) -> dict:
+    return {key: value for key, value in kwargs.items() if value is not None}
+
 
 def pass_not_none_arguments(fn, **kwargs):
-    args = {}
-    for key in kwargs:
-        if kwargs[key] is not None:
-            args[key] = kwargs[key]
-    return fn(**args)
+    return fn(**not_none_arguments(**kwargs))
 
 
 class UpdateReturnValues(enum.Enum):
@@ -60,6 +68,8 @@ class Operator(enum.Enum):
 
     @staticmethod
     def to_expression(key_name, op, value, value2=None):
+        from boto3.dynamodb.conditions import Key
+
         exp = Key(key_name)
         if op == Operator.EQ:
             exp = exp.eq(value)
@@ -84,17 +94,36 @@ class Operator(enum.Enum):
 
 class AbstractModel(abc.ABC):
     __table_name__: str
-    __db__: boto3.session.Session.resource
+    __database__: 'Database'
     __keys__: Dict[str, type(DynamoDBTypes)]
 
-    _table: boto3.dynamodb.table = None
+    _table: 'TableResource' = None
 
     @classmethod
     def get_table(cls):
         if cls._table is None:
-            cls._table = cls.__db__.Table(cls.__table_name__)
+            # models may be first used from fan-out workers, and the resource builds its tables unguarded
+            with _table_lock:
+                if cls._table is None:
+                    cls._table = cls.__database__.resource.Table(cls.__table_name__)
         return cls._table
 
+    @classmethod
+    def get_client(cls):
+        """
+        Low-level client, sending and receiving wire attribute values
+        """
+        return cls.__database__.wire_client
+
+    @classmethod
+    def get_table_client(cls):
+        """
+        Low-level client of the table resource, which takes and returns native values as the resource does. Requests
+        go through it instead of the resource, since the client is thread-safe and the resource isn't, and they can
+        be sent from fan-out workers
+        """
+        return cls.get_table().meta.client
+
     @classmethod
     def scan(cls,
              limit: int = None,
@@ -104,11 +133,128 @@ class AbstractModel(abc.ABC):
         """
         List items from a database
         """
-        table = cls.get_table()
-        result = pass_not_none_arguments(table.scan, Limit=limit, AttributesToGet=attributes, IndexName=index,
-                                         ExclusiveStartKey=start_key)
+        client = cls.get_table_client()
+        with rate_limiter.paced(cls.__table_name__, READ, index=index) as pace:
+            result = pass_not_none_arguments(client.scan, TableName=cls.__table_name__, Limit=limit,
+                                             AttributesToGet=attributes, IndexName=index, ExclusiveStartKey=start_key)
+            pace.consumed(result.get('ConsumedCapacity'))
         return QueryResult(result)
 
+    @classmethod
+    def iter_scan_segment(cls,
+                          segment: int = None,
+                          total_segments: int = None,
+                          page_size: int = None,
+                          attributes: List[str] = None,
+                          index: str = None) -> Iterator[QueryResult]:
+        """
+        Lazily scan pages from a database (or from one of its segments), following the last evaluated key. Pages
+        are paced by the rate limiter of the table
+        """
+        client = cls.get_table_client()
+        start_key = None
+        while True:
+            with rate_limiter.paced(cls.__table_name__, READ, index=index) as pace:
+                result = pass_not_none_arguments(client.scan, TableName=cls.__table_name__, Limit=page_size,
+                                                 AttributesToGet=attributes, IndexName=index, Segment=segment,
+                                                 TotalSegments=total_segments, ExclusiveStartKey=start_key)
+                pace.consumed(result.get('ConsumedCapacity'))
+            page = QueryResult(result)
+            yield page
+            start_key = page.last_evaluated_key
+            if start_key is None:
+                break
+
+    @classmethod
+    def parallel_scan(cls,
+                      total_segments: int,
+                      max_workers: int = None,
+                      page_size: int = None,
+                      attributes: List[str] = None,
+                      index: str = None,
+                      buffer_pages: int = None) -> Iterator[dict]:
+        """
+        Scan a whole database splitting it in segments that are read on a thread pool, streaming the merged items.
+        At most buffer_pages pages are held in memory while waiting to be consumed
+        """
+        if total_segments < 1:
+            raise ValueError("The number of segments must be positive")
+        if max_workers is None:
+            max_workers = total_segments
+        if buffer_pages is None:
+            buffer_pages = 2 * max_workers
+
+        pages = queue.Queue(maxsize=buffer_pages)
+        stop = threading.Event()
+        done = object()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    pages.put(value, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def scan_segment(segment: int):
+            try:
+                for page in cls.iter_scan_segment(segment, total_segments, page_size=page_size,
+                                                  attributes=attributes, index=index):
+                    if stop.is_set():
+                        return
+                    put(page.items)
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for i in range(total_segments):
+                executor.submit(scan_segment, i)
+            pending = total_segments
+            while pending > 0:
+                value = pages.get()
+                if value is done:
+                    pending -= 1
+                elif isinstance(value, Exception):
+                    raise value
+                else:
+                    yield from value
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+    @classmethod
+    def parallel_scan_each(cls,
+                           callback: Callable[[dict], Any],
+                           total_segments: int,
+                           max_workers: int = None,
+                           page_size: int = None,
+                           attributes: List[str] = None,
+                           index: str = None) -> int:
+        """
+        Scan a whole database splitting it in segments that are read on a thread pool, passing each item to the
+        callback on the worker thread that read it. Returns the amount of processed items
+        """
+        if total_segments < 1:
+            raise ValueError("The number of segments must be positive")
+        if max_workers is None:
+            max_workers = total_segments
+
+        def scan_segment(segment: int):
+            count = 0
+            for page in cls.iter_scan_segment(segment, total_segments, page_size=page_size, attributes=attributes,
+                                              index=index):
+                for item in page.items:
+                    callback(item)
+                    count += 1
+            return count
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(scan_segment, i) for i in range(total_segments)]
+            return sum(future.result() for future in futures)
+
     @staticmethod
     def replace_keyword_attributes(attributes: List[str]):
         attr_expression = {}
@@ -180,10 +326,12 @@ class AbstractModel(abc.ABC):
               attributes: List[str] = None,
               index: str = None,
               scan_forward: bool = None,
-              bool_op=BoolOperator.AND
+              bool_op=BoolOperator.AND,
+              fast: bool = False
               ) -> QueryResult:
         """
-        List items from a database
+        List items from a database. With fast, the query is sent through the low-level client and the items are
+        decoded straight into native values
         """
 
         if sort_key is None:
@@ -220,24 +368,97 @@ class AbstractModel(abc.ABC):
                 else:
                     raise ValueError(f"Unknown boolean operator: {bool_op}")
             key_conditions = key_conditions & sort_conditions
+        if fast:
+            return cls._fast_query(key_conditions, limit=limit, projection=projection, attr_names=attr_names,
+                                   index=index, start_key=start_key, scan_forward=scan_forward)
         if len(attr_names) == 0:
             attr_names = None
 
-        table = cls.get_table()
-        result = pass_not_none_arguments(table.query, Limit=limit, ProjectionExpression=projection, IndexName=index,
+        result = pass_not_none_arguments(cls.get_table_client().query, TableName=cls.__table_name__, Limit=limit,
+                                         ProjectionExpression=projection, IndexName=index,
                                          ExclusiveStartKey=start_key, KeyConditionExpression=key_conditions,
                                          ExpressionAttributeNames=attr_names, ScanIndexForward=scan_forward)
         return QueryResult(result)
 
     @classmethod
-    def add(cls, item: dict, raise_if_attributes_exist: List[str] = None, conditions: List[str] = None,
-            raise_attribute_equals: dict = None):
+    def _fast_query(cls, key_conditions, limit: int = None, projection: str = None, attr_names: dict = None,
+                    index: str = None, start_key: DynamoDBKey = None, scan_forward: bool = None) -> QueryResult:
+        from boto3.dynamodb.conditions import ConditionExpressionBuilder
+
+        expression = ConditionExpressionBuilder().build_expression(key_conditions, is_key_condition=True)
+        attr_names = {**attr_names, **expression.attribute_name_placeholders}
+        attr_values = {name: encode_value(value) for name, value in expression.attribute_value_placeholders.items()}
+        result = pass_not_none_arguments(cls.get_client().query, TableName=cls.__table_name__, Limit=limit,
+                                         ProjectionExpression=projection, IndexName=index,
+                                         ExclusiveStartKey=encode_item(start_key),
+                                         KeyConditionExpression=expression.condition_expression,
+                                         ExpressionAttributeNames=attr_names,
+                                         ExpressionAttributeValues=attr_values, ScanIndexForward=scan_forward)
+        return QueryResult.from_wire(result)
+
+    @classmethod
+    def iter_pages(cls,
+                   partition_key: Tuple[str, Any],
+                   sort_key: Union[Tuple[str, Operator, Any], List[Tuple[str, Operator, Any]]] = None,
+                   page_size: int = None,
+                   start_key: DynamoDBKey = None,
+                   attributes: List[str] = None,
+                   index: str = None,
+                   scan_forward: bool = None,
+                   bool_op=BoolOperator.AND,
+                   max_items: int = None,
+                   max_pages: int = None,
+                   fast: bool = False
+                   ) -> Iterator[QueryResult]:
         """
-        Create an item from the database
+        Lazily query pages from a database, following the last evaluated key until the query is exhausted or
+        until the max_items/max_pages budget is spent
         """
-        # [f'#model_sub=:val_sub'], attribute_values = {":val_sub": {"S": authorizer.sub}}
-        table = cls.get_table()
+        n_items = 0
+        n_pages = 0
+        while max_items is None or n_items < max_items:
+            limit = page_size
+            if max_items is not None:
+                limit = max_items - n_items if limit is None else min(limit, max_items - n_items)
+            page = cls.query(partition_key, sort_key, limit=limit, start_key=start_key, attributes=attributes,
+                             index=index, scan_forward=scan_forward, bool_op=bool_op, fast=fast)
+            n_items += len(page.items)
+            n_pages += 1
+            yield page
+
+            start_key = page.last_evaluated_key
+            if start_key is None or (max_pages is not None and n_pages >= max_pages):
+                break
+
+    @classmethod
+    def iter_query(cls,
+                   partition_key: Tuple[str, Any],
+                   sort_key: Union[Tuple[str, Operator, Any], List[Tuple[str, Operator, Any]]] = None,
+                   page_size: int = None,
+                   start_key: DynamoDBKey = None,
+                   attributes: List[str] = None,
+                   index: str = None,
+                   scan_forward: bool = None,
+                   bool_op=BoolOperator.AND,
+                   max_items: int = None,
+                   max_pages: int = None,
+                   fast: bool = False
+                   ) -> Iterator[dict]:
+        """
+        Lazily iterate over the items of a query, requesting the next page only when the current one is consumed
+        """
+        for page in cls.iter_pages(partition_key, sort_key, page_size=page_size, start_key=start_key,
+                                   attributes=attributes, index=index, scan_forward=scan_forward, bool_op=bool_op,
+                                   max_items=max_items, max_pages=max_pages, fast=fast):
+            yield from page.items
 
+    @classmethod
+    def add_arguments(cls, item: dict, raise_if_attributes_exist: List[str] = None, conditions: List[str] = None,
+                      raise_attribute_equals: dict = None) -> dict:
+        """
+        Build the arguments of a put request creating an item
+        """
+        # [f'#model_sub=:val_sub'], attribute_values = {":val_sub": {"S": authorizer.sub}}
         exp = None
         if raise_if_attributes_exist is not None:
             exp = cls.replace_keyword_attributes(raise_if_attributes_exist)
@@ -263,24 +484,58 @@ class AbstractModel(abc.ABC):
             conditions.append(' AND '.join(and_conditions))
 
         condition = ' AND '.join(conditions) if conditions is not None else None
-        pass_not_none_arguments(table.put_item, Item=item, ReturnValues='NONE', ConditionExpression=condition,
-                                ExpressionAttributeNames=exp, ExpressionAttributeValues=attribute_values)
+        return not_none_arguments(Item=item, ConditionExpression=condition, ExpressionAttributeNames=exp,
+                                  ExpressionAttributeValues=attribute_values)
+
+    @classmethod
+    def add(cls, item: dict, raise_if_attributes_exist: List[str] = None, conditions: List[str] = None,
+            raise_attribute_equals: dict = None):
+        """
+        Create an item from the database
+        """
+        arguments = cls.add_arguments(item, raise_if_attributes_exist=raise_if_attributes_exist,
+                                      conditions=conditions, raise_attribute_equals=raise_attribute_equals)
+        identity_map.invalidate_item(cls.__table_name__, item)
+        cls.get_table_client().put_item(TableName=cls.__table_name__, ReturnValues='NONE', **arguments)
         return item
 
     @classmethod
-    def get(cls, key: DynamoDBKey, attributes: List[str] = None) -> GetResult:
+    def add_operation(cls, item: dict, raise_if_attributes_exist: List[str] = None, conditions: List[str] = None,
+                      raise_attribute_equals: dict = None) -> dict:
         """
-        Delete an item from the database
+        Build a transaction operation creating an item
+        """
+        return {'Put': {'TableName': cls.__table_name__, **cls.add_arguments(
+            item, raise_if_attributes_exist=raise_if_attributes_exist, conditions=conditions,
+            raise_attribute_equals=raise_attribute_equals)}}
+
+    @classmethod
+    def get(cls, key: DynamoDBKey, attributes: List[str] = None, fast: bool = False) -> GetResult:
+        """
+        Get an item from the database, or from the request identity map if it was already read. With fast, the item
+        is read through the low-level client and decoded straight into native values, skipping the identity map, as
+        its items may come from reads whose numbers were decoded differently
         """
-        table = cls.get_table()
+        if not fast:
+            found, item = identity_map.lookup(cls.__table_name__, key, attributes)
+            if found:
+                return GetResult.from_item(item)
 
+        projected = list(attributes) if attributes is not None else None
         attr_expression = None
         if attributes is not None:
             attr_expression, attributes = cls.attributes_to_projection_and_expression(attributes)
 
-        result = pass_not_none_arguments(table.get_item, Key=key, ProjectionExpression=attributes,
-                                         ExpressionAttributeNames=attr_expression)
-        return GetResult(result)
+        if fast:
+            result = GetResult.from_wire(pass_not_none_arguments(
+                cls.get_client().get_item, TableName=cls.__table_name__, Key=encode_item(key),
+                ProjectionExpression=attributes, ExpressionAttributeNames=attr_expression))
+        else:
+            result = GetResult(pass_not_none_arguments(
+                cls.get_table_client().get_item, TableName=cls.__table_name__, Key=key,
+                ProjectionExpression=attributes, ExpressionAttributeNames=attr_expression))
+            identity_map.store(cls.__table_name__, key, result.item, projected)
+        return result
 
     @staticmethod
     def to_code_name(attribute: str, ignore: List[str] = None):
@@ -301,14 +556,13 @@ class AbstractModel(abc.ABC):
         raise ValueError(f"Unrecognized type: {t}")
 
     @classmethod
-    def update(cls, key: DynamoDBKey, updates: dict = None, append_to: Dict[str, Any] = None,
-               condition_equals: Dict[str, Any] = None, add_to: Dict[str, int] = None, conditions=None,
-               return_values: UpdateReturnValues = UpdateReturnValues.UPDATED_NEW):
+    def update_arguments(cls, key: DynamoDBKey, updates: dict = None, append_to: Dict[str, Any] = None,
+                         condition_equals: Dict[str, Any] = None, add_to: Dict[str, int] = None,
+                         conditions=None, append_or_create: Dict[str, list] = None) -> dict:
         """
-        Update an item from the database changing only the given attributes
+        Build the arguments of an update request changing only the given attributes. Lists in append_or_create are
+        appended to their attributes, which are created if they don't exist yet
         """
-        table = cls.get_table()
-
         if updates is None:
             updates = {}
 
@@ -318,8 +572,12 @@ class AbstractModel(abc.ABC):
         if add_to is None:
             add_to = {}
 
-        if len(updates) == 0 and len(append_to) == 0 and len(add_to) == 0:
-            raise ValueError("The updates, append_to and add_to dictionaries must not be empty at the same time")
+        if append_or_create is None:
+            append_or_create = {}
+
+        if len(updates) == 0 and len(append_to) == 0 and len(add_to) == 0 and len(append_or_create) == 0:
+            raise ValueError("The updates, append_to, append_or_create and add_to dictionaries must not be empty at "
+                             "the same time")
 
         attr_names = {}
         attr_values = {}
@@ -332,6 +590,11 @@ class AbstractModel(abc.ABC):
             item_key_ = cls.add_to_attribute_names(item_key, attr_names)
             item_value_ = cls.add_to_attribute_values(item_value, attr_values, item_key)
             update_expressions.append(f"{item_key_}=list_append({item_key_}, {item_value_})")
+        for item_key, item_value in append_or_create.items():
+            item_key_ = cls.add_to_attribute_names(item_key, attr_names)
+            item_value_ = cls.add_to_attribute_values(item_value, attr_values, item_key)
+            empty_ = cls.add_to_attribute_values([], attr_values, item_key + '_empty')
+            update_expressions.append(f"{item_key_}=list_append(if_not_exists({item_key_}, {empty_}), {item_value_})")
         if len(update_expressions) > 0:
             expression = "SET " + ', '.join(update_expressions)
         else:
@@ -364,23 +627,71 @@ class AbstractModel(abc.ABC):
         if len(attr_values) == 0:
             attr_values = None
 
-        return pass_not_none_arguments(table.update_item,
-                                       Key=key,
-                                       UpdateExpression=expression,
-                                       ExpressionAttributeNames=attr_names,
-                                       ExpressionAttributeValues=attr_values,
-                                       ConditionExpression=conditions if conditions is not None else condition_exp,
-                                       ReturnValues=UpdateReturnValues.to_str(return_values),
-                                       )
+        return not_none_arguments(Key=key,
+                                  UpdateExpression=expression,
+                                  ExpressionAttributeNames=attr_names,
+                                  ExpressionAttributeValues=attr_values,
+                                  ConditionExpression=conditions if conditions is not None else condition_exp)
+
+    @classmethod
+    def update(cls, key: DynamoDBKey, updates: dict = None, append_to: Dict[str, Any] = None,
+               condition_equals: Dict[str, Any] = None, add_to: Dict[str, int] = None, conditions=None,
+               return_values: UpdateReturnValues = UpdateReturnValues.UPDATED_NEW,
+               append_or_create: Dict[str, list] = None):
+        """
+        Update an item from the database changing only the given attributes
+        """
+        arguments = cls.update_arguments(key, updates=updates, append_to=append_to, condition_equals=condition_equals,
+                                         add_to=add_to, conditions=conditions, append_or_create=append_or_create)
+        identity_map.invalidate(cls.__table_name__, key)
+        return cls.get_table_client().update_item(TableName=cls.__table_name__,
+                                                  ReturnValues=UpdateReturnValues.to_str(return_values), **arguments)
+
+    @classmethod
+    def update_operation(cls, key: DynamoDBKey, updates: dict = None, append_to: Dict[str, Any] = None,
+                         condition_equals: Dict[str, Any] = None, add_to: Dict[str, int] = None,
+                         conditions=None, append_or_create: Dict[str, list] = None) -> dict:
+        """
+        Build a transaction operation updating an item
+        """
+        arguments = cls.update_arguments(key, updates=updates, append_to=append_to,
+                                         condition_equals=condition_equals, add_to=add_to, conditions=conditions,
+                                         append_or_create=append_or_create)
+        return {'Update': {'TableName': cls.__table_name__, **cls._build_condition(arguments)}}
+
+    @staticmethod
+    def _build_condition(arguments: dict) -> dict:
+        from boto3.dynamodb.conditions import ConditionBase, ConditionExpressionBuilder
+
+        # boto3 only turns condition objects into expressions on the top level of a request
+        condition = arguments.get('ConditionExpression')
+        if not isinstance(condition, ConditionBase):
+            return arguments
+        expression = ConditionExpressionBuilder().build_expression(condition)
+        return {
+            **arguments,
+            'ConditionExpression': expression.condition_expression,
+            'ExpressionAttributeNames': {**arguments.get('ExpressionAttributeNames', {}),
+                                         **expression.attribute_name_placeholders},
+            'ExpressionAttributeValues': {**arguments.get('ExpressionAttributeValues', {}),
+                                          **expression.attribute_value_placeholders}
+        }
 
     @classmethod
     def delete(cls, key: DynamoDBKey):
         """
         Delete an item from the database
         """
-        table = cls.get_table()
-        pass_not_none_arguments(table.delete_item, Key=key)
+        identity_map.invalidate(cls.__table_name__, key)
+        pass_not_none_arguments(cls.get_table_client().delete_item, TableName=cls.__table_name__, Key=key)
+
+    @classmethod
+    def delete_operation(cls, key: DynamoDBKey) -> dict:
+        """
+        Build a transaction operation deleting an item
+        """
+        return {'Delete': {'TableName': cls.__table_name__, 'Key': key}}
 
 
-def create_model(db: boto3.session.Session.resource):
-    return type('Model', (AbstractModel,), {'__db__': db})
+def create_model(database: 'Database'):
+    return type('Model', (AbstractModel,), {'__database__': database})
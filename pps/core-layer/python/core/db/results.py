@@ -3,6 +3,7 @@ from decimal import Decimal
 from typing import List
 
 from .capacity import ConsumedCapacity
+from .wire import decode_item
 
 
 class Result(abc.ABC):
@@ -29,9 +30,9 @@ def clean_item(item: dict):
 
 class QueryResult(Result):
 
-    def __init__(self, result: dict):
+    def __init__(self, result: dict, clean: bool = True):
         uncleaned_items = result.get('Items', [])
-        self.items = [clean_item(item) for item in uncleaned_items]
+        self.items = [clean_item(item) for item in uncleaned_items] if clean else uncleaned_items
         self.count = result.get('Count')
         self.scanned_count = result.get('ScannedCount')
         self.last_evaluated_key = result.get('LastEvaluatedKey')
@@ -52,15 +53,33 @@ class QueryResult(Result):
             "LastEvaluatedKey": last_evaluated_key
         })
 
+    @staticmethod
+    def from_wire(result: dict):
+        """
+        Build a result from a low-level client response, decoding its items straight into native values
+        """
+        return QueryResult({
+            **result,
+            "Items": [decode_item(item) for item in result.get('Items', [])],
+            "LastEvaluatedKey": decode_item(result.get('LastEvaluatedKey'))
+        }, clean=False)
+
 
 class GetResult(Result):
-    def __init__(self, result: dict):
-        self.item = clean_item(result.get("Item"))
+    def __init__(self, result: dict, clean: bool = True):
+        self.item = clean_item(result.get("Item")) if clean else result.get("Item")
         self.metadata = result.get("ResponseMetadata")
 
     @classmethod
     def from_item(cls, item):
         return GetResult({'Item': item})
 
+    @classmethod
+    def from_wire(cls, result: dict):
+        """
+        Build a result from a low-level client response, decoding its item straight into native values
+        """
+        return GetResult({**result, 'Item': decode_item(result.get('Item'))}, clean=False)
+
     def as_dict(self):
         return self.item
@@ -1,9 +1,12 @@
 from abc import ABC
-from typing import Dict, Tuple, List, Any, Union
+from typing import Dict, Tuple, List, Any, Union, Iterator, Callable, Optional
 
+from .batch import BATCH_GET_LIMIT, DEFAULT_MAX_RETRIES, BatchWriter, batch_get_chunk, run_chunks
+from .buffer import write_buffer
 from .db import db
+from .loader import Loader
 from .model import Operator, UpdateReturnValues
-from .results import GetResult
+from .results import GetResult, QueryResult, clean_item
 
 
 class ModelIndex:
@@ -18,7 +21,11 @@ class ModelIndex:
 
     @property
     def client(self):
-        return self._model.get_table().meta.client
+        return self._model.get_table_client()
+
+    @property
+    def table_name(self) -> str:
+        return self._model.__table_name__
 
     def generate_key(self, partition=None, sort=None, full=True):
         keys = dict()
@@ -36,10 +43,7 @@ class ModelIndex:
             keys[self.sort] = sort
         return keys
 
-    def create(self, partition_key, item: dict, sort_key=None, raise_if_exists_partition=False,
-               raise_if_exists_sort=False, conditions: List[str] = None,
-               raise_attribute_equals: dict = None):
-        key = self.generate_key(partition_key, sort_key)
+    def _must_not_exist(self, raise_if_exists_partition: bool, raise_if_exists_sort: bool) -> Optional[List[str]]:
         must_exist = None
         if raise_if_exists_partition or raise_if_exists_sort:
             must_exist = list()
@@ -47,12 +51,42 @@ class ModelIndex:
                 must_exist.append(self.partition)
             if raise_if_exists_sort:
                 must_exist.append(self.sort)
+        return must_exist
+
+    def create(self, partition_key, item: dict, sort_key=None, raise_if_exists_partition=False,
+               raise_if_exists_sort=False, conditions: List[str] = None,
+               raise_attribute_equals: dict = None):
+        key = self.generate_key(partition_key, sort_key)
+        must_exist = self._must_not_exist(raise_if_exists_partition, raise_if_exists_sort)
         add_result = self._model.add({**item, **key}, raise_if_attributes_exist=must_exist, conditions=conditions,
                                      raise_attribute_equals=raise_attribute_equals)
         return GetResult({'Item': add_result})
 
-    def query(self, partition_key, sort_key: Union[List[Tuple[Operator, Any]], Tuple[Operator, Any], Any] = None,
-              limit=None, start_key=None, attributes=None, scan_forward: bool = None):
+    def create_deferred(self, partition_key, item: dict, sort_key=None):
+        """
+        Put an item without conditions through the request's write buffer, which writes it in a batch when the
+        request ends. Outside of a request the item is written right away
+        """
+        if self.index_name is not None:
+            raise ValueError("Items can't be written to an index")
+        key = self.generate_key(partition_key, sort_key)
+        if write_buffer.active:
+            write_buffer.put(self.client, self.table_name, (self.partition, self.sort), {**item, **key})
+        else:
+            self._model.add({**item, **key})
+
+    def create_operation(self, partition_key, item: dict, sort_key=None, raise_if_exists_partition=False,
+                         raise_if_exists_sort=False, conditions: List[str] = None,
+                         raise_attribute_equals: dict = None) -> dict:
+        """
+        Build a transaction operation for transact_write that creates an item
+        """
+        key = self.generate_key(partition_key, sort_key)
+        must_exist = self._must_not_exist(raise_if_exists_partition, raise_if_exists_sort)
+        return self._model.add_operation({**item, **key}, raise_if_attributes_exist=must_exist,
+                                         conditions=conditions, raise_attribute_equals=raise_attribute_equals)
+
+    def _sort_conditions(self, sort_key: Union[List[Tuple[Operator, Any]], Tuple[Operator, Any], Any]):
         if sort_key is None:
             sort_key = []
         if isinstance(sort_key, tuple):
@@ -61,24 +95,133 @@ class ModelIndex:
             sort_key = [(Operator.EQ, sort_key)]
         if len(sort_key) > 0 and self.sort is None:
             raise ValueError("Sort key was given but model does not have a sort key")
-        return self._model.query((self.partition, partition_key), [(self.sort, *s) for s in sort_key],
-                                 limit=limit, start_key=start_key, attributes=attributes, index=self.index_name,
-                                 scan_forward=scan_forward)
+        return [(self.sort, *s) for s in sort_key]
 
-    def get(self, partition_key, sort_key=None, attributes: List[str] = None):
+    def query(self, partition_key, sort_key: Union[List[Tuple[Operator, Any]], Tuple[Operator, Any], Any] = None,
+              limit=None, start_key=None, attributes=None, scan_forward: bool = None, fast: bool = False):
+        return self._model.query((self.partition, partition_key), self._sort_conditions(sort_key),
+                                 limit=limit, start_key=start_key, attributes=attributes, index=self.index_name,
+                                 scan_forward=scan_forward, fast=fast)
+
+    def iter_pages(self, partition_key,
+                   sort_key: Union[List[Tuple[Operator, Any]], Tuple[Operator, Any], Any] = None,
+                   page_size: int = None, start_key=None, attributes=None, scan_forward: bool = None,
+                   max_items: int = None, max_pages: int = None, fast: bool = False) -> Iterator[QueryResult]:
+        return self._model.iter_pages((self.partition, partition_key), self._sort_conditions(sort_key),
+                                      page_size=page_size, start_key=start_key, attributes=attributes,
+                                      index=self.index_name, scan_forward=scan_forward, max_items=max_items,
+                                      max_pages=max_pages, fast=fast)
+
+    def iter_query(self, partition_key,
+                   sort_key: Union[List[Tuple[Operator, Any]], Tuple[Operator, Any], Any] = None,
+                   page_size: int = None, start_key=None, attributes=None, scan_forward: bool = None,
+                   max_items: int = None, max_pages: int = None, fast: bool = False) -> Iterator[dict]:
+        return self._model.iter_query((self.partition, partition_key), self._sort_conditions(sort_key),
+                                      page_size=page_size, start_key=start_key, attributes=attributes,
+                                      index=self.index_name, scan_forward=scan_forward, max_items=max_items,
+                                      max_pages=max_pages, fast=fast)
+
+    def parallel_scan(self, total_segments: int, max_workers: int = None, page_size: int = None,
+                      attributes: List[str] = None) -> Iterator[dict]:
+        return self._model.parallel_scan(total_segments, max_workers=max_workers, page_size=page_size,
+                                         attributes=attributes, index=self.index_name)
+
+    def parallel_scan_each(self, callback: Callable[[dict], Any], total_segments: int, max_workers: int = None,
+                           page_size: int = None, attributes: List[str] = None) -> int:
+        return self._model.parallel_scan_each(callback, total_segments, max_workers=max_workers,
+                                              page_size=page_size, attributes=attributes, index=self.index_name)
+
+    def get(self, partition_key, sort_key=None, attributes: List[str] = None, fast: bool = False):
         key = self.generate_key(partition_key, sort_key)
-        return self._model.get(key=key, attributes=attributes)
+        return self._model.get(key=key, attributes=attributes, fast=fast)
+
+    def _key_tuple(self, key: dict) -> tuple:
+        return (key[self.partition],) if self.sort is None else (key[self.partition], key[self.sort])
+
+    def batch_get(self, keys: List[Any], attributes: List[str] = None, max_workers: int = None,
+                  max_retries: int = DEFAULT_MAX_RETRIES) -> List[Optional[dict]]:
+        """
+        Get many items at once. Each key is a partition key value, or a (partition, sort) tuple if the model has a
+        sort key. Duplicated keys are requested once, the keys are requested in chunks of BATCH_GET_LIMIT (in
+        parallel if there is more than one chunk) and unprocessed keys are retried. The items are returned in the
+        order of the given keys, with None in the place of the items that were not found
+        """
+        if self.index_name is not None:
+            raise ValueError("Items can't be batch-get from an index")
+
+        key_tuples = [tuple(key) if isinstance(key, tuple) else (key,) for key in keys]
+        unique_keys = list(dict.fromkeys(key_tuples))
+
+        projection = None
+        attr_names = None
+        if attributes is not None:
+            attr_names = {}
+            # the keys are always projected to match the items with the requested keys
+            key_attributes = [key for key in (self.partition, self.sort) if key is not None and key not in attributes]
+            projection = ', '.join([self._model.add_to_attribute_names(attr, attr_names)
+                                    for attr in list(attributes) + key_attributes])
+
+        client = self.client
+        table_name = self.table_name
+        chunk_items = run_chunks(
+            lambda chunk: batch_get_chunk(client, table_name, [self.generate_key(*key) for key in chunk],
+                                          projection=projection, attribute_names=attr_names,
+                                          max_retries=max_retries),
+            unique_keys, BATCH_GET_LIMIT, max_workers=max_workers)
+
+        found = {}
+        for items in chunk_items:
+            for item in items:
+                item = clean_item(item)
+                found[self._key_tuple(item)] = item
+        return [found.get(key) for key in key_tuples]
+
+    def loader(self, attributes: List[str] = None, max_workers: int = None) -> Loader:
+        """
+        Create a loader that coalesces point reads on this model into batched reads
+        """
+        if self.index_name is not None:
+            raise ValueError("Items can't be batch-get from an index")
+        return Loader(self, attributes=attributes, max_workers=max_workers)
+
+    def batch_writer(self, max_workers: int = 1, max_retries: int = DEFAULT_MAX_RETRIES) -> BatchWriter:
+        """
+        Create a buffered writer that puts and deletes items in chunked batches, retrying unprocessed items
+        """
+        if self.index_name is not None:
+            raise ValueError("Items can't be batch-written to an index")
+        return BatchWriter(self.client, self.table_name, (self.partition, self.sort),
+                           max_workers=max_workers, max_retries=max_retries)
 
     def delete(self, partition_key, sort_key=None):
         key = self.generate_key(partition_key, sort_key)
         self._model.delete(key)
 
+    def delete_operation(self, partition_key, sort_key=None) -> dict:
+        """
+        Build a transaction operation for transact_write that deletes an item
+        """
+        return self._model.delete_operation(self.generate_key(partition_key, sort_key))
+
     def update(self, partition_key, updates: dict = None, sort_key=None, append_to: dict = None,
                condition_equals: Dict[str, Any] = None, add_to: Dict[str, int] = None, conditions=None,
-               return_values: UpdateReturnValues = UpdateReturnValues.UPDATED_NEW):
+               return_values: UpdateReturnValues = UpdateReturnValues.UPDATED_NEW,
+               append_or_create: Dict[str, list] = None):
         key = self.generate_key(partition_key, sort_key)
         return self._model.update(key, updates=updates, append_to=append_to, condition_equals=condition_equals,
-                                  add_to=add_to, return_values=return_values, conditions=conditions)
+                                  add_to=add_to, return_values=return_values, conditions=conditions,
+                                  append_or_create=append_or_create)
+
+    def update_operation(self, partition_key, updates: dict = None, sort_key=None, append_to: dict = None,
+                         condition_equals: Dict[str, Any] = None, add_to: Dict[str, int] = None,
+                         conditions=None, append_or_create: Dict[str, list] = None) -> dict:
+        """
+        Build a transaction operation for transact_write that updates an item
+        """
+        key = self.generate_key(partition_key, sort_key)
+        return self._model.update_operation(key, updates=updates, append_to=append_to,
+                                            condition_equals=condition_equals, add_to=add_to, conditions=conditions,
+                                            append_or_create=append_or_create)
 
 
 class ModelService(ABC):
@@ -87,17 +230,26 @@ class ModelService(ABC):
     __sort_key__: str = None
     __indices__: Dict[str, Tuple[str, str]] = None
 
+    # interfaces are built once per container, as building one creates a new model class and table resource
+    _interfaces: Dict[Tuple[type, Optional[str]], ModelIndex] = {}
+
     @classmethod
     def exceptions(cls):
         return cls.get_interface().client.exceptions
 
     @classmethod
-    def get_interface(cls, index_name=None):
+    def get_interface(cls, index_name=None) -> ModelIndex:
+        interface = ModelService._interfaces.get((cls, index_name))
+        if interface is not None:
+            return interface
+
         index = cls.__indices__.get(index_name) if cls.__indices__ is not None else None
         if index is None:
             partition, sort = cls.__partition_key__, cls.__sort_key__
         else:
             partition, sort = index
 
-        return ModelIndex(cls.__table_name__, partition_key=partition, sort_key=sort,
-                          index_name=index_name)
+        interface = ModelIndex(cls.__table_name__, partition_key=partition, sort_key=sort,
+                               index_name=index_name)
+        ModelService._interfaces[(cls, index_name)] = interface
+        return interface
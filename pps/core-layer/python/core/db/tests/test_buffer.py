@@ -0,0 +1,93 @@
+from unittest.mock import patch
+
+import pytest
+from botocore.stub import Stubber
+
+from core import HTTPEvent, JSONResponse
+from core.exceptions.invalid import InvalidException
+from core.router.router import Router
+from .. import ModelIndex
+from ..buffer import write_buffer, WriteBufferError
+
+interface = ModelIndex('rewards', 'hash', 'range')
+
+
+@pytest.fixture(scope="function")
+def ddb_stubber():
+    # noinspection PyProtectedMember
+    ddb_stubber = Stubber(interface._model.get_table().meta.client)
+    ddb_stubber.activate()
+    yield ddb_stubber
+    ddb_stubber.deactivate()
+
+
+def test_create_deferred(ddb_stubber):
+    ddb_stubber.add_response('batch_write_item', {}, {'RequestItems': {'rewards': [
+        {'PutRequest': {'Item': {'value': 3, 'hash': 'h2', 'range': 'r'}}},
+        {'PutRequest': {'Item': {'value': 2, 'hash': 'h1', 'range': 'r'}}},
+    ]}})
+
+    with write_buffer.scope():
+        interface.create_deferred('h1', {'value': 1}, 'r')
+        interface.create_deferred('h2', {'value': 3}, 'r')
+        # the last put on a key wins
+        interface.create_deferred('h1', {'value': 2}, 'r')
+        assert len(write_buffer) == 2
+        assert write_buffer.flush().as_dict() == {'items': 2, 'requests': 1, 'retries': 0}
+    ddb_stubber.assert_no_pending_responses()
+
+    # outside of a request items are written right away
+    ddb_stubber.add_response('put_item', {}, {'TableName': 'rewards', 'ReturnValues': 'NONE',
+                                              'Item': {'value': 1, 'hash': 'h', 'range': 'r'}})
+    interface.create_deferred('h', {'value': 1}, 'r')
+    ddb_stubber.assert_no_pending_responses()
+    with pytest.raises(RuntimeError):
+        write_buffer.put(interface.client, 'rewards', ('hash', 'range'), {'hash': 'h', 'range': 'r'})
+
+
+def test_router_flushes(ddb_stubber):
+    router = Router()
+
+    def handler(_):
+        interface.create_deferred('h', {'value': 1}, 'r')
+        return JSONResponse({'message': 'done'})
+
+    router.post('/api/items/', handler, authorized=False)
+    event = HTTPEvent({'httpMethod': 'POST', 'resource': '/api/items/public', 'headers': {}})
+
+    ddb_stubber.add_response('batch_write_item', {}, {'RequestItems': {'rewards': [
+        {'PutRequest': {'Item': {'value': 1, 'hash': 'h', 'range': 'r'}}}
+    ]}})
+    assert router.route(event).status == 200
+    ddb_stubber.assert_no_pending_responses()
+
+    ddb_stubber.add_client_error('batch_write_item', 'InternalServerError')
+    with patch('builtins.print') as log:
+        response = router.route(event)
+    assert response.status == 500
+    assert any('rewards' in call.args[0] and 'failures' in call.args[0] for call in log.call_args_list)
+    assert len(write_buffer) == 0
+
+
+def test_router_discards_on_error(ddb_stubber):
+    router = Router()
+
+    def handler(_):
+        interface.create_deferred('h', {'value': 1}, 'r')
+        raise InvalidException('Not written')
+
+    router.post('/api/items/', handler, authorized=False)
+    response = router.route(HTTPEvent({'httpMethod': 'POST', 'resource': '/api/items/public', 'headers': {}}))
+    assert response.status == 400
+    # nothing is written when the handler fails
+    ddb_stubber.assert_no_pending_responses()
+    assert len(write_buffer) == 0
+
+
+def test_flush_errors(ddb_stubber):
+    ddb_stubber.add_client_error('batch_write_item', 'InternalServerError')
+    with write_buffer.scope():
+        interface.create_deferred('h', {'value': 1}, 'r')
+        with pytest.raises(WriteBufferError) as e:
+            write_buffer.flush()
+    assert [table_name for table_name, _ in e.value.failures] == ['rewards']
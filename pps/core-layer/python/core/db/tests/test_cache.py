@@ -0,0 +1,93 @@
+import pytest
+from botocore.stub import Stubber
+
+from .. import ModelIndex
+from ..cache import IdentityMap, identity_map
+
+interface = ModelIndex('rewards', 'hash', 'range')
+
+
+@pytest.fixture(scope="function")
+def ddb_stubber():
+    # noinspection PyProtectedMember
+    ddb_stubber = Stubber(interface._model.get_table().meta.client)
+    ddb_stubber.activate()
+    yield ddb_stubber
+    ddb_stubber.deactivate()
+
+
+def test_projection_superset():
+    cache = IdentityMap()
+    key = {'hash': 'h', 'range': 'r'}
+    cache.store('rewards', key, {'hash': 'h', 'a': 1})
+    assert cache.lookup('rewards', key) == (False, None)
+
+    with cache.scope():
+        cache.store('rewards', key, {'a': 1, 'b': {'c': 2}}, attributes=['a', 'b'])
+        assert cache.lookup('rewards', key, ['a']) == (True, {'a': 1})
+        assert cache.lookup('rewards', key, ['a', 'd']) == (False, None)
+        assert cache.lookup('rewards', key) == (False, None)
+        assert cache.lookup('rewards', key, ['b.c']) == (False, None)
+
+        found, item = cache.lookup('rewards', key, ['b'])
+        item['b']['c'] = 3
+        assert cache.lookup('rewards', key, ['b']) == (True, {'b': {'c': 2}})
+
+        cache.store('rewards', key, {'d': 4}, attributes=['d'])
+        assert cache.lookup('rewards', key, ['a', 'd']) == (True, {'a': 1, 'd': 4})
+
+        cache.store('rewards', {'hash': 'missing', 'range': 'r'}, None, attributes=['a'])
+        assert cache.lookup('rewards', {'hash': 'missing', 'range': 'r'}) == (True, None)
+
+        cache.invalidate_item('rewards', {'hash': 'h', 'range': 'r', 'a': 5})
+        assert cache.lookup('rewards', key, ['a']) == (False, None)
+    assert cache.lookup('rewards', {'hash': 'missing', 'range': 'r'}) == (False, None)
+
+
+def test_get_is_cached_in_scope(ddb_stubber):
+    get_params = {
+        'TableName': 'rewards',
+        'Key': {'hash': 'value_h', 'range': 'value_r'}
+    }
+
+    def get_response():
+        return {'Item': {'hash': {'S': 'value_h'}, 'range': {'S': 'value_r'}, 'value': {'N': '1'}}}
+
+    ddb_stubber.add_response('get_item', get_response(), get_params)
+    ddb_stubber.add_response('update_item', {}, {
+        'TableName': 'rewards',
+        'Key': {'hash': 'value_h', 'range': 'value_r'},
+        'UpdateExpression': 'ADD #attr_value :val_value',
+        'ExpressionAttributeNames': {'#attr_value': 'value'},
+        'ExpressionAttributeValues': {':val_value': 1},
+        'ReturnValues': 'UPDATED_NEW'
+    })
+    ddb_stubber.add_response('get_item', get_response(), get_params)
+
+    with identity_map.scope():
+        assert interface.get('value_h', 'value_r').item['value'] == 1
+        assert interface.get('value_h', 'value_r', attributes=['value']).item == {'value': 1}
+        interface.update('value_h', sort_key='value_r', add_to={'value': 1})
+        interface.get('value_h', 'value_r')
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_fast_get_skips_cache(ddb_stubber):
+    # noinspection PyProtectedMember
+    client_stubber = Stubber(interface._model.get_client())
+    client_stubber.activate()
+    ddb_stubber.add_response('get_item', {'Item': {'hash': {'S': 'value_h'}, 'range': {'S': 'value_r'},
+                                                   'value': {'N': '1'}}},
+                             {'TableName': 'rewards', 'Key': {'hash': 'value_h', 'range': 'value_r'}})
+    client_stubber.add_response('get_item', {'Item': {'value': {'N': '1'}}}, {
+        'TableName': 'rewards',
+        'Key': {'hash': {'S': 'value_h'}, 'range': {'S': 'value_r'}}
+    })
+
+    with identity_map.scope():
+        interface.get('value_h', 'value_r')
+        # read again with native numbers instead of the cached ones
+        assert type(interface.get('value_h', 'value_r', fast=True).item['value']) is int
+    ddb_stubber.assert_no_pending_responses()
+    client_stubber.assert_no_pending_responses()
+    client_stubber.deactivate()
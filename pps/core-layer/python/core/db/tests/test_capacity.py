@@ -0,0 +1,78 @@
+import pytest
+from botocore.stub import Stubber
+
+from .. import ModelIndex
+from ..capacity import CapacityTracker, ConsumedCapacity, capacity_tracker, _request_consumed_capacity
+
+interface = ModelIndex('rewards', 'hash', 'range')
+
+
+@pytest.fixture(scope="function")
+def ddb_stubber():
+    # noinspection PyProtectedMember
+    ddb_stubber = Stubber(interface._model.get_table().meta.client)
+    ddb_stubber.activate()
+    yield ddb_stubber
+    ddb_stubber.deactivate()
+
+
+def test_from_dict_partial():
+    capacity = ConsumedCapacity.from_dict({'TableName': 'rewards', 'CapacityUnits': 0.5})
+    assert capacity.table_name == 'rewards'
+    assert capacity.total.all == 0.5
+    assert capacity.total.read is None
+    assert capacity.table is None
+    assert capacity.global_secondary_indexes is None
+
+
+def test_tracker():
+    tracker = CapacityTracker()
+    tracker.record('Query', {'TableName': 'logs', 'CapacityUnits': 0.5})
+    tracker.record('BatchWriteItem', [{'TableName': 'logs', 'CapacityUnits': 2.0},
+                                      {'TableName': 'tasks', 'CapacityUnits': 1.0}])
+    tracker.record('GetItem', None)
+    assert tracker.read == 0.5
+    assert tracker.write == 3.0
+    assert tracker.summary() == {
+        'requests': 3,
+        'read': 0.5,
+        'write': 3.0,
+        'tables': {'logs': {'read': 0.5, 'write': 2.0}, 'tasks': {'read': 0.0, 'write': 1.0}}
+    }
+    metrics = tracker.metrics('GET /api/logs')
+    assert metrics['Route'] == 'GET /api/logs'
+    assert metrics['ReadCapacityUnits'] == 0.5
+    assert metrics['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Route']]
+
+    tracker.reset()
+    assert tracker.summary() == {'requests': 0, 'read': 0, 'write': 0, 'tables': {}}
+
+
+def test_capacity_is_tracked(ddb_stubber):
+    ddb_stubber.add_response('get_item', {
+        'Item': {'hash': {'S': 'h'}, 'range': {'S': 'r'}},
+        'ConsumedCapacity': {'TableName': 'rewards', 'CapacityUnits': 0.5}
+    }, {'TableName': 'rewards', 'Key': {'hash': 'h', 'range': 'r'}})
+    ddb_stubber.add_response('put_item', {
+        'ConsumedCapacity': {'TableName': 'rewards', 'CapacityUnits': 1.0}
+    }, {'TableName': 'rewards', 'Item': {'hash': 'h', 'range': 'r'}, 'ReturnValues': 'NONE'})
+
+    capacity_tracker.reset()
+    interface.get('h', 'r')
+    interface.create('h', {}, 'r')
+    assert capacity_tracker.summary() == {
+        'requests': 2,
+        'read': 0.5,
+        'write': 1.0,
+        'tables': {'rewards': {'read': 0.5, 'write': 1.0}}
+    }
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_capacity_is_requested():
+    params = {'TableName': 'rewards'}
+    _request_consumed_capacity(params)
+    assert params == {'TableName': 'rewards', 'ReturnConsumedCapacity': 'TOTAL'}
+    params = {'ReturnConsumedCapacity': 'INDEXES'}
+    _request_consumed_capacity(params)
+    assert params == {'ReturnConsumedCapacity': 'INDEXES'}
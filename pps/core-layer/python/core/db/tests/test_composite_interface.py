@@ -1,9 +1,13 @@
+from unittest.mock import patch
+
 import pytest
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Key, Attr
 from botocore.stub import Stubber
 
 from .. import ModelIndex
+from ..batch import UnprocessedKeysError, UnprocessedItemsError
 from ..model import Operator
+from ..transaction import TransactionCanceledError, transact_write
 
 interface = ModelIndex('rewards', 'hash', 'range')
 
@@ -145,3 +149,149 @@ def test_update(ddb_stubber):
                      condition_equals={'key_c': 'value_c'})
 
     ddb_stubber.assert_no_pending_responses()
+
+
+def test_iter_query(ddb_stubber):
+    query_params = {
+        'TableName': 'rewards',
+        'KeyConditionExpression': Key('hash').eq('value_h') & Key('range').begins_with('val')
+    }
+    ddb_stubber.add_response('query', {
+        'Items': [{'hash': {'S': 'value_h'}, 'range': {'S': 'value_r'}}],
+        'LastEvaluatedKey': {'hash': {'S': 'value_h'}, 'range': {'S': 'value_r'}}
+    }, query_params)
+    ddb_stubber.add_response('query', {
+        'Items': [{'hash': {'S': 'value_h'}, 'range': {'S': 'value_r_2'}}]
+    }, {**query_params, 'ExclusiveStartKey': {'hash': 'value_h', 'range': 'value_r'}})
+
+    items = list(interface.iter_query('value_h', (Operator.BEGINS_WITH, 'val')))
+    assert [item['range'] for item in items] == ['value_r', 'value_r_2']
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_batch_get(ddb_stubber):
+    def wire_item(h, r):
+        return {'hash': {'S': h}, 'range': {'S': r}, 'value': {'N': '1'}}
+
+    ddb_stubber.add_response('batch_get_item', {
+        'Responses': {'rewards': [wire_item('h2', 'r2')]},
+        'UnprocessedKeys': {'rewards': {'Keys': [{'hash': {'S': 'h1'}, 'range': {'S': 'r1'}}]}}
+    }, {'RequestItems': {'rewards': {'Keys': [
+        {'hash': 'h1', 'range': 'r1'},
+        {'hash': 'h2', 'range': 'r2'},
+        {'hash': 'h3', 'range': 'r3'},
+    ]}}})
+    ddb_stubber.add_response('batch_get_item', {
+        'Responses': {'rewards': [wire_item('h1', 'r1')]},
+    }, {'RequestItems': {'rewards': {'Keys': [{'hash': 'h1', 'range': 'r1'}]}}})
+
+    with patch('core.db.batch.time.sleep') as sleep:
+        items = interface.batch_get([('h1', 'r1'), ('h2', 'r2'), ('h1', 'r1'), ('h3', 'r3')])
+        sleep.assert_called_once()
+    assert [item['hash'] if item is not None else None for item in items] == ['h1', 'h2', 'h1', None]
+    assert items[0]['value'] == 1
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_batch_get_chunks(ddb_stubber):
+    keys = [(f'h{i}', 'r') for i in range(150)]
+    ddb_stubber.add_response('batch_get_item', {'Responses': {'rewards': []}}, {'RequestItems': {'rewards': {
+        'Keys': [{'hash': h, 'range': r} for h, r in keys[:100]],
+        'ProjectionExpression': '#attr_value, #attr_hash, #attr_range',
+        'ExpressionAttributeNames': {'#attr_value': 'value', '#attr_hash': 'hash', '#attr_range': 'range'}
+    }}})
+    ddb_stubber.add_response('batch_get_item', {'Responses': {'rewards': []}}, {'RequestItems': {'rewards': {
+        'Keys': [{'hash': h, 'range': r} for h, r in keys[100:]],
+        'ProjectionExpression': '#attr_value, #attr_hash, #attr_range',
+        'ExpressionAttributeNames': {'#attr_value': 'value', '#attr_hash': 'hash', '#attr_range': 'range'}
+    }}})
+    assert interface.batch_get(keys, attributes=['value'], max_workers=1) == [None] * 150
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_batch_get_unprocessed(ddb_stubber):
+    for _ in range(2):
+        ddb_stubber.add_response('batch_get_item', {
+            'UnprocessedKeys': {'rewards': {'Keys': [{'hash': {'S': 'h1'}, 'range': {'S': 'r1'}}]}}
+        }, {'RequestItems': {'rewards': {'Keys': [{'hash': 'h1', 'range': 'r1'}]}}})
+    with patch('core.db.batch.time.sleep'):
+        with pytest.raises(UnprocessedKeysError):
+            interface.batch_get([('h1', 'r1')], max_retries=1)
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_batch_writer(ddb_stubber):
+    items = [{'hash': f'h{i}', 'range': 'r', 'value': i} for i in range(30)]
+    requests = [{'PutRequest': {'Item': item}} for item in items]
+    ddb_stubber.add_response('batch_write_item', {
+        'UnprocessedItems': {'rewards': [{'PutRequest': {'Item': {'hash': {'S': 'h0'}, 'range': {'S': 'r'},
+                                                                  'value': {'N': '0'}}}}]}
+    }, {'RequestItems': {'rewards': requests[:25]}})
+    ddb_stubber.add_response('batch_write_item', {}, {'RequestItems': {'rewards': requests[:1]}})
+    ddb_stubber.add_response('batch_write_item', {}, {'RequestItems': {'rewards': requests[25:29] + [
+        {'DeleteRequest': {'Key': {'hash': 'h29', 'range': 'r'}}}
+    ]}})
+
+    with patch('core.db.batch.time.sleep') as sleep:
+        with interface.batch_writer() as writer:
+            for item in items:
+                writer.put(item)
+            # the first chunk is written as soon as it is full
+            assert len(writer) == 5
+            writer.delete({'hash': 'h29', 'range': 'r'})
+        sleep.assert_called_once()
+
+    assert writer.stats.as_dict() == {'items': 30, 'requests': 3, 'retries': 1}
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_batch_writer_unprocessed(ddb_stubber):
+    for _ in range(2):
+        ddb_stubber.add_response('batch_write_item', {
+            'UnprocessedItems': {'rewards': [{'DeleteRequest': {'Key': {'hash': {'S': 'h'}, 'range': {'S': 'r'}}}}]}
+        }, {'RequestItems': {'rewards': [{'DeleteRequest': {'Key': {'hash': 'h', 'range': 'r'}}}]}})
+
+    writer = interface.batch_writer(max_retries=1)
+    writer.delete({'hash': 'h', 'range': 'r'})
+    with patch('core.db.batch.time.sleep'):
+        with pytest.raises(UnprocessedItemsError):
+            writer.flush()
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_transact_write(ddb_stubber):
+    operations = [
+        interface.create_operation('h', {'value': 1}, 'r1', raise_if_exists_sort=True),
+        interface.update_operation('h', {'value': 2}, 'r2', conditions=Attr('value').eq(1)),
+        interface.delete_operation('h', 'r3'),
+    ]
+    ddb_stubber.add_response('transact_write_items', {}, {'TransactItems': [
+        {'Put': {
+            'TableName': 'rewards',
+            'Item': {'hash': 'h', 'range': 'r1', 'value': 1},
+            'ConditionExpression': 'attribute_not_exists(range)'
+        }},
+        {'Update': {
+            'TableName': 'rewards',
+            'Key': {'hash': 'h', 'range': 'r2'},
+            'UpdateExpression': 'SET #attr_value=:val_value',
+            'ConditionExpression': '#n0 = :v0',
+            'ExpressionAttributeNames': {'#attr_value': 'value', '#n0': 'value'},
+            'ExpressionAttributeValues': {':val_value': 2, ':v0': 1}
+        }},
+        {'Delete': {'TableName': 'rewards', 'Key': {'hash': 'h', 'range': 'r3'}}},
+    ]})
+    transact_write(operations)
+
+    ddb_stubber.add_client_error('transact_write_items', 'TransactionCanceledException', response_meta={},
+                                 modeled_fields={'CancellationReasons': [
+                                     {'Code': 'None'}, {'Code': 'ConditionalCheckFailed'}, {'Code': 'None'}
+                                 ]})
+    with pytest.raises(TransactionCanceledError) as e:
+        transact_write(operations)
+    assert e.value.reasons == [None, 'ConditionalCheckFailed', None]
+    assert e.value.failed(1) and not e.value.failed(0)
+
+    with pytest.raises(ValueError):
+        transact_write([interface.delete_operation('h', str(i)) for i in range(101)])
+    ddb_stubber.assert_no_pending_responses()
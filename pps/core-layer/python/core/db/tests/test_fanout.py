@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+from ..db import Database, BACKEND_MEMORY
+from ..fanout import FanOut, gather
+
+
+def test_gather_order_and_limit():
+    lock = threading.Lock()
+    state = {'running': 0, 'max': 0}
+
+    def call(i):
+        def run():
+            with lock:
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+            time.sleep(0.01 * (5 - i % 5))
+            with lock:
+                state['running'] -= 1
+            return i
+
+        return run
+
+    assert gather(*[call(i) for i in range(20)], max_in_flight=4) == list(range(20))
+    assert 1 < state['max'] <= 4
+    assert gather() == []
+    assert gather(call(3), max_in_flight=1) == [3]
+
+
+def test_gather_errors():
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        gather(lambda: 1, fail, lambda: 3)
+    with pytest.raises(ValueError):
+        gather(lambda: 1, fail, max_in_flight=1)
+
+    results = gather(lambda: 1, fail, lambda: 3, return_exceptions=True)
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], ValueError)
+
+
+def test_cancel_on_error():
+    started = threading.Event()
+    with pytest.raises(ValueError):
+        with FanOut(max_in_flight=1) as fanout:
+            # the only worker is busy while the fan-out exits, so the second call hasn't started
+            running = fanout.submit(lambda: started.set() or time.sleep(0.1))
+            pending = fanout.submit(lambda: 2)
+            started.wait(1)
+            raise ValueError("failed")
+    assert running.done() and not running.cancelled()
+    assert pending.cancelled()
+
+
+def test_completed_in_finish_order():
+    with FanOut(max_in_flight=3) as fanout:
+        finished = list(fanout.completed(lambda i: time.sleep(0.02 * i) or i * 10, [3, 1, 2]))
+    assert finished == [(1, 10), (2, 20), (3, 30)]
+
+
+def test_index_fan_out():
+    memory = Database(BACKEND_MEMORY)
+
+    class Logs(memory.Model):
+        __table_name__ = 'logs'
+
+    with FanOut(max_in_flight=4) as fanout:
+        logs = fanout.index(Logs)
+        writes = [fanout.submit(Logs.add, {'user': f'u{i % 3}', 'tag': f't{i}'}) for i in range(9)]
+        for write in writes:
+            write.result()
+        queries = [logs.query(('user', f'u{i}')) for i in range(3)]
+        assert [len(query.result().items) for query in queries] == [3, 3, 3]
+        assert logs.get({'user': 'u1', 'tag': 't4'}).result().item == {'user': 'u1', 'tag': 't4'}
+        assert list(fanout.map(lambda i: Logs.get({'user': 'u0', 'tag': f't{i}'}).item, [0, 3])) == [
+            {'user': 'u0', 'tag': 't0'}, {'user': 'u0', 'tag': 't3'}]
+        with pytest.raises(AttributeError):
+            logs.scan()
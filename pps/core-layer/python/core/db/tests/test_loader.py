@@ -0,0 +1,54 @@
+import pytest
+from botocore.stub import Stubber
+
+from .. import ModelIndex
+from ..cache import identity_map
+
+interface = ModelIndex('rewards', 'hash', 'range')
+
+
+@pytest.fixture(scope="function")
+def ddb_stubber():
+    # noinspection PyProtectedMember
+    ddb_stubber = Stubber(interface._model.get_table().meta.client)
+    ddb_stubber.activate()
+    yield ddb_stubber
+    ddb_stubber.deactivate()
+
+
+def test_load(ddb_stubber):
+    ddb_stubber.add_response('batch_get_item', {
+        'Responses': {'rewards': [
+            {'hash': {'S': 'h2'}, 'range': {'S': 'r'}, 'value': {'N': '2'}},
+            {'hash': {'S': 'h1'}, 'range': {'S': 'r'}, 'value': {'N': '1'}},
+        ]}
+    }, {'RequestItems': {'rewards': {'Keys': [
+        {'hash': 'h1', 'range': 'r'},
+        {'hash': 'h2', 'range': 'r'},
+        {'hash': 'h3', 'range': 'r'},
+    ]}}})
+
+    loader = interface.loader()
+    first = loader.load('h1', 'r')
+    second, third = loader.load_many([('h2', 'r'), ('h3', 'r')])
+    assert loader.load('h1', 'r') is first
+    assert not first.resolved
+
+    assert second.item['value'] == 2
+    assert first.resolved and third.resolved
+    assert first.item['value'] == 1
+    assert third.result().item is None
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_load_uses_identity_map(ddb_stubber):
+    ddb_stubber.add_response('batch_get_item', {
+        'Responses': {'rewards': [{'hash': {'S': 'h1'}, 'range': {'S': 'r'}, 'value': {'N': '1'}}]}
+    }, {'RequestItems': {'rewards': {'Keys': [{'hash': 'h1', 'range': 'r'}]}}})
+
+    with identity_map.scope():
+        assert interface.loader().load('h1', 'r').item['value'] == 1
+        # served by the identity map, without another request
+        assert interface.loader().load('h1', 'r').item['value'] == 1
+        assert interface.get('h1', 'r').item['value'] == 1
+    ddb_stubber.assert_no_pending_responses()
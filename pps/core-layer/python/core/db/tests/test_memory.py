@@ -0,0 +1,179 @@
+import pytest
+from boto3.dynamodb.conditions import Attr
+
+from ..db import Database, BACKEND_MEMORY
+from ..model import Operator
+
+memory = Database(BACKEND_MEMORY)
+
+
+class Beneficiaries(memory.Model):
+    __table_name__ = 'beneficiaries'
+
+
+class Logs(memory.Model):
+    __table_name__ = 'logs'
+
+
+@pytest.fixture(autouse=True)
+def empty_tables():
+    memory.engine.clear()
+    # table resources are cached per model class
+    Beneficiaries._table = None
+    Logs._table = None
+    yield
+
+
+def add_logs():
+    for i in range(5):
+        Logs.add({'user': 'u', 'tag': f'STATS::PROGRESS::{i}', 'timestamp': i, 'data': {'n': i}})
+    Logs.add({'user': 'u', 'tag': 'REWARD::AVATAR::1', 'timestamp': 10})
+    Logs.add({'user': 'other', 'tag': 'STATS::PROGRESS::0', 'timestamp': 0})
+
+
+def test_tables_from_template():
+    assert {'beneficiaries', 'logs', 'tasks', 'rewards', 'districts', 'groups'}.issubset(memory.engine.tables)
+    assert 'ByGroup' in memory.engine.tables['beneficiaries'].indices
+
+
+def test_put_get():
+    Logs.add({'user': 'u', 'tag': 't', 'data': {'a': [1, 2]}})
+    item = Logs.get({'user': 'u', 'tag': 't'}).item
+    assert item == {'user': 'u', 'tag': 't', 'data': {'a': [1, 2]}}
+    assert Logs.get({'user': 'u', 'tag': 'missing'}).item is None
+    assert Logs.get({'user': 'u', 'tag': 't'}, attributes=['data.a']).item == {'data': {'a': [1, 2]}}
+
+    with pytest.raises(memory.client.exceptions.ConditionalCheckFailedException):
+        Logs.add({'user': 'u', 'tag': 't'}, raise_if_attributes_exist=['tag'])
+    with pytest.raises(memory.client.exceptions.ClientError):
+        Logs.add({'user': 'u'})
+
+
+def test_query():
+    add_logs()
+    result = Logs.query(('user', 'u'), ('tag', Operator.BEGINS_WITH, 'STATS::'), attributes=['tag', 'timestamp'])
+    assert [item['tag'] for item in result.items] == [f'STATS::PROGRESS::{i}' for i in range(5)]
+    assert result.items[0] == {'tag': 'STATS::PROGRESS::0', 'timestamp': 0}
+    assert result.last_evaluated_key is None
+
+    result = Logs.query(('user', 'u'), ('tag', Operator.BETWEEN, 'STATS::PROGRESS::1', 'STATS::PROGRESS::3'),
+                        scan_forward=False)
+    assert [item['timestamp'] for item in result.items] == [3, 2, 1]
+
+    pages = list(Logs.iter_pages(('user', 'u'), page_size=2, scan_forward=False))
+    assert [len(page.items) for page in pages] == [2, 2, 2, 0]
+    assert [item['tag'] for page in pages for item in page.items][0] == 'STATS::PROGRESS::4'
+    assert len(list(Logs.iter_query(('user', 'u'), page_size=4))) == 6
+
+    fast = Logs.query(('user', 'u'), ('tag', Operator.BEGINS_WITH, 'STATS::'), limit=1, fast=True)
+    assert fast.items == [{'user': 'u', 'tag': 'STATS::PROGRESS::0', 'timestamp': 0, 'data': {'n': 0}}]
+    assert fast.last_evaluated_key == {'user': 'u', 'tag': 'STATS::PROGRESS::0'}
+
+
+def test_index_query():
+    for unit, user in (('scouts', 'b'), ('guides', 'a'), ('scouts', 'a')):
+        Beneficiaries.add({'user': f'{unit}-{user}', 'group': 'district::group', 'unit-user': f'{unit}::{user}',
+                           'nickname': user, 'bought_items': {}})
+    Beneficiaries.add({'user': 'no-group', 'nickname': 'c'})
+
+    result = Beneficiaries.query(('group', 'district::group'), ('unit-user', Operator.BEGINS_WITH, 'scouts::'),
+                                 index='ByGroup')
+    assert [item['unit-user'] for item in result.items] == ['scouts::a', 'scouts::b']
+    # bought_items is not projected to the index
+    assert 'bought_items' not in result.items[0]
+
+    first = Beneficiaries.query(('group', 'district::group'), index='ByGroup', limit=1)
+    assert first.last_evaluated_key == {'user': 'guides-a', 'group': 'district::group', 'unit-user': 'guides::a'}
+    rest = Beneficiaries.query(('group', 'district::group'), index='ByGroup', start_key=first.last_evaluated_key)
+    assert [item['user'] for item in rest.items] == ['scouts-a', 'scouts-b']
+
+
+def test_update():
+    Beneficiaries.add({'user': 'u', 'score': {'corporality': 1}, 'target': {'tasks': []}, 'generated_token_last': -1})
+    result = Beneficiaries.update({'user': 'u'}, updates={'target.objective': 'o'},
+                                  append_to={'target.tasks': [{'completed': False}]},
+                                  add_to={'score.corporality': 2, 'generated_token_last': 1},
+                                  conditions=Attr('target').ne(None))
+    assert result['Attributes'] == {'target': {'objective': 'o', 'tasks': [{'completed': False}]},
+                                    'score': {'corporality': 3}, 'generated_token_last': 0}
+
+    Beneficiaries.update({'user': 'u'}, updates={'target': None}, condition_equals={'generated_token_last': 0})
+    assert Beneficiaries.get({'user': 'u'}).item['target'] is None
+
+    with pytest.raises(memory.client.exceptions.ConditionalCheckFailedException):
+        Beneficiaries.update({'user': 'u'}, updates={'nickname': 'n'}, condition_equals={'generated_token_last': 5})
+    with pytest.raises(memory.client.exceptions.ConditionalCheckFailedException):
+        Beneficiaries.update({'user': 'u'}, updates={'target': {}}, conditions=Attr('target').ne(None))
+
+
+def test_update_append_or_create():
+    for n in range(2):
+        Logs.update({'user': 'GROUP::d::g', 'tag': 'MEMBER::u'}, updates={'unit': 'scouts'},
+                    append_or_create={'completed': [{'n': n}], 'progress': []})
+    item = Logs.get({'user': 'GROUP::d::g', 'tag': 'MEMBER::u'}).item
+    assert item['completed'] == [{'n': 0}, {'n': 1}]
+    assert item['progress'] == []
+    assert item['unit'] == 'scouts'
+
+    # updates create missing items
+    Beneficiaries.update({'user': 'new'}, add_to={'generated_token_last': 1})
+    assert Beneficiaries.get({'user': 'new'}).item == {'user': 'new', 'generated_token_last': 1}
+
+
+def test_update_nested_condition():
+    key = {'user': 'INVENTORY::u', 'tag': 'AVATAR'}
+    # the condition fails before the path to the missing map is resolved
+    with pytest.raises(memory.client.exceptions.ConditionalCheckFailedException):
+        Logs.update(key, updates={'rewards.1': {'id': 1}}, add_to={'counts.1': 1},
+                    conditions='attribute_exists(#attr_rewards)')
+    Logs.add({**key, 'rewards': {}, 'counts': {}})
+    for _ in range(2):
+        Logs.update(key, updates={'rewards.1': {'id': 1}}, add_to={'counts.1': 1},
+                    conditions='attribute_exists(#attr_rewards)')
+    assert Logs.get(key).item == {**key, 'rewards': {'1': {'id': 1}}, 'counts': {'1': 2}}
+
+
+def test_delete_and_scan():
+    add_logs()
+    Logs.delete({'user': 'u', 'tag': 'REWARD::AVATAR::1'})
+    assert Logs.get({'user': 'u', 'tag': 'REWARD::AVATAR::1'}).item is None
+    items = list(Logs.parallel_scan(3, page_size=2))
+    assert len(items) == 6
+    assert len({(item['user'], item['tag']) for item in items}) == 6
+
+
+def test_batch_and_transactions():
+    client = memory.client
+    client.batch_write_item(RequestItems={'logs': [
+        {'PutRequest': {'Item': {'user': 'u', 'tag': str(i)}}} for i in range(3)
+    ]})
+    response = client.batch_get_item(RequestItems={'logs': {'Keys': [{'user': 'u', 'tag': str(i)} for i in range(4)]}})
+    assert sorted(item['tag'] for item in response['Responses']['logs']) == ['0', '1', '2']
+
+    client.transact_write_items(TransactItems=[
+        {'Put': {'TableName': 'logs', 'Item': {'user': 'u', 'tag': '3'}}},
+        {'Delete': {'TableName': 'logs', 'Key': {'user': 'u', 'tag': '0'}}},
+    ])
+    with pytest.raises(client.exceptions.TransactionCanceledException) as e:
+        client.transact_write_items(TransactItems=[
+            {'Put': {'TableName': 'logs', 'Item': {'user': 'u', 'tag': '4'}}},
+            {'Put': {'TableName': 'logs', 'Item': {'user': 'u', 'tag': '1'},
+                     'ConditionExpression': 'attribute_not_exists(tag)'}},
+        ])
+    assert [reason['Code'] for reason in e.value.response['CancellationReasons']] == ['None', 'ConditionalCheckFailed']
+    assert sorted(item['tag'] for item in Logs.query(('user', 'u')).items) == ['1', '2', '3']
+
+
+def test_consumed_capacity():
+    response = memory.client.put_item(TableName='logs', Item={'user': 'u', 'tag': 't'},
+                                      ReturnConsumedCapacity='TOTAL')
+    assert response['ConsumedCapacity'] == {'TableName': 'logs', 'CapacityUnits': 1.0}
+    response = memory.client.get_item(TableName='logs', Key={'user': 'u', 'tag': 't'}, ReturnConsumedCapacity='TOTAL')
+    assert response['ConsumedCapacity'] == {'TableName': 'logs', 'CapacityUnits': 0.5}
+
+
+def test_lazy_clients():
+    database = Database(BACKEND_MEMORY)
+    assert database._db is None and database._client is None
+    assert database.resource is database.resource
+    assert database.wire_client is not memory.wire_client
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 from boto3.dynamodb.conditions import Key
 from botocore.stub import Stubber
@@ -117,3 +119,122 @@ def test_update(ddb_stubber):
     ddb_stubber.add_response('update_item', update_response, update_params)
     ItemsModel.update(key={'hash': 'value_h'}, updates={'key_a': 'value_a', 'key_b': 'value_b'})
     ddb_stubber.assert_no_pending_responses()
+
+
+def test_iter_pages(ddb_stubber):
+    first_params = {
+        'TableName': 'rewards',
+        'KeyConditionExpression': Key('hash').eq('value_h'),
+    }
+    first_response = {
+        'Items': [{'hash': {'S': 'value_h'}, 'range': {'N': '1'}}],
+        'LastEvaluatedKey': {'hash': {'S': 'value_h'}, 'range': {'N': '1'}}
+    }
+    second_params = {
+        'TableName': 'rewards',
+        'KeyConditionExpression': Key('hash').eq('value_h'),
+        'ExclusiveStartKey': {'hash': 'value_h', 'range': 1}
+    }
+    second_response = {
+        'Items': [{'hash': {'S': 'value_h'}, 'range': {'N': '2'}}, {'hash': {'S': 'value_h'}, 'range': {'N': '3'}}]
+    }
+    ddb_stubber.add_response('query', first_response, first_params)
+    ddb_stubber.add_response('query', second_response, second_params)
+
+    pages = ItemsModel.iter_pages(('hash', 'value_h'))
+    assert [item['range'] for item in next(pages).items] == [1]
+    # the next page is only requested when it is consumed
+    with pytest.raises(AssertionError):
+        ddb_stubber.assert_no_pending_responses()
+    assert [item['range'] for item in next(pages).items] == [2, 3]
+    with pytest.raises(StopIteration):
+        next(pages)
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_iter_query_budget(ddb_stubber):
+    first_params = {
+        'TableName': 'rewards',
+        'KeyConditionExpression': Key('hash').eq('value_h'),
+        'Limit': 3
+    }
+
+    def first_response():
+        return {
+            'Items': [{'hash': {'S': 'value_h'}, 'range': {'N': '1'}}, {'hash': {'S': 'value_h'}, 'range': {'N': '2'}}],
+            'LastEvaluatedKey': {'hash': {'S': 'value_h'}, 'range': {'N': '2'}}
+        }
+
+    second_params = {
+        'TableName': 'rewards',
+        'KeyConditionExpression': Key('hash').eq('value_h'),
+        'ExclusiveStartKey': {'hash': 'value_h', 'range': 2},
+        'Limit': 1
+    }
+    second_response = {
+        'Items': [{'hash': {'S': 'value_h'}, 'range': {'N': '3'}}],
+        'LastEvaluatedKey': {'hash': {'S': 'value_h'}, 'range': {'N': '3'}}
+    }
+    ddb_stubber.add_response('query', first_response(), first_params)
+    ddb_stubber.add_response('query', second_response, second_params)
+
+    items = list(ItemsModel.iter_query(('hash', 'value_h'), max_items=3))
+    assert [item['range'] for item in items] == [1, 2, 3]
+    ddb_stubber.assert_no_pending_responses()
+
+    ddb_stubber.add_response('query', first_response(), {**first_params, 'Limit': 2})
+    items = list(ItemsModel.iter_query(('hash', 'value_h'), page_size=2, max_pages=1))
+    assert [item['range'] for item in items] == [1, 2]
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_parallel_scan(ddb_stubber):
+    def scan_response(*ranges, last_range=None):
+        response = {'Items': [{'hash': {'S': 'value_h'}, 'range': {'N': str(r)}} for r in ranges]}
+        if last_range is not None:
+            response['LastEvaluatedKey'] = {'hash': {'S': 'value_h'}, 'range': {'N': str(last_range)}}
+        return response
+
+    ddb_stubber.add_response('scan', scan_response(1, 2, last_range=2),
+                             {'TableName': 'rewards', 'Segment': 0, 'TotalSegments': 2})
+    ddb_stubber.add_response('scan', scan_response(3),
+                             {'TableName': 'rewards', 'Segment': 0, 'TotalSegments': 2,
+                              'ExclusiveStartKey': {'hash': 'value_h', 'range': 2}})
+    ddb_stubber.add_response('scan', scan_response(4),
+                             {'TableName': 'rewards', 'Segment': 1, 'TotalSegments': 2})
+
+    items = list(ItemsModel.parallel_scan(total_segments=2, max_workers=1))
+    assert sorted(item['range'] for item in items) == [1, 2, 3, 4]
+    ddb_stubber.assert_no_pending_responses()
+
+    ddb_stubber.add_response('scan', scan_response(1, 2),
+                             {'TableName': 'rewards', 'Segment': 0, 'TotalSegments': 2, 'Limit': 10})
+    ddb_stubber.add_response('scan', scan_response(3),
+                             {'TableName': 'rewards', 'Segment': 1, 'TotalSegments': 2, 'Limit': 10})
+    seen = []
+    count = ItemsModel.parallel_scan_each(lambda item: seen.append(item['range']), total_segments=2, max_workers=1,
+                                          page_size=10)
+    assert count == 3
+    assert sorted(seen) == [1, 2, 3]
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_parallel_scan_concurrent():
+    client = ItemsModel.get_table().meta.client
+    calls = []
+
+    def scan(**kwargs):
+        calls.append(kwargs['Segment'])
+        if kwargs['Segment'] == 3:
+            raise RuntimeError('Segment failed')
+        return {'Items': [{'segment': kwargs['Segment']}]}
+
+    with patch.object(client, 'scan', side_effect=scan):
+        items = list(ItemsModel.parallel_scan(total_segments=3))
+        assert sorted(item['segment'] for item in items) == [0, 1, 2]
+
+        with pytest.raises(RuntimeError):
+            list(ItemsModel.parallel_scan(total_segments=4, max_workers=2))
+
+    with pytest.raises(ValueError):
+        list(ItemsModel.parallel_scan(total_segments=0))
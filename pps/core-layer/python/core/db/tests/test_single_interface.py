@@ -2,7 +2,7 @@ import pytest
 from boto3.dynamodb.conditions import Key
 from botocore.stub import Stubber
 
-from .. import ModelIndex
+from .. import ModelIndex, ModelService
 
 interface = ModelIndex('rewards', 'hash')
 
@@ -129,3 +129,20 @@ def test_update(ddb_stubber):
         interface.update('value_h', {'key_a': 'value_a', 'key_b': 'value_b'}, 'value_r')
     interface.update('value_h', {'key_a': 'value_a', 'key_b': 'value_b'})
     ddb_stubber.assert_no_pending_responses()
+
+
+def test_interface_registry():
+    class ItemsService(ModelService):
+        __table_name__ = 'rewards'
+        __partition_key__ = 'hash'
+        __indices__ = {'ByRange': ('range', None)}
+
+    default = ItemsService.get_interface()
+    assert ItemsService.get_interface() is default
+    # noinspection PyProtectedMember
+    assert ItemsService.get_interface()._model.get_table() is default._model.get_table()
+
+    by_range = ItemsService.get_interface('ByRange')
+    assert by_range is not default
+    assert by_range.partition == 'range'
+    assert ItemsService.get_interface('ByRange') is by_range
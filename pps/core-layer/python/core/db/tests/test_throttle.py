@@ -0,0 +1,92 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from ..throttle import READ, WRITE, TokenBucket, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+def test_bucket_pacing():
+    clock = FakeClock()
+    bucket = TokenBucket(2, burst=4, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire(4) == 0
+    assert bucket.acquire(1) == pytest.approx(0.5)
+    # charged with more than estimated, the next requests wait for the debt
+    bucket.charge(3)
+    assert bucket.acquire(1) == pytest.approx(2)
+    # requests bigger than the burst wait for a full bucket
+    assert bucket.acquire(10) == pytest.approx(2)
+    assert bucket.tokens == pytest.approx(-6)
+
+
+def test_bucket_adapts():
+    bucket = TokenBucket(10)
+    bucket.throttled()
+    bucket.throttled()
+    assert bucket.rate == 2.5
+    for _ in range(5):
+        bucket.throttled()
+    assert bucket.rate == 0.5
+    bucket.succeeded()
+    assert bucket.rate == 1
+    for _ in range(100):
+        bucket.succeeded()
+    assert bucket.rate == 10
+
+
+def test_limiter_capacities():
+    limiter = RateLimiter(share=0.5, definitions=[{
+        'TableName': 'beneficiaries',
+        'ProvisionedThroughput': {'ReadCapacityUnits': 3, 'WriteCapacityUnits': 4},
+        'GlobalSecondaryIndexes': [{
+            'IndexName': 'ByGroup',
+            'ProvisionedThroughput': {'ReadCapacityUnits': 4, 'WriteCapacityUnits': 3}
+        }]
+    }, {'TableName': 'on-demand', 'BillingMode': 'PAY_PER_REQUEST'}])
+    assert limiter.bucket('beneficiaries', READ).rate == 1.5
+    assert limiter.bucket('beneficiaries', WRITE).rate == 2
+    assert limiter.bucket('beneficiaries', READ, 'ByGroup').rate == 2
+    assert limiter.bucket('beneficiaries', READ, 'Local').rate == 1.5
+    assert limiter.bucket('on-demand', READ) is None
+    with limiter.paced('on-demand', READ, 100) as pace:
+        pace.consumed({'TableName': 'on-demand', 'CapacityUnits': 100})
+
+    limiter.configure('on-demand', 10, 10)
+    assert limiter.bucket('on-demand', WRITE).rate == 5
+    assert RateLimiter(share=0, definitions=[]).bucket('beneficiaries', READ) is None
+
+
+def test_paced():
+    limiter = RateLimiter(share=1, definitions=[])
+    limiter.configure('logs', 10, 10)
+    bucket = limiter.bucket('logs', WRITE)
+
+    with limiter.paced('logs', WRITE, 5) as pace:
+        pace.consumed([{'TableName': 'logs', 'CapacityUnits': 20}, {'TableName': 'other', 'CapacityUnits': 50}])
+    assert bucket.tokens == pytest.approx(bucket.burst - 20, abs=0.1)
+
+    with limiter.paced('logs', WRITE) as pace:
+        pace.throttled()
+    assert bucket.rate == 5
+
+    with pytest.raises(ClientError):
+        with limiter.paced('logs', WRITE):
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem')
+    assert bucket.rate == 2.5
+    with pytest.raises(ValueError):
+        with limiter.paced('logs', WRITE):
+            raise ValueError()
+    assert bucket.rate == 2.5
+
+    with limiter.paced('logs', WRITE):
+        pass
+    assert bucket.rate == 3
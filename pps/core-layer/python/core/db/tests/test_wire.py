@@ -0,0 +1,98 @@
+import pytest
+from botocore.stub import Stubber
+
+from .. import ModelIndex
+from ..model import Operator
+from ..wire import decode_item, encode_item
+
+interface = ModelIndex('rewards', 'hash', 'range')
+
+
+@pytest.fixture(scope="function")
+def client_stubber():
+    # noinspection PyProtectedMember
+    client_stubber = Stubber(interface._model.get_client())
+    client_stubber.activate()
+    yield client_stubber
+    client_stubber.deactivate()
+
+
+def test_decode():
+    item = decode_item({
+        'int': {'N': '12'},
+        'float': {'N': '1.5'},
+        'exp': {'N': '1E+2'},
+        'str': {'S': 'text'},
+        'bool': {'BOOL': False},
+        'null': {'NULL': True},
+        'list': {'L': [{'N': '1'}, {'M': {'nested': {'N': '0.25'}}}]},
+        'set': {'SS': ['a', 'b']},
+        'numbers': {'NS': ['1', '2.5']},
+    })
+    assert item == {
+        'int': 12,
+        'float': 1.5,
+        'exp': 100,
+        'str': 'text',
+        'bool': False,
+        'null': None,
+        'list': [1, {'nested': 0.25}],
+        'set': {'a', 'b'},
+        'numbers': {1, 2.5},
+    }
+    assert type(item['int']) is int
+    assert type(item['exp']) is int
+    assert decode_item(None) is None
+
+
+def test_encode():
+    item = {'int': 12, 'float': 1.5, 'str': 'text', 'bool': True, 'null': None, 'list': [1, {'a': 'b'}]}
+    encoded = encode_item(item)
+    assert encoded == {
+        'int': {'N': '12'},
+        'float': {'N': '1.5'},
+        'str': {'S': 'text'},
+        'bool': {'BOOL': True},
+        'null': {'NULL': True},
+        'list': {'L': [{'N': '1'}, {'M': {'a': {'S': 'b'}}}]},
+    }
+    assert decode_item(encoded) == item
+
+
+def test_fast_query(client_stubber):
+    client_stubber.add_response('query', {
+        'Items': [
+            {'hash': {'S': 'h'}, 'range': {'S': 'r1'}, 'score': {'N': '3'}, 'ratio': {'N': '0.5'}},
+            {'hash': {'S': 'h'}, 'range': {'S': 'r2'}, 'score': {'N': '4'}, 'ratio': {'N': '1'}},
+        ],
+        'Count': 2,
+        'LastEvaluatedKey': {'hash': {'S': 'h'}, 'range': {'S': 'r2'}}
+    }, {
+        'TableName': 'rewards',
+        'KeyConditionExpression': '(#n0 = :v0 AND begins_with(#n1, :v1))',
+        'ExpressionAttributeNames': {'#n0': 'hash', '#n1': 'range', '#attr_score': 'score', '#attr_ratio': 'ratio'},
+        'ExpressionAttributeValues': {':v0': {'S': 'h'}, ':v1': {'S': 'r'}},
+        'ProjectionExpression': '#attr_score, #attr_ratio',
+        'ExclusiveStartKey': {'hash': {'S': 'h'}, 'range': {'S': 'r0'}},
+        'Limit': 2
+    })
+    result = interface.query('h', (Operator.BEGINS_WITH, 'r'), attributes=['score', 'ratio'], limit=2,
+                             start_key={'hash': 'h', 'range': 'r0'}, fast=True)
+    assert result.items == [
+        {'hash': 'h', 'range': 'r1', 'score': 3, 'ratio': 0.5},
+        {'hash': 'h', 'range': 'r2', 'score': 4, 'ratio': 1},
+    ]
+    assert type(result.items[0]['score']) is int
+    assert result.last_evaluated_key == {'hash': 'h', 'range': 'r2'}
+    client_stubber.assert_no_pending_responses()
+
+
+def test_fast_get(client_stubber):
+    client_stubber.add_response('get_item', {
+        'Item': {'hash': {'S': 'h'}, 'range': {'S': 'r'}, 'score': {'N': '3'}}
+    }, {
+        'TableName': 'rewards',
+        'Key': {'hash': {'S': 'h'}, 'range': {'S': 'r'}}
+    })
+    assert interface.get('h', 'r', fast=True).item == {'hash': 'h', 'range': 'r', 'score': 3}
+    client_stubber.assert_no_pending_responses()
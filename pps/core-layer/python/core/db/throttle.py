@@ -0,0 +1,224 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from core.router.environment import ENVIRONMENT
+
+__all__ = ['READ', 'WRITE', 'THROTTLING_ERRORS', 'TokenBucket', 'Pace', 'RateLimiter', 'rate_limiter']
+
+READ = 'read'
+WRITE = 'write'
+
+THROTTLING_ERRORS = ('ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded')
+
+# seconds of unused capacity a bucket can save up, DynamoDB itself keeps up to 300 seconds of burst capacity
+BURST_SECONDS = 30
+# multiplicative decrease of the rate on throttling, additive increase (as a fraction of the base rate) on success
+DECREASE_FACTOR = 0.5
+INCREASE_FRACTION = 0.05
+MIN_RATE_FRACTION = 0.05
+
+_BucketKey = Tuple[str, Optional[str], str]
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at a rate of capacity units per second, holding up to burst units. Requests take their
+    estimated units before being sent, and are charged the units they really consumed afterwards, so a bucket can
+    run into debt that later requests wait for. The rate adapts to throttling: it is halved every time a request is
+    throttled and grows back additively with every successful request, up to the base rate
+    """
+
+    def __init__(self, rate: float, burst: float = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        if rate <= 0:
+            raise ValueError("The rate of a bucket must be positive")
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst if burst is not None else rate * BURST_SECONDS
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def acquire(self, units: float = 1.0) -> float:
+        """
+        Wait until the bucket holds the given units (or is full, for requests bigger than the burst) and take them.
+        Returns the seconds waited
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(units, self.burst)
+                if self._tokens >= needed:
+                    self._tokens -= units
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+    def charge(self, units: float):
+        """
+        Take (or give back, if negative) units without waiting
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.burst, self._tokens - units)
+
+    def throttled(self):
+        with self._lock:
+            self._refill()
+            self.rate = max(self.base_rate * MIN_RATE_FRACTION, self.rate * DECREASE_FACTOR)
+
+    def succeeded(self):
+        with self._lock:
+            self._refill()
+            self.rate = min(self.base_rate, self.rate + self.base_rate * INCREASE_FRACTION)
+
+
+def _consumed_units(consumed: Union[dict, List[dict], None], table_name: str) -> Optional[float]:
+    if consumed is None:
+        return None
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    units = [float(entry.get('CapacityUnits', 0)) for entry in consumed if entry.get('TableName') == table_name]
+    return sum(units) if len(units) > 0 else None
+
+
+class Pace:
+    """
+    A request paced by a bucket, which learns the capacity that the request consumed and whether it was throttled
+    """
+
+    def __init__(self, bucket: Optional[TokenBucket], table_name: str, estimate: float):
+        self.bucket = bucket
+        self.table_name = table_name
+        self.estimate = estimate
+        self.waited = 0.0
+        self.was_throttled = False
+
+    def consumed(self, consumed: Union[dict, List[dict], None]):
+        """
+        Charge the difference between the estimated units and the ConsumedCapacity of the response
+        """
+        units = _consumed_units(consumed, self.table_name)
+        if self.bucket is not None and units is not None:
+            self.bucket.charge(units - self.estimate)
+            self.estimate = units
+
+    def throttled(self):
+        """
+        Mark the request as throttled, for batch requests that return unprocessed keys or items
+        """
+        self.was_throttled = True
+
+
+class RateLimiter:
+    """
+    Token buckets per table (or index) and kind of capacity, with a share of the provisioned throughput of the
+    tables of the SAM template. It paces batch and scan work, leaving the rest of the capacity to interactive
+    requests. Tables without provisioned throughput (or a template) aren't paced
+    """
+
+    def __init__(self, share: float = None, definitions: List[dict] = None):
+        self._share = share
+        self._definitions = definitions
+        self._capacities: Optional[Dict[Tuple[str, Optional[str]], Dict[str, float]]] = None
+        self._buckets: Dict[_BucketKey, Optional[TokenBucket]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def share(self) -> float:
+        return ENVIRONMENT.db_rate_limit_share if self._share is None else self._share
+
+    def _load_capacities(self):
+        definitions = self._definitions
+        if definitions is None:
+            from .memory.template import load_table_definitions
+            try:
+                definitions = load_table_definitions()
+            except FileNotFoundError:
+                definitions = []
+        capacities = {}
+        for definition in definitions:
+            table_name = definition['TableName']
+            for index in [None] + definition.get('GlobalSecondaryIndexes', []):
+                throughput = (definition if index is None else index).get('ProvisionedThroughput')
+                if throughput is None:
+                    continue
+                capacities[(table_name, None if index is None else index['IndexName'])] = {
+                    READ: float(throughput['ReadCapacityUnits']),
+                    WRITE: float(throughput['WriteCapacityUnits'])
+                }
+        return capacities
+
+    def configure(self, table_name: str, read: float, write: float, index: str = None):
+        """
+        Set the provisioned capacity of a table or index, replacing its buckets
+        """
+        with self._lock:
+            if self._capacities is None:
+                self._capacities = self._load_capacities()
+            self._capacities[(table_name, index)] = {READ: float(read), WRITE: float(write)}
+            for kind in (READ, WRITE):
+                self._buckets.pop((table_name, index, kind), None)
+
+    def reset(self):
+        """
+        Refill every bucket and restore their base rates
+        """
+        with self._lock:
+            self._buckets = {}
+
+    def bucket(self, table_name: str, kind: str, index: str = None) -> Optional[TokenBucket]:
+        key = (table_name, index, kind)
+        with self._lock:
+            if key not in self._buckets:
+                if self._capacities is None:
+                    self._capacities = self._load_capacities()
+                # indices without their own throughput (local ones) share the table's
+                capacity = self._capacities.get((table_name, index), self._capacities.get((table_name, None)))
+                rate = None if capacity is None else capacity[kind] * self.share
+                self._buckets[key] = TokenBucket(rate) if rate is not None and rate > 0 else None
+            return self._buckets[key]
+
+    @contextmanager
+    def paced(self, table_name: str, kind: str, units: float = 1.0, index: str = None) -> Iterator[Pace]:
+        """
+        Wait for the estimated units of a request before running it. Throttling errors raised by the request and
+        throttled marks lower the rate of the bucket, and successful requests raise it back
+        """
+        bucket = self.bucket(table_name, kind, index)
+        pace = Pace(bucket, table_name, units)
+        if bucket is None:
+            yield pace
+            return
+        pace.waited = bucket.acquire(units)
+        try:
+            yield pace
+        except Exception as e:
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if code in THROTTLING_ERRORS:
+                bucket.throttled()
+            raise
+        if pace.was_throttled:
+            bucket.throttled()
+        else:
+            bucket.succeeded()
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,53 @@
+from typing import List, Optional
+
+from .cache import identity_map
+from .db import db
+
+__all__ = ['TRANSACT_WRITE_LIMIT', 'TransactionCanceledError', 'transact_write']
+
+TRANSACT_WRITE_LIMIT = 100
+
+
+class TransactionCanceledError(Exception):
+    """
+    A transaction was canceled and none of its operations were applied. reasons has the cancellation code of each
+    operation (like 'ConditionalCheckFailed'), or None for the operations that didn't cause the cancellation
+    """
+
+    def __init__(self, reasons: List[Optional[str]]):
+        super().__init__(f"Transaction canceled: {reasons}")
+        self.reasons = reasons
+
+    def failed(self, index: int, code: str = 'ConditionalCheckFailed') -> bool:
+        return index < len(self.reasons) and self.reasons[index] == code
+
+
+def _invalidate(operation: dict):
+    (kind, request), = operation.items()
+    if kind == 'Put':
+        identity_map.invalidate_item(request['TableName'], request['Item'])
+    else:
+        identity_map.invalidate(request['TableName'], request['Key'])
+
+
+def transact_write(operations: List[dict], client_request_token: str = None):
+    """
+    Apply write operations built with the *_operation methods of the models as a single all-or-nothing
+    TransactWriteItems request. The operations may target different tables, but not the same item twice
+    """
+    if len(operations) == 0:
+        return
+    if len(operations) > TRANSACT_WRITE_LIMIT:
+        raise ValueError(f"A transaction can't have more than {TRANSACT_WRITE_LIMIT} operations")
+
+    for operation in operations:
+        _invalidate(operation)
+    client = db.client
+    arguments = {'TransactItems': operations}
+    if client_request_token is not None:
+        arguments['ClientRequestToken'] = client_request_token
+    try:
+        client.transact_write_items(**arguments)
+    except client.exceptions.TransactionCanceledException as e:
+        reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+        raise TransactionCanceledError([None if code in (None, 'None') else code for code in reasons]) from e
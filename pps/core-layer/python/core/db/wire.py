@@ -0,0 +1,81 @@
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+__all__ = ['decode_value', 'decode_item', 'encode_value', 'encode_item']
+
+
+def _decode_number(value: str):
+    if '.' in value or 'e' in value or 'E' in value:
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return int(value)
+
+
+def decode_value(value: Dict[str, Any]):
+    """
+    Decode a DynamoDB wire attribute value into native int/float/str/bool/list/dict/set values in a single pass,
+    without going through Decimal
+    """
+    (value_type, data), = value.items()
+    if value_type == 'S':
+        return data
+    if value_type == 'N':
+        return _decode_number(data)
+    if value_type == 'M':
+        return {key: decode_value(item) for key, item in data.items()}
+    if value_type == 'L':
+        return [decode_value(item) for item in data]
+    if value_type == 'BOOL':
+        return data
+    if value_type == 'NULL':
+        return None
+    if value_type == 'SS':
+        return set(data)
+    if value_type == 'NS':
+        return set(_decode_number(item) for item in data)
+    if value_type == 'B':
+        return data
+    if value_type == 'BS':
+        return set(data)
+    raise ValueError(f"Unknown DynamoDB type: {value_type}")
+
+
+def decode_item(item: Optional[Dict[str, Dict[str, Any]]]) -> Optional[dict]:
+    if item is None:
+        return None
+    return {key: decode_value(value) for key, value in item.items()}
+
+
+def encode_value(value) -> Dict[str, Any]:
+    """
+    Encode a native value as a DynamoDB wire attribute value
+    """
+    value_type = type(value)
+    if value_type is str:
+        return {'S': value}
+    if value_type is bool:
+        return {'BOOL': value}
+    if value_type is int or value_type is float or value_type is Decimal:
+        return {'N': str(value)}
+    if value is None:
+        return {'NULL': True}
+    if value_type is dict:
+        return {'M': {key: encode_value(item) for key, item in value.items()}}
+    if value_type is list or value_type is tuple:
+        return {'L': [encode_value(item) for item in value]}
+    if value_type is bytes:
+        return {'B': value}
+    if value_type is set:
+        if all(type(item) is str for item in value):
+            return {'SS': list(value)}
+        if all(type(item) in (int, float, Decimal) for item in value):
+            return {'NS': [str(item) for item in value]}
+        if all(type(item) is bytes for item in value):
+            return {'BS': list(value)}
+    raise ValueError(f"Unsupported type for DynamoDB: {value_type}")
+
+
+def encode_item(item: Optional[dict]) -> Optional[Dict[str, Dict[str, Any]]]:
+    if item is None:
+        return None
+    return {key: encode_value(value) for key, value in item.items()}
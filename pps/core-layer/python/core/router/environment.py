@@ -21,9 +21,54 @@ class AppEnvironment:
     def is_local(self):
         return BOOL_NAMES[os.environ.get('AWS_SAM_LOCAL', 'false')]
 
+    @property
+    def db_backend(self):
+        return os.environ.get('DB_BACKEND', 'dynamodb')
+
+    @property
+    def db_endpoint_url(self):
+        # DynamoDB endpoint override, as a dynamodb-local reached from outside the SAM network
+        return os.environ.get('DB_ENDPOINT_URL')
+
+    @property
+    def db_rate_limit_share(self):
+        # share of the provisioned capacity of a table given to batch and scan work, 0 disables pacing
+        return float(os.environ.get('DB_RATE_LIMIT_SHARE', '0.8'))
+
+    @property
+    def db_max_in_flight(self):
+        # requests a single invocation sends at once when it fans out independent db calls
+        return int(os.environ.get('DB_MAX_IN_FLIGHT', '16'))
+
+    @property
+    def token_signing_kid(self):
+        # id of the key that signs new tokens, the first key of the key file when not set
+        return os.environ.get('TOKEN_SIGNING_KID')
+
+    @property
+    def rewards_catalog_ttl(self):
+        # seconds a container keeps its snapshot of the rewards of a category before reading them again
+        return float(os.environ.get('REWARDS_CATALOG_TTL', '300'))
+
     @property
     def aws_region(self):
         return os.environ.get('AWS_REGION', 'us-west-2')
 
+    @property
+    def aws_max_pool_connections(self):
+        return int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '25'))
+
+    @property
+    def aws_connect_timeout(self):
+        return float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+
+    @property
+    def aws_read_timeout(self):
+        return float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+
+    @property
+    def aws_max_attempts(self):
+        return int(os.environ.get('AWS_MAX_ATTEMPTS', '3'))
+
 
 ENVIRONMENT = AppEnvironment()
@@ -1,14 +1,24 @@
+import json
 import traceback
 
 from os import path
-from schema import SchemaError, Schema
+from typing import TYPE_CHECKING
 
 from core import HTTPEvent, JSONResponse
 from core.aws.errors import HTTPError
+from core.db.buffer import write_buffer, WriteBufferError
+from core.db.cache import identity_map
+from core.db.capacity import capacity_tracker
 from core.exceptions.forbidden import ForbiddenException
 from core.exceptions.invalid import InvalidException
 from core.exceptions.notfound import NotFoundException
 from core.exceptions.unauthorized import UnauthorizedException
+from core.utils.lazy import lazy_import
+
+schema_lib = lazy_import('schema')
+
+if TYPE_CHECKING:
+    from schema import Schema
 
 
 class Router:
@@ -19,12 +29,12 @@ class Router:
     def standardize_resource(resource: str):
         return '/'.join(filter(lambda x: x != '', resource.split('/')))
 
-    def _add_route_method(self, method: str, resource: str, fun, schema: Schema = None, authorized=True):
+    def _add_route_method(self, method: str, resource: str, fun, schema: 'Schema' = None, authorized=True):
         if self.routes.get(method) is None:
             self.routes[method] = {}
         resource = self.standardize_resource(resource)
         if type(schema) is dict:
-            schema = Schema(schema)
+            schema = schema_lib.Schema(schema)
         self.routes[method][resource] = lambda evt: Router._validate_and_run(fun, evt, schema=schema, authorized=True)
         if not authorized:
             public_resource = path.join(resource, 'public')
@@ -32,7 +42,7 @@ class Router:
                                                                                         authorized=False)
 
     @staticmethod
-    def _validate_and_run(fun, evt: HTTPEvent, schema: Schema = None, authorized=True):
+    def _validate_and_run(fun, evt: HTTPEvent, schema: 'Schema' = None, authorized=True):
         if schema is not None:
             schema.validate(evt.json)
         if authorized and evt.authorizer is None:
@@ -40,6 +50,37 @@ class Router:
         return fun(evt)
 
     def route(self, event: HTTPEvent) -> JSONResponse:
+        capacity_tracker.reset()
+        # items read during a request are cached only until the request ends, and deferred writes are flushed
+        # when the handler succeeds, or discarded with the scope when it fails
+        with identity_map.scope(), write_buffer.scope():
+            response = self._route(event)
+            if 200 <= response.status < 300:
+                response = self._flush_writes(event, response)
+        self._report_capacity(event)
+        return response
+
+    @staticmethod
+    def _flush_writes(event: HTTPEvent, response: JSONResponse) -> JSONResponse:
+        try:
+            write_buffer.flush()
+        except WriteBufferError as e:
+            print(json.dumps({
+                "message": str(e),
+                "resource": event.resource,
+                "failures": [{"table": table_name, "error": repr(error)} for table_name, error in e.failures]
+            }))
+            return JSONResponse.generate_error(HTTPError.SERVER_ERROR, "Some changes could not be saved")
+        return response
+
+    def _report_capacity(self, event: HTTPEvent):
+        if capacity_tracker.requests == 0:
+            return
+        route = f"{event.method} /{self.standardize_resource(event.resource)}"
+        # printed as an embedded metric format line, so CloudWatch extracts it as metrics per route
+        print(json.dumps(capacity_tracker.metrics(route)))
+
+    def _route(self, event: HTTPEvent) -> JSONResponse:
         resources = self.routes.get(event.method)
         if resources is None:
             return JSONResponse.generate_error(HTTPError.UNKNOWN_RESOURCE, f"Unknown method {event.method}")
@@ -57,7 +98,7 @@ class Router:
             return JSONResponse.generate_error(HTTPError.INVALID_CONTENT, e.message)
         except UnauthorizedException as e:
             return JSONResponse.generate_error(HTTPError.UNAUTHORIZED, e.message)
-        except SchemaError as e:
+        except schema_lib.SchemaError as e:
             return JSONResponse.generate_error(HTTPError.INVALID_CONTENT, f"Bad schema: {e}")
         except Exception as e:
             body = {
@@ -73,17 +114,17 @@ class Router:
                 body["error"] = error
             return JSONResponse(body, 500)
 
-    def post(self, resource: str, fun, schema: Schema = None, authorized=True):
+    def post(self, resource: str, fun, schema: 'Schema' = None, authorized=True):
         self._add_route_method("POST", resource, fun, schema=schema, authorized=authorized)
 
-    def get(self, resource: str, fun, schema: Schema = None, authorized=True):
+    def get(self, resource: str, fun, schema: 'Schema' = None, authorized=True):
         self._add_route_method("GET", resource, fun, schema=schema, authorized=authorized)
 
-    def delete(self, resource: str, fun, schema: Schema = None, authorized=True):
+    def delete(self, resource: str, fun, schema: 'Schema' = None, authorized=True):
         self._add_route_method("DELETE", resource, fun, schema=schema, authorized=authorized)
 
-    def patch(self, resource: str, fun, schema: Schema = None, authorized=True):
+    def patch(self, resource: str, fun, schema: 'Schema' = None, authorized=True):
         self._add_route_method("PATCH", resource, fun, schema=schema, authorized=authorized)
 
-    def put(self, resource: str, fun, schema: Schema = None, authorized=True):
+    def put(self, resource: str, fun, schema: 'Schema' = None, authorized=True):
         self._add_route_method("PUT", resource, fun, schema=schema, authorized=authorized)
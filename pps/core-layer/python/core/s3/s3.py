@@ -1,13 +1,13 @@
 import json
 
-import boto3
+from core.aws.clients import clients
 
 
 class Bucket:
 
     @staticmethod
     def get_s3():
-        return boto3.resource('s3')
+        return clients.resource('s3')
 
     def __init__(self, bucket_name: str):
         self._bucket = self.get_s3().Bucket(bucket_name)
@@ -1,19 +1,21 @@
 from datetime import datetime, date
 from typing import List, Dict, Union, Optional
 
-from boto3.dynamodb.conditions import Attr
 from core import ModelService
 from core.aws.event import Authorizer
 from core.db.model import Operator, UpdateReturnValues
+from core.db.results import QueryResult
 from core.exceptions.invalid import InvalidException
 from core.exceptions.notfound import NotFoundException
-from core.services.logs import LogsService, LogKey
 from core.services.objectives import ScoreConfiguration
-from core.services.rewards import RewardsService, Reward
+from core.services.inventory import InventoryService
+from core.services.rewards import RewardsService, Reward, RewardType
 from core.services.tasks import Task
 from core.utils.consts import VALID_STAGES, VALID_AREAS
 from core.utils.key import clean_text, date_to_text, join_key, split_key
-from schema import Schema, Or
+from core.utils.lazy import lazy_import
+
+ddb_conditions = lazy_import('boto3.dynamodb.conditions')
 
 
 class Beneficiary:
@@ -176,16 +178,16 @@ class BeneficiariesService(ModelService):
     @classmethod
     def query_unit(cls, district: str, group: str, unit: str, attributes: List[str] = None):
         interface = cls.get_interface("ByGroup")
-        result = interface.query(join_key(district, group), (Operator.BEGINS_WITH, join_key(unit, '')),
-                                 attributes=attributes)
-        result.items = [Beneficiary.from_db_map(item) for item in result.items]
-        return result
+        return QueryResult.from_list([Beneficiary.from_db_map(item) for item in
+                                      interface.iter_query(join_key(district, group),
+                                                           (Operator.BEGINS_WITH, join_key(unit, '')),
+                                                           attributes=attributes)])
 
     @classmethod
     def query_group(cls, district: str, group: str, attributes: List[str] = None) -> List[Beneficiary]:
         interface = cls.get_interface("ByGroup")
         return [Beneficiary.from_db_map(item) for item in
-                interface.query(join_key(district, group), attributes=attributes).items]
+                interface.iter_query(join_key(district, group), attributes=attributes)]
 
     @classmethod
     def create(cls, district: str, group: str, authorizer: Authorizer):
@@ -211,6 +213,8 @@ class BeneficiariesService(ModelService):
                              raise_if_exists_partition=True)
         except cls.exceptions().ConditionalCheckFailedException:
             raise InvalidException("Already joined a group")
+        from core.services.stats import GroupStatsService
+        GroupStatsService.register(district, group, beneficiary.unit, authorizer.sub)
 
     @classmethod
     def buy_item(cls, authorizer: Authorizer, area: str, item_category: str, item_release: int, item_id: int,
@@ -228,8 +232,8 @@ class BeneficiariesService(ModelService):
         return interface.update(authorizer.sub, None, None, add_to={
             f'bought_items.{item_category}{release_id}': amount,
             f'score.{area}': int(-amount * price)
-        }, conditions=Attr(f'score.{area}').gte(int(amount * price)), return_values=UpdateReturnValues.UPDATED_NEW)[
-            'Attributes']
+        }, conditions=ddb_conditions.Attr(f'score.{area}').gte(int(amount * price)),
+            return_values=UpdateReturnValues.UPDATED_NEW)['Attributes']
 
     @classmethod
     def update(cls, authorizer: Authorizer, group: str = None, name: str = None, nickname: str = None,
@@ -260,6 +264,16 @@ class BeneficiariesService(ModelService):
         except interface.client.exceptions.ConditionalCheckFailedException:
             raise InvalidException('This token has already been claimed')
 
+    @classmethod
+    def claim_reward_index_operation(cls, sub: str, index: int, scores: Dict[str, int] = None) -> dict:
+        """
+        Build a transaction operation that takes a reward token index and adds the scores won with it. It fails if the
+        token was already claimed
+        """
+        additions = {f'score.{area}': score for area, score in scores.items()} if scores else None
+        return cls.get_interface().update_operation(sub, {'n_claimed_tokens': index}, add_to=additions,
+                                                    conditions="#attr_n_claimed_tokens < :val_n_claimed_tokens")
+
     @classmethod
     def add_token_index(cls, authorizer: Authorizer) -> int:
         interface = cls.get_interface()
@@ -288,10 +302,34 @@ class BeneficiariesService(ModelService):
 
         try:
             return interface.update(authorizer.sub, updates, None, return_values=return_values,
-                                    add_to=add_to, conditions=Attr('target').ne(None))["Attributes"]
+                                    add_to=add_to, conditions=ddb_conditions.Attr('target').ne(None))["Attributes"]
         except interface.client.exceptions.ConditionalCheckFailedException:
             raise InvalidException('No active target')
 
+    @classmethod
+    def complete_active_task_operation(cls, sub: str, area: str, last_token_index: Optional[int]) -> dict:
+        """
+        Build a transaction operation that clears the active task, adds its score and takes the next reward token
+        index. It fails if the active task was cleared or if the token index changed since they were read
+        """
+        score = ScoreConfiguration.instance().base_score
+        if last_token_index is None:
+            token_condition = ddb_conditions.Attr('generated_token_last').not_exists()
+        else:
+            token_condition = ddb_conditions.Attr('generated_token_last').eq(last_token_index)
+        return cls.get_interface().update_operation(sub, {
+            'target': None,
+            'generated_token_last': cls.next_token_index(last_token_index)
+        }, add_to={
+            f'score.{area}': score,
+            f'n_tasks.{area}': 1
+        }, conditions=ddb_conditions.Attr('target').ne(None) & token_condition)
+
+    @staticmethod
+    def next_token_index(last_token_index: Optional[int]) -> int:
+        # same as adding one to the attribute, that starts at 0 when it doesn't exist
+        return (0 if last_token_index is None else last_token_index) + 1
+
     @classmethod
     def update_active_task(cls, authorizer: Authorizer, description: str, tasks: list):
         interface = cls.get_interface()
@@ -311,7 +349,7 @@ class BeneficiariesService(ModelService):
         try:
             return interface.update(authorizer.sub, updates,
                                     return_values=UpdateReturnValues.UPDATED_NEW,
-                                    conditions=Attr('set_base_tasks').eq(False))
+                                    conditions=ddb_conditions.Attr('set_base_tasks').eq(False))
         except interface.client.exceptions.ConditionalCheckFailedException:
             raise InvalidException('Beneficiary already initialized')
 
@@ -334,16 +372,13 @@ class BeneficiariesService(ModelService):
 
         parts_ids = [part_id for part_id in set(avatar.values()) if part_id is not None]
         if len(parts_ids) > 0:
-            logs = LogsService.batch_get(
-                [LogKey(sub=user_sub, tag=join_key('REWARD', 'AVATAR', part_id)) for part_id in
-                 parts_ids],
-                attributes=['data', 'tag'])
-            if len(logs) != len(parts_ids):
+            owned = InventoryService.owned(user_sub, RewardType.AVATAR, parts_ids)
+            if owned is None:
                 raise NotFoundException("An avatar part was not found")
         else:
-            logs = []
+            owned = {}
 
-        avatar_parts = {int(split_key(log.tag)[-1]): Reward.from_api_map(log.data).to_api_map() for log in logs}
+        avatar_parts = {part_id: Reward.from_api_map(data).to_api_map() for part_id, data in owned.items()}
         new_avatar = {
             'left_eye': avatar_parts.get(avatar.get('left_eye')),
             'right_eye': avatar_parts.get(avatar.get('right_eye')),
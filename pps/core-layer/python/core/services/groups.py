@@ -8,11 +8,13 @@ from core.aws.event import Authorizer
 from core.exceptions.invalid import InvalidException
 from core.utils import join_key
 from core.utils.key import split_key
-from schema import Schema
+from core.utils.lazy import lazy_import
 
-schema = Schema({
+schema = lazy_import('schema')
+
+GROUP_SCHEMA = {
     'name': str,
-})
+}
 
 
 class UsersCognito(CognitoService):
@@ -47,7 +49,7 @@ class GroupsService(ModelService):
     @classmethod
     def create(cls, code: str, district: str, item: dict, creator_sub: str, creator_full_name: str):
         interface = cls.get_interface()
-        group = schema.validate(item)
+        group = schema.Schema(GROUP_SCHEMA).validate(item)
         group['beneficiary_code'] = cls.generate_beneficiary_code(district, code)
         group['scouters_code'] = cls.generate_scouters_code(district, code)
         group['creator'] = creator_sub
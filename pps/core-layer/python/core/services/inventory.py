@@ -0,0 +1,153 @@
+import functools
+from typing import List, Dict, Any, Optional, Iterable
+
+from core import ModelService
+from core.db.fanout import gather
+from core.router.environment import ENVIRONMENT
+from core.services.logs import LogsService, LogTag, Log
+from core.services.rewards import Reward, RewardType, RewardRarity, REWARD_LOG
+from core.utils import join_key
+
+INVENTORY_TAG = 'INVENTORY'
+
+REWARDS_ATTRIBUTE = 'rewards'
+COUNTS_ATTRIBUTE = 'counts'
+WON_ATTRIBUTE = 'won'
+ATTRIBUTES = [REWARDS_ATTRIBUTE, COUNTS_ATTRIBUTE, WON_ATTRIBUTE]
+
+
+class InventoryService(ModelService):
+    """
+    Rewards won by each beneficiary. It lives in the logs table under an inventory partition per beneficiary, with an
+    item per reward category mapping the id of each reward won to its data, to the times it was won and to when it
+    was last won, so owned rewards are read with a single get instead of a query of every reward log. Inventories of
+    rewards won before they existed are built from the reward logs the first time they are read or written
+    """
+    __table_name__ = "logs"
+    __partition_key__ = "user"
+    __sort_key__ = "tag"
+
+    @staticmethod
+    def partition(sub: str) -> str:
+        return join_key(INVENTORY_TAG, sub)
+
+    @staticmethod
+    def tracks(category: RewardType) -> bool:
+        """
+        Whether the rewards of a category are kept in the inventory. Rewards without an id, as points and needs, are
+        used up when claimed
+        """
+        return Reward.factory(category, RewardRarity.COMMON) is None
+
+    @classmethod
+    def build(cls, sub: str, category: RewardType) -> Dict[str, Any]:
+        """
+        Inventory item of a category built from the reward logs of a beneficiary. The logs are read with the fast
+        path, which keeps their integers as such, so the data can be written back as it was read
+        """
+        item = {REWARDS_ATTRIBUTE: {}, COUNTS_ATTRIBUTE: {}, WON_ATTRIBUTE: {}}
+        for log in LogsService.iter_tag(sub, join_key(LogTag.REWARD.name, category.name), is_full=False,
+                                        scan_forward=True, attributes=['tag', 'timestamp', 'data'], fast=True):
+            id_ = log.tags[2]
+            item[REWARDS_ATTRIBUTE][id_] = log.data
+            item[COUNTS_ATTRIBUTE][id_] = item[COUNTS_ATTRIBUTE].get(id_, 0) + 1
+            item[WON_ATTRIBUTE][id_] = max(item[WON_ATTRIBUTE].get(id_, 0), log.timestamp)
+        return item
+
+    @classmethod
+    def get(cls, sub: str, category: RewardType) -> Dict[str, Any]:
+        """
+        Inventory item of a category, built from the reward logs and saved if the beneficiary has none yet
+        """
+        interface = cls.get_interface()
+        item = interface.get(cls.partition(sub), category.name,
+                             attributes=ATTRIBUTES).item
+        if item is not None:
+            return item
+        item = cls.build(sub, category)
+        try:
+            interface.create(cls.partition(sub), item, category.name, raise_if_exists_sort=True)
+        except cls.exceptions().ConditionalCheckFailedException:
+            # built by another request in the meantime, which may have already added new rewards
+            return interface.get(cls.partition(sub), category.name,
+                                 attributes=ATTRIBUTES).item
+        return item
+
+    @staticmethod
+    def unique(category: RewardType) -> bool:
+        """
+        Whether a reward of a category is counted once however many times it's won, as avatars, whose reward log is
+        overwritten when won again
+        """
+        return category == RewardType.AVATAR
+
+    @classmethod
+    def add_operations(cls, sub: str, logs: Iterable[Log]) -> Dict[RewardType, dict]:
+        """
+        Build the transaction operations adding the rewards of timestamped reward logs to the inventories of their
+        categories, by category. They are meant to be written with the logs, and fail if the inventory of their
+        category wasn't built yet
+        """
+        by_category: Dict[RewardType, List[Log]] = {}
+        for log in logs:
+            category = RewardType.from_value(log.data['category'])
+            if cls.tracks(category) and log.data.get('id') is not None:
+                by_category.setdefault(category, []).append(log)
+        return {category: cls._add_operation(sub, category, category_logs)
+                for category, category_logs in by_category.items()}
+
+    @classmethod
+    def _add_operation(cls, sub: str, category: RewardType, logs: List[Log]) -> dict:
+        updates = {}
+        additions = {}
+        for log in logs:
+            id_ = str(log.data['id'])
+            updates[f'{REWARDS_ATTRIBUTE}.{id_}'] = log.data
+            updates[f'{WON_ATTRIBUTE}.{id_}'] = log.timestamp
+            if cls.unique(category):
+                updates[f'{COUNTS_ATTRIBUTE}.{id_}'] = 1
+            else:
+                additions[f'{COUNTS_ATTRIBUTE}.{id_}'] = additions.get(f'{COUNTS_ATTRIBUTE}.{id_}', 0) + 1
+        # the maps of the item must exist to set their keys
+        return cls.get_interface().update_operation(cls.partition(sub), updates, category.name,
+                                                    add_to=additions or None,
+                                                    conditions=f'attribute_exists(#attr_{REWARDS_ATTRIBUTE})')
+
+    @classmethod
+    def build_all(cls, sub: str, categories: Iterable[RewardType]):
+        """
+        Build and save the inventories of the categories that the beneficiary doesn't have yet, concurrently
+        """
+        gather(*[functools.partial(cls.get, sub, category) for category in categories],
+               max_in_flight=ENVIRONMENT.db_max_in_flight)
+
+    @classmethod
+    def reward_logs(cls, sub: str, category: RewardType) -> List[Dict[str, Any]]:
+        """
+        Rewards of a category won by a beneficiary as the API maps of their last reward logs, newest first, each with
+        the times the reward was won in count
+        """
+        item = cls.get(sub, category)
+        counts = item.get(COUNTS_ATTRIBUTE, {})
+        won = item.get(WON_ATTRIBUTE, {})
+        logs = []
+        for id_, data in item.get(REWARDS_ATTRIBUTE, {}).items():
+            log = Log(sub=sub, tag=join_key(LogTag.REWARD.name, category.name, id_), log=REWARD_LOG, data=data,
+                      timestamp=won.get(id_), append_timestamp=not cls.unique(category)).to_api_map()
+            log['count'] = int(counts.get(id_, 1))
+            logs.append(log)
+        return sorted(logs, key=lambda log_map: log_map['timestamp'] or 0, reverse=True)
+
+    @classmethod
+    def owned(cls, sub: str, category: RewardType, ids: Iterable[int]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """
+        Data of the rewards with the given ids, or None if the beneficiary hasn't won one of them
+        """
+        rewards = cls.get(sub, category).get(REWARDS_ATTRIBUTE, {})
+        owned = {}
+        for id_ in ids:
+            data = rewards.get(str(id_))
+            if data is None:
+                return None
+            owned[int(id_)] = data
+        return owned
@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Dict, Any, List, Union, Optional
+from typing import Dict, Any, List, Union, Optional, Iterator
 
 from core import ModelService
 from core.db.model import Operator
@@ -156,9 +156,18 @@ class LogsService(ModelService):
 
     @classmethod
     def query_tag(cls, user: str, tag: str = None, limit: int = None, is_full=True) -> List[Log]:
-        return [Log.from_map(x) for x in cls.get_interface().query(user, sort_key=(
-            Operator.BEGINS_WITH, tag + (SPLITTER if not is_full else '')) if tag is not None else None,
-                                                                   limit=limit, scan_forward=False).items]
+        return list(cls.iter_tag(user, tag, limit=limit, is_full=is_full))
+
+    @classmethod
+    def iter_tag(cls, user: str, tag: str = None, limit: int = None, is_full=True, scan_forward: bool = False,
+                 attributes: List[str] = None, fast: bool = False) -> Iterator[Log]:
+        """
+        Iterate the logs of a user with the given tag, following the query pages as they are consumed
+        """
+        sort_key = (Operator.BEGINS_WITH, tag + (SPLITTER if not is_full else '')) if tag is not None else None
+        for item in cls.get_interface().iter_query(user, sort_key=sort_key, max_items=limit,
+                                                   scan_forward=scan_forward, attributes=attributes, fast=fast):
+            yield Log.from_map(item)
 
     @classmethod
     def query_stats_tags(cls, user: str, limit: int = None) -> List[Log]:
@@ -170,33 +179,67 @@ class LogsService(ModelService):
         return int(now.timestamp() * 1000)
 
     @classmethod
-    def batch_create(cls, logs: List[Log]):
+    def _stamp(cls, logs: List[Log]):
+        # consecutive timestamps, so the logs of a batch get different tags
         count = 0
         for log in logs:
             log.timestamp = cls._get_current_timestamp() + count
             count += 1
-        items = [
-            {
-                'PutRequest': {
-                    'Item': log.to_db_map()
-                }
-            } for log in logs
-        ]
-        cls.get_interface().client.batch_write_item(
-            RequestItems={
-                'logs': items
-            }
-        )
+
+    @classmethod
+    def batch_create(cls, logs: List[Log]):
+        """
+        Write logs in batches
+        """
+        cls._stamp(logs)
+        with cls.get_interface().batch_writer() as writer:
+            for log in logs:
+                writer.put(log.to_db_map())
+        return writer.stats
+
+    @classmethod
+    def new_log(cls, sub: str, tag: str, log_text: str, data: Any, append_timestamp_to_tag: bool = False) -> Log:
+        return Log(tag=tag.upper(), log=log_text, data=data, timestamp=cls._get_current_timestamp(), sub=sub,
+                   append_timestamp=append_timestamp_to_tag)
 
     @classmethod
     def create(cls, sub: str, tag: str, log_text: str, data: Any, append_timestamp_to_tag: bool = False) -> Log:
-        log = Log(tag=tag.upper(), log=log_text, data=data, timestamp=cls._get_current_timestamp(), sub=sub,
-                  append_timestamp=append_timestamp_to_tag)
-        cls.get_interface().create(sub,
-                                   log.to_db_map(),
-                                   join_key(log.tag, log.timestamp) if log.append_timestamp else log.tag)
+        log = cls.new_log(sub, tag, log_text, data, append_timestamp_to_tag)
+        cls.get_interface().create(sub, log.to_db_map(), cls._sort_key(log))
         return log
 
+    @staticmethod
+    def _sort_key(log: Log) -> str:
+        return join_key(log.tag, log.timestamp) if log.append_timestamp else log.tag
+
+    @classmethod
+    def create_operation(cls, sub: str, tag: str, log_text: str, data: Any,
+                         append_timestamp_to_tag: bool = False) -> dict:
+        """
+        Build a transaction operation creating a log, to be written together with other items
+        """
+        return cls.put_operation(cls.new_log(sub, tag, log_text, data, append_timestamp_to_tag))
+
+    @classmethod
+    def put_operation(cls, log: Log) -> dict:
+        """
+        Build a transaction operation writing an already built log
+        """
+        return cls.get_interface().create_operation(log.sub, log.to_db_map(), cls._sort_key(log))
+
+    @classmethod
+    def batch_put_operations(cls, logs: List[Log]) -> List[dict]:
+        """
+        Build the transaction operations writing a batch of logs, timestamped as batch_create does. A log with the tag
+        of an earlier one of the batch replaces it, as it would in a batch write, since a transaction can't write an
+        item twice
+        """
+        cls._stamp(logs)
+        operations = {}
+        for log in logs:
+            operations[cls._sort_key(log)] = cls.put_operation(log)
+        return list(operations.values())
+
     @classmethod
     def get_last_log_with_tag(cls, sub: str, tag: str, is_full=False) -> Log:
         logs = cls.get_interface().query(sub, (Operator.BEGINS_WITH, tag + (SPLITTER if not is_full else '')), limit=1,
@@ -207,19 +250,5 @@ class LogsService(ModelService):
 
     @classmethod
     def batch_get(cls, keys: List[LogKey], attributes: List[str] = None) -> List[Log]:
-        items = {
-            'Keys': [{
-                'tag': key.tag,
-                'user': key.sub,
-            } for key in keys],
-        }
-        if attributes is not None:
-            items['AttributesToGet'] = attributes
-
-        response = cls.get_interface().client.batch_get_item(
-            RequestItems={
-                'logs': items
-            }
-        )
-        logs: List[dict] = response['Responses']['logs']
-        return [Log.from_map(x) for x in logs]
+        items = cls.get_interface().batch_get([(key.sub, key.tag) for key in keys], attributes=attributes)
+        return [Log.from_map(item) for item in items if item is not None]
@@ -1,6 +1,8 @@
 import json
 import math
 import os
+import threading
+from typing import Dict, List, Optional, Tuple
 
 from core.exceptions.notfound import NotFoundException
 
@@ -29,33 +31,95 @@ class ScoreConfiguration:
         return ScoreConfiguration(d["base-score"], d["boost-factor"])
 
 
-class ObjectivesService:
+class ObjectivesCatalog:
+    """
+    Objectives of a stage indexed by (area, line, sub-line), with the catalog serialized as JSON once
+    """
+
+    def __init__(self, stage: str, objectives: Dict[str, List[List[str]]]):
+        self.stage = stage
+        self.objectives = objectives
+        self._objectives: Dict[Tuple[str, int, int], str] = {}
+        self._n_sub_lines: Dict[Tuple[str, int], int] = {}
+        for area, lines in objectives.items():
+            for line, sub_lines in enumerate(lines, start=1):
+                self._n_sub_lines[(area, line)] = len(sub_lines)
+                for sub_line, objective in enumerate(sub_lines, start=1):
+                    self._objectives[(area, line, sub_line)] = objective
+        self._json: Optional[str] = None
+
     @staticmethod
-    def get_stage_objectives(stage):
+    def load(stage: str) -> 'ObjectivesCatalog':
         this_path = os.path.dirname(os.path.realpath(__file__))
         with open(os.path.join(this_path, '../common/objectives', f'{stage}.json'), encoding='utf-8') as f:
-            objectives = json.load(f)
-        return objectives
+            return ObjectivesCatalog(stage, json.load(f))
+
+    def get(self, area: str, line: int, sub_line: int) -> str:
+        objective = self._objectives.get((area, line, sub_line))
+        if objective is not None:
+            return objective
+        if area not in self.objectives:
+            raise NotFoundException(f"Area {area} not found")
+        if (area, line) not in self._n_sub_lines:
+            raise NotFoundException(f"Line {line} on area {area} not found")
+        raise NotFoundException(f"Sub-line {line}.{sub_line} on area {area} not found")
+
+    def area(self, area: str) -> List[List[str]]:
+        if area not in self.objectives:
+            raise NotFoundException(f"Area {area} not found")
+        return self.objectives[area]
+
+    @property
+    def json(self) -> str:
+        if self._json is None:
+            self._json = json.dumps(self.objectives)
+        return self._json
+
+
+class ObjectivesService:
+    _catalogs: Dict[str, ObjectivesCatalog] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def catalog(cls, stage: str) -> ObjectivesCatalog:
+        """
+        Catalog of the objectives of a stage, read from its file once per container
+        """
+        catalog = cls._catalogs.get(stage)
+        if catalog is None:
+            with cls._lock:
+                catalog = cls._catalogs.get(stage)
+                if catalog is None:
+                    catalog = ObjectivesCatalog.load(stage)
+                    cls._catalogs[stage] = catalog
+        return catalog
+
+    @classmethod
+    def get_stage_objectives(cls, stage):
+        """
+        Objectives of a stage by area, shared by every caller so they must not be modified
+        """
+        return cls.catalog(stage).objectives
 
     @classmethod
     def get(cls, stage: str, area: str, line: int, sub_line: int):
-        objectives = cls.get_stage_objectives(stage)
-        if area not in objectives:
-            raise NotFoundException(f"Area {area} not found")
-        objectives = objectives[area]
-        line -= 1
-        if line < 0 or line >= len(objectives):
-            raise NotFoundException(f"Line {line + 1} on area {area} not found")
-        objectives = objectives[line]
-        sub_line -= 1
-        if sub_line < 0 or sub_line >= len(objectives):
-            raise NotFoundException(f"Sub-line {line + 1}.{sub_line + 1} on area {area} not found")
-        return objectives[sub_line]
+        return cls.catalog(stage).get(area, line, sub_line)
+
+    @classmethod
+    def get_area(cls, stage: str, area: str):
+        return cls.catalog(stage).area(area)
 
     @classmethod
     def query(cls, stage: str):
         return cls.get_stage_objectives(stage)
 
+    @classmethod
+    def query_json(cls, stage: str) -> str:
+        """
+        Objectives of a stage already serialized as a JSON response body
+        """
+        return cls.catalog(stage).json
+
     @classmethod
     def calculate_score_for_task(cls, area: str, n_tasks: dict):
         other_n_tasks = 0
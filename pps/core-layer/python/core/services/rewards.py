@@ -1,27 +1,39 @@
-import json
+import bisect
+import functools
 import math
-import os
 import random
+import threading
 import time
-from datetime import timedelta, timezone, datetime
+from datetime import timedelta, datetime
 from enum import Enum
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Iterable, Tuple, Callable
 
-import jwt
 from core import ModelService
+from core.auth.tokens import tokens
 from core.aws.event import Authorizer
+from core.db.fanout import gather
 from core.db.model import Operator
+from core.db.transaction import transact_write, TransactionCanceledError
 from core.exceptions.forbidden import ForbiddenException
 from core.exceptions.invalid import InvalidException
 from core.exceptions.notfound import NotFoundException
+from core.router.environment import ENVIRONMENT
 from core.services.logs import LogsService, Log, LogTag
 from core.utils import join_key
 from core.utils.config import config
 from core.utils.consts import VALID_AREAS
-from jwt.exceptions import JWTDecodeError
-from jwt.utils import get_int_from_datetime
+from core.utils.lazy import lazy_import
+from core.utils.sampling import AliasTable
+
+jwt = lazy_import('jwt')
 
 REWARDS_PER_RELEASE = 100000
+# drop weight of the rewards that don't set one, relative to the other rewards of their category and rarity
+DEFAULT_REWARD_WEIGHT = 1
+# text of the logs of won rewards
+REWARD_LOG = 'Won a reward'
+# a claim is written again once after building the inventories it found missing
+CLAIM_ATTEMPTS = 2
 
 
 class RewardRarity(Enum):
@@ -58,15 +70,17 @@ class Reward:
     release: int
     id: int
     price: int
+    weight: float
 
     def __init__(self, category: RewardType, release: int, id_: int, description: Dict[str, Any], rarity: RewardRarity,
-                 price: int = None):
+                 price: int = None, weight: float = DEFAULT_REWARD_WEIGHT):
         self.type = category
         self.description = description
         self.release = release
         self.id = id_
         self.rarity = rarity
         self.price = price
+        self.weight = weight
 
     def to_api_map(self) -> dict:
         m = {
@@ -127,9 +141,11 @@ class Reward:
         item['release'] = release
         item['id'] = id_
         price = item.get('price')
+        weight = item.get('weight')
         return Reward(category=RewardType.from_value(item["category"]), release=release, id_=id_,
                       description=item["description"], price=int(price) if price is not None else None,
-                      rarity=RewardRarity.RARE if int(item['release-id']) < 0 else RewardRarity.COMMON)
+                      rarity=RewardRarity.RARE if int(item['release-id']) < 0 else RewardRarity.COMMON,
+                      weight=float(weight) if weight is not None else DEFAULT_REWARD_WEIGHT)
 
     def __repr__(self):
         return f"Reward(type={self.type.value}, description={self.description})"
@@ -177,7 +193,8 @@ class RewardsService(ModelService):
     __sort_key__ = "release-id"
 
     @classmethod
-    def create(cls, description: Any, category: RewardType, release: int, rarity: RewardRarity, price: int = None):
+    def create(cls, description: Any, category: RewardType, release: int, rarity: RewardRarity, price: int = None,
+               weight: int = None):
         index = cls.get_interface()
 
         ms_time = int(time.time() * 1000)
@@ -192,7 +209,14 @@ class RewardsService(ModelService):
         }
         if price is not None:
             item['price'] = price
-        return index.create(category.name, item, release_id, raise_if_exists_sort=True, raise_if_exists_partition=True)
+        if weight is not None:
+            if weight <= 0:
+                raise InvalidException('The weight of a reward must be positive')
+            item['weight'] = weight
+        result = index.create(category.name, item, release_id, raise_if_exists_sort=True,
+                              raise_if_exists_partition=True)
+        rewards_catalog.invalidate(category)
+        return result
 
     @classmethod
     def query(cls, category: RewardType, release: int):
@@ -208,33 +232,26 @@ class RewardsService(ModelService):
         return result
 
     @classmethod
-    def get_random(cls, category: RewardType, release: int, rarity: RewardRarity):
+    def get_random(cls, category: RewardType, release: int, rarity: RewardRarity, rng: random.Random = None):
+        """
+        A reward of the given category and rarity released up to the given release, drawn with probability
+        proportional to its weight from the container's snapshot of the rewards catalog
+        """
         reward = Reward.factory(category, rarity)
         if reward is not None:
             return reward
         release = int(release)
         if release < 1:
             raise InvalidException('Release must be positive and non-zero')
+        return rewards_catalog.snapshot(category).pick(release, rarity, rng)
 
-        top = abs(release * REWARDS_PER_RELEASE - 1)
-        if rarity == RewardRarity.RARE:
-            top = -top
-
-        lowest = min(0, top)
-        highest = max(0, top)
-        random_point = random.randint(lowest, highest)
-
-        index = cls.get_interface()
-        result = index.query(category.name,
-                             (Operator.BETWEEN, lowest, random_point),
-                             attributes=['category', 'description', 'release-id', 'price'], limit=1)
-        if len(result.items) == 0:
-            result = index.query(category.name,
-                                 (Operator.BETWEEN, random_point, highest),
-                                 attributes=['category', 'description', 'release-id', 'price'], limit=1)
-        if len(result.items) == 0:
-            raise NotFoundException(f'No reward of type {category.name} found')
-        return Reward.from_db_map(result.items[0])
+    @classmethod
+    def query_category(cls, category: RewardType) -> Iterator[dict]:
+        """
+        Every reward of a category, of every release and rarity
+        """
+        return cls.get_interface().iter_query(category.name,
+                                              attributes=['category', 'description', 'release-id', 'price', 'weight'])
 
     @classmethod
     def get(cls, category: str, release: int, id_: int):
@@ -253,78 +270,124 @@ class RewardsService(ModelService):
     @classmethod
     def generate_reward_token(cls, authorizer: Authorizer, static: RewardSet = None, area: Optional[str] = None,
                               boxes: List[RewardSet] = None, duration: timedelta = None,
-                              reason: Enum = None) -> str:
+                              reason: Enum = None, token_index: int = None, template: 'RewardTemplate' = None) -> str:
+        """
+        Token to claim the rewards of a template, carrying only its id and version, or to claim the given reward sets
+        when no template is given
+        """
         from core.services.beneficiaries import BeneficiariesService
 
-        if duration is None:
-            duration = timedelta(days=7)
-        jwk_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'jwk.json')
-
-        with open(jwk_path, 'r') as f:
-            jwk = jwt.jwk_from_dict(json.load(f))
-        encoder = jwt.JWT()
-
-        now = datetime.now(timezone.utc)
-        token_index = int(BeneficiariesService.add_token_index(authorizer))
-        payload = {
-            "sub": authorizer.sub,
-            "iat": get_int_from_datetime(now),
-            "exp": get_int_from_datetime(now + duration),
+        if token_index is None:
+            token_index = int(BeneficiariesService.add_token_index(authorizer))
+        if template is not None:
+            return tokens.encode_reward(authorizer.sub, {
+                "template": template.id,
+                "version": template.version,
+                "index": token_index,
+                "area": area
+            }, duration)
+        return tokens.encode_reward(authorizer.sub, {
             "static": static.to_map_list() if static is not None else [],
             "boxes": [box.to_map_list() for box in boxes] if boxes is not None else [],
             "index": token_index,
             "area": area,
             "reason": None if reason is None else reason.value
-        }
+        }, duration)
 
-        return encoder.encode(payload, jwk)
+    @staticmethod
+    def token_reward_sets(decoded: Dict[str, Any]) -> Tuple[RewardSet, List[RewardSet]]:
+        """
+        Static rewards and boxes of a decoded reward token: the ones of its template, or the ones embedded in the
+        token by tokens generated without a template
+        """
+        if 'template' in decoded:
+            template = reward_templates.get(decoded['template'], decoded.get('version'))
+            if template is None:
+                raise InvalidException('The reward token has an unknown reward template')
+            return template.static, template.boxes
+        return RewardSet.from_map_list(decoded.get('static', [])), [RewardSet.from_map_list(box)
+                                                                    for box in decoded.get('boxes', [])]
 
     @classmethod
     def claim_reward(cls, authorizer: Authorizer, reward_token: str, release: int, box_index: int = None) -> \
             List[Reward]:
         from core.services.beneficiaries import BeneficiariesService
+        from core.services.inventory import InventoryService
 
-        jwk_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'jwk.json')
-        with open(jwk_path, 'r') as f:
-            jwk = jwt.jwk_from_dict(json.load(f))
+        decoded = tokens.decode_reward(reward_token)
 
-        decoder = jwt.JWT()
-        try:
-            decoded = decoder.decode(reward_token, jwk)
-        except JWTDecodeError as e:
-            raise InvalidException(f'Invalid token: {e.args}')
-
-        now = get_int_from_datetime(datetime.now())
+        now = jwt.utils.get_int_from_datetime(datetime.now())
         if now > decoded["exp"]:
             raise ForbiddenException("The reward token has expired")
         if authorizer.sub != decoded["sub"]:
             raise ForbiddenException("This token does not belong to the claimer")
-        BeneficiariesService.set_reward_index(authorizer, decoded['index'])
 
-        boxes = decoded["boxes"]
-        probabilities: List[RewardProbability] = [RewardProbability.from_map(reward) for reward in decoded["static"]]
+        static, boxes = cls.token_reward_sets(decoded)
+        probabilities: List[RewardProbability] = static.rewards.copy()
         if len(boxes) > 0:
             if box_index is None:
                 raise InvalidException("A box must be chosen")
             if box_index >= len(boxes):
                 raise InvalidException(
                     f"Box index out of range, it must be between 0 (inclusive) and {len(boxes)} (exclusive)")
-            probabilities += [RewardProbability.from_map(reward) for reward in boxes[box_index]]
-        rewards = [RewardsService.get_random(probability.type, release, probability.rarity)
-                   for probability in probabilities]
-        LogsService.batch_create(logs=[
+            probabilities += boxes[box_index].rewards
+        rewards = cls.resolve_rewards(probabilities, release)
+        logs = [
             Log(
                 sub=authorizer.sub,
-                tag=join_key(LogTag.REWARD.name, rewards[reward_i].type.name, rewards[reward_i].id),
-                log='Won a reward',
-                data=rewards[reward_i].to_api_map(),
-                append_timestamp=rewards[reward_i].type != RewardType.AVATAR
+                tag=join_key(LogTag.REWARD.name, reward.type.name, reward.id),
+                log=REWARD_LOG,
+                data=reward.to_api_map(),
+                append_timestamp=not InventoryService.unique(reward.type)
             )
-            for reward_i in range(len(rewards))])
+            for reward in rewards]
+        log_operations = LogsService.batch_put_operations(logs)
+        inventory_operations = InventoryService.add_operations(authorizer.sub, logs)
+        categories = list(inventory_operations.keys())
+        # the token, the inventories and the logs are written at once, so an inventory built from the reward logs
+        # never misses or counts twice the rewards of a claim
+        operations = [
+            BeneficiariesService.claim_reward_index_operation(authorizer.sub, decoded['index'],
+                                                              cls.reward_scores(rewards, decoded.get('area'))),
+            *inventory_operations.values(),
+            *log_operations
+        ]
+        for attempt in range(CLAIM_ATTEMPTS):
+            try:
+                transact_write(operations)
+                break
+            except TransactionCanceledError as e:
+                if e.failed(0):
+                    raise InvalidException('This token has already been claimed')
+                missing = [category for i, category in enumerate(categories) if e.failed(i + 1)]
+                if len(missing) == 0 or attempt == CLAIM_ATTEMPTS - 1:
+                    raise
+                # inventories of rewards won before they existed are built from the reward logs first
+                InventoryService.build_all(authorizer.sub, missing)
+        return rewards
 
-        area: Optional[str] = decoded.get('area')
-        areas: List[str] = VALID_AREAS if area is None else [area]
+    @classmethod
+    def resolve_rewards(cls, probabilities: List[RewardProbability], release: int,
+                        rng: random.Random = None) -> List[Reward]:
+        """
+        Draw a reward for each probability. The catalog snapshots of the categories that aren't loaded yet are loaded
+        concurrently first, so every draw is then served from memory
+        """
+        release = int(release)
+        if release < 1:
+            raise InvalidException('Release must be positive and non-zero')
+        categories = list(dict.fromkeys(probability.type for probability in probabilities
+                                        if Reward.factory(probability.type, probability.rarity) is None))
+        gather(*[functools.partial(rewards_catalog.snapshot, category) for category in categories],
+               max_in_flight=ENVIRONMENT.db_max_in_flight)
+        return [cls.get_random(probability.type, release, probability.rarity, rng) for probability in probabilities]
 
+    @staticmethod
+    def reward_scores(rewards: List[Reward], area: Optional[str]) -> Dict[str, int]:
+        """
+        Score won by each area with the points rewards, split evenly between the areas when there is no area
+        """
+        areas: List[str] = VALID_AREAS if area is None else [area]
         scores = {}
         for r in rewards:
             if r.type != RewardType.POINTS:
@@ -335,14 +398,125 @@ class RewardsService(ModelService):
 
         for key in scores:
             scores[key] = math.ceil(scores[key])
-
-        BeneficiariesService.add_score(authorizer.sub, scores)
-        return rewards
+        return scores
 
     @classmethod
-    def get_user_rewards(cls, authorizer: Authorizer, category: RewardType):
+    def get_user_rewards(cls, authorizer: Authorizer, category: RewardType) -> List[Dict[str, Any]]:
+        """
+        API maps of the reward logs of a category won by a user. Rewards kept in the inventory are read from it, with
+        a map per reward, as its last log, with the times it was won in count
+        """
+        from core.services.inventory import InventoryService
+
+        if InventoryService.tracks(category):
+            return InventoryService.reward_logs(authorizer.sub, category)
         tag = join_key(LogTag.REWARD.name, category.name)
-        return LogsService.query(authorizer.sub, tag, limit=None)
+        return [log.to_api_map() for log in LogsService.query(authorizer.sub, tag, limit=None)]
+
+
+class RewardsSnapshot:
+    """
+    Rewards of a category by rarity, sorted by release, as they were when the snapshot was loaded
+    """
+
+    def __init__(self, category: RewardType, items: Iterable[dict], loaded_at: float):
+        self.category = category
+        self.loaded_at = loaded_at
+        self._rewards: Dict[RewardRarity, List[Reward]] = {rarity: [] for rarity in RewardRarity}
+        for item in sorted(items, key=lambda i: abs(i['release-id'])):
+            reward = Reward.from_db_map(item)
+            self._rewards[reward.rarity].append(reward)
+        self._release_ids = {rarity: [abs(reward.id) for reward in rewards]
+                             for rarity, rewards in self._rewards.items()}
+        self._counts: Dict[Tuple[int, RewardRarity], int] = {}
+        self._tables: Dict[Tuple[int, RewardRarity], AliasTable] = {}
+
+    def count(self, release: int, rarity: RewardRarity) -> int:
+        """
+        Number of rewards with the given rarity released up to the given release
+        """
+        key = (release, rarity)
+        count = self._counts.get(key)
+        if count is None:
+            count = bisect.bisect_right(self._release_ids[rarity], release * REWARDS_PER_RELEASE - 1)
+            self._counts[key] = count
+        return count
+
+    def rewards(self, release: int, rarity: RewardRarity) -> List[Reward]:
+        return self._rewards[rarity][:self.count(release, rarity)]
+
+    def table(self, release: int, rarity: RewardRarity) -> AliasTable:
+        """
+        Alias table over the weights of the rewards with the given rarity released up to the given release
+        """
+        key = (release, rarity)
+        table = self._tables.get(key)
+        if table is None:
+            rewards = self.rewards(release, rarity)
+            if len(rewards) == 0:
+                raise NotFoundException(f'No reward of type {self.category.name} found')
+            table = AliasTable([reward.weight for reward in rewards])
+            self._tables[key] = table
+        return table
+
+    def pick(self, release: int, rarity: RewardRarity, rng: random.Random = None) -> Reward:
+        return self._rewards[rarity][self.table(release, rarity).sample(rng)]
+
+    def pick_many(self, release: int, rarity: RewardRarity, k: int, rng: random.Random = None) -> List[Reward]:
+        rewards = self._rewards[rarity]
+        return [rewards[i] for i in self.table(release, rarity).sample_many(k, rng)]
+
+
+class RewardsCatalog:
+    """
+    Snapshots of the rewards of each category, loaded once per container with a single paged query and reloaded
+    after ttl seconds or when invalidated, as when a reward is created. Each category is loaded under its own lock, so
+    different categories load concurrently while a category is never loaded twice at once
+    """
+
+    def __init__(self, ttl: float = None, clock: Callable[[], float] = time.monotonic):
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._locks: Dict[RewardType, threading.Lock] = {}
+        self._snapshots: Dict[RewardType, RewardsSnapshot] = {}
+        # bumped by invalidate, so a load started before it doesn't publish its snapshot
+        self._generation = 0
+
+    @property
+    def ttl(self) -> float:
+        return ENVIRONMENT.rewards_catalog_ttl if self._ttl is None else self._ttl
+
+    def _expired(self, snapshot: Optional[RewardsSnapshot]) -> bool:
+        return snapshot is None or self._clock() - snapshot.loaded_at >= self.ttl
+
+    def _category_lock(self, category: RewardType) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(category, threading.Lock())
+
+    def snapshot(self, category: RewardType) -> RewardsSnapshot:
+        snapshot = self._snapshots.get(category)
+        if self._expired(snapshot):
+            with self._category_lock(category):
+                snapshot = self._snapshots.get(category)
+                if self._expired(snapshot):
+                    generation = self._generation
+                    snapshot = RewardsSnapshot(category, RewardsService.query_category(category), self._clock())
+                    with self._lock:
+                        if generation == self._generation:
+                            self._snapshots[category] = snapshot
+        return snapshot
+
+    def invalidate(self, category: RewardType = None):
+        with self._lock:
+            self._generation += 1
+            if category is None:
+                self._snapshots = {}
+            else:
+                self._snapshots.pop(category, None)
+
+
+rewards_catalog = RewardsCatalog()
 
 
 class RewardReason(Enum):
@@ -466,10 +640,62 @@ REWARDS_BY_REASON = {
 }
 
 
+# version of the templates built from REWARDS_BY_REASON. Bump it when the rewards of a reason change, and register
+# the previous templates as not current so the tokens generated with them can still be claimed until they expire
+REWARD_TEMPLATES_VERSION = 1
+
+
+class RewardTemplate:
+    """
+    Versioned static rewards and boxes of a reward token, kept in the server so tokens only carry the template id and
+    version
+    """
+
+    def __init__(self, id_: str, version: int, static: RewardSet, boxes: List[RewardSet]):
+        self.id = id_
+        self.version = version
+        self.static = static
+        self.boxes = boxes
+
+    def to_api_map(self) -> dict:
+        return {
+            "id": self.id,
+            "version": self.version,
+            "static": self.static.to_map_list(),
+            "boxes": [box.to_map_list() for box in self.boxes]
+        }
+
+
+class RewardTemplates:
+    def __init__(self):
+        self._templates: Dict[Tuple[str, int], RewardTemplate] = {}
+        self._current: Dict[str, RewardTemplate] = {}
+
+    def register(self, template: RewardTemplate, current: bool = True):
+        self._templates[(template.id, template.version)] = template
+        if current:
+            self._current[template.id] = template
+
+    def get(self, id_: str, version: int) -> Optional[RewardTemplate]:
+        return self._templates.get((id_, version))
+
+    def current(self, id_: str) -> RewardTemplate:
+        template = self._current.get(id_)
+        if template is None:
+            raise NotFoundException(f"Unknown reward template: {id_}")
+        return template
+
+
+reward_templates = RewardTemplates()
+for _reason, _rewards in REWARDS_BY_REASON.items():
+    reward_templates.register(RewardTemplate(_reason.value, REWARD_TEMPLATES_VERSION, _rewards['static'],
+                                             _rewards['boxes']))
+
+
 class RewardsFactory:
     @staticmethod
-    def get_reward_token_by_reason(authorizer: Authorizer, area: Optional[str], reason: RewardReason):
-        rewards = REWARDS_BY_REASON[reason]
-        token = RewardsService.generate_reward_token(authorizer=authorizer, static=rewards['static'],
-                                                     boxes=rewards['boxes'], reason=reason, area=area)
+    def get_reward_token_by_reason(authorizer: Authorizer, area: Optional[str], reason: RewardReason,
+                                   token_index: int = None):
+        token = RewardsService.generate_reward_token(authorizer=authorizer, area=area, token_index=token_index,
+                                                     template=reward_templates.current(reason.value))
         return token
@@ -0,0 +1,253 @@
+from typing import List, Dict, Any, Optional, Iterable
+
+from core import ModelService
+from core.db.fanout import FanOut
+from core.db.transaction import transact_write
+from core.router.environment import ENVIRONMENT
+from core.services.logs import LogsService, Log, LogTag, LogKey
+from core.utils import join_key
+from core.utils.key import split_key, split_line
+from core.utils.lazy import lazy_import
+
+ddb_conditions = lazy_import('boto3.dynamodb.conditions')
+
+MEMBER_TAG = 'MEMBER'
+SUMMARY_TAG = 'SUMMARY'
+
+COMPLETED_ATTRIBUTE = 'completed'
+PROGRESS_ATTRIBUTE = 'progress'
+
+# times a member item is built again when stats logs are appended to it while it is being rebuilt
+REBUILD_ATTEMPTS = 3
+
+
+class GroupStatsService(ModelService):
+    """
+    Aggregate of the stats logs of the members of a group. It lives in the logs table under a group partition, with an
+    item per member holding its progress and completed entries, so the stats of a group are read with a single query
+    instead of a query per member and no item grows past the item size limit. Each stats log appends its entry when
+    it is written, and the summary item marks groups whose aggregate was already built from their members' logs
+    """
+    __table_name__ = "logs"
+    __partition_key__ = "user"
+    __sort_key__ = "tag"
+
+    @staticmethod
+    def partition(district: str, group: str) -> str:
+        return join_key('GROUP', district, group)
+
+    @staticmethod
+    def member_tag(sub: str) -> str:
+        return join_key(MEMBER_TAG, sub)
+
+    @staticmethod
+    def entry(log: Log) -> Dict[str, Any]:
+        tags = log.tags
+        line, subline = split_line(tags[4])
+        return {
+            'stage': tags[2],
+            'area': tags[3],
+            'line': line,
+            'subline': subline,
+            'timestamp': log.timestamp
+        }
+
+    @staticmethod
+    def _attribute(log: Log) -> Optional[str]:
+        parent_tag = log.parent_tag
+        if parent_tag == LogTag.COMPLETED:
+            return COMPLETED_ATTRIBUTE
+        if parent_tag == LogTag.PROGRESS:
+            return PROGRESS_ATTRIBUTE
+        return None
+
+    @staticmethod
+    def _member(beneficiary: dict) -> Optional[tuple]:
+        """
+        District, group and unit of a beneficiary item read with its group and unit-user attributes
+        """
+        if beneficiary is None or beneficiary.get('group') is None:
+            return None
+        district, group = split_key(beneficiary['group'])
+        unit = split_key(beneficiary['unit-user'])[0] if beneficiary.get('unit-user') is not None else None
+        return district, group, unit
+
+    @classmethod
+    def record_operation(cls, beneficiary: dict, log: Log) -> Optional[dict]:
+        """
+        Build a transaction operation appending a stats log to the aggregate of the group of the given beneficiary
+        item, or None if the beneficiary has no group
+        """
+        member = cls._member(beneficiary)
+        attribute = cls._attribute(log)
+        if member is None or attribute is None:
+            return None
+        district, group, unit = member
+        return cls.get_interface().update_operation(cls.partition(district, group), sort_key=cls.member_tag(log.sub),
+                                                    updates={'unit': unit},
+                                                    append_or_create={attribute: [cls.entry(log)]})
+
+    @classmethod
+    def record(cls, log: Log):
+        """
+        Write a stats log together with its entry in the aggregate of the group of its user, in a single transaction,
+        so the aggregate never holds an entry of a log that wasn't written. Logs of users without a group are only
+        written
+        """
+        from core.services.beneficiaries import BeneficiariesService
+        beneficiary = BeneficiariesService.get_interface().get(log.sub, attributes=['group', 'unit-user']).item
+        operations = [LogsService.put_operation(log)]
+        stats_operation = cls.record_operation(beneficiary, log)
+        if stats_operation is not None:
+            operations.append(stats_operation)
+        transact_write(operations)
+
+    @classmethod
+    def register(cls, district: str, group: str, unit: str, sub: str):
+        """
+        Add a member without logs to the aggregate of its group
+        """
+        cls.get_interface().update(cls.partition(district, group), sort_key=cls.member_tag(sub),
+                                   updates={'unit': unit},
+                                   append_or_create={COMPLETED_ATTRIBUTE: [], PROGRESS_ATTRIBUTE: []})
+
+    @classmethod
+    def member_item(cls, district: str, group: str, unit: str, sub: str, logs: Iterable[Log]) -> dict:
+        """
+        Aggregate item of a member built from its stats logs, oldest first
+        """
+        item = {
+            'user': cls.partition(district, group),
+            'tag': cls.member_tag(sub),
+            'unit': unit,
+            COMPLETED_ATTRIBUTE: [],
+            PROGRESS_ATTRIBUTE: []
+        }
+        for log in logs:
+            attribute = cls._attribute(log)
+            if attribute is not None:
+                item[attribute].append(cls.entry(log))
+        return item
+
+    @classmethod
+    def rebuild(cls, district: str, group: str, max_in_flight: int = None,
+                current: Dict[str, dict] = None) -> List[dict]:
+        """
+        Build the aggregate of a group from the stats logs of its members and mark it as built. The logs of the
+        members are queried concurrently, with at most max_in_flight queries at once, and each member item is
+        written as soon as its logs are read. The member items in current, by tag, are the ones read before the
+        rebuild: each write is conditioned on the item being as it was read, so entries appended by stats logs
+        written in the meantime aren't lost, and the member is built again from its logs when it changed. Returns
+        the member items
+        """
+        from core.services.beneficiaries import BeneficiariesService
+        if max_in_flight is None:
+            max_in_flight = ENVIRONMENT.db_max_in_flight
+        current = {} if current is None else current
+        members = BeneficiariesService.query_group(district, group, attributes=['user', 'unit-user'])
+
+        def build(member) -> dict:
+            tag = cls.member_tag(member.user_sub)
+            read = current.get(tag)
+            for attempt in range(REBUILD_ATTEMPTS):
+                logs = LogsService.iter_tag(member.user_sub, 'STATS', is_full=False, scan_forward=True,
+                                            attributes=['tag', 'timestamp'])
+                item = cls.member_item(district, group, member.unit, member.user_sub, logs)
+                try:
+                    cls._write_member(item, read)
+                    return item
+                except cls.exceptions().ConditionalCheckFailedException:
+                    if attempt == REBUILD_ATTEMPTS - 1:
+                        raise
+                    read = cls.get_interface().get(cls.partition(district, group), tag).item
+
+        with FanOut(max_in_flight) as fanout:
+            items = [item for _, item in fanout.completed(build, members)]
+        try:
+            cls.get_interface().create(cls.partition(district, group), {}, SUMMARY_TAG, raise_if_exists_sort=True)
+        except cls.exceptions().ConditionalCheckFailedException:
+            # built by another request at the same time
+            pass
+        return items
+
+    @classmethod
+    def _write_member(cls, item: dict, read: Optional[dict]):
+        """
+        Write a rebuilt member item, if the stored item is still the read one: missing, or with as many entries
+        """
+        interface = cls.get_interface()
+        attributes = {'unit': item['unit'], COMPLETED_ATTRIBUTE: item[COMPLETED_ATTRIBUTE],
+                      PROGRESS_ATTRIBUTE: item[PROGRESS_ATTRIBUTE]}
+        if read is None:
+            interface.create(item['user'], attributes, item['tag'], raise_if_exists_sort=True)
+            return
+        conditions = None
+        for attribute in (COMPLETED_ATTRIBUTE, PROGRESS_ATTRIBUTE):
+            entries = read.get(attribute)
+            condition = ddb_conditions.Attr(attribute).not_exists() if entries is None else \
+                ddb_conditions.Attr(attribute).size().eq(len(entries))
+            conditions = condition if conditions is None else conditions & condition
+        interface.update(item['user'], attributes, item['tag'], conditions=conditions)
+
+    @classmethod
+    def query_members(cls, district: str, group: str) -> List[dict]:
+        """
+        Member items of the aggregate of a group, building it first if it doesn't exist yet
+        """
+        built = False
+        members = []
+        for item in cls.get_interface().iter_query(cls.partition(district, group)):
+            if item['tag'] == SUMMARY_TAG:
+                built = True
+            else:
+                members.append(item)
+        if not built:
+            return cls.rebuild(district, group, current={member['tag']: member for member in members})
+        return members
+
+    @classmethod
+    def get_stats(cls, district: str, group: str, unit: str = None, with_logs: bool = False) -> dict:
+        """
+        Log counts, completed objectives and progress logs of the members of a group, optionally only of a unit.
+        The text of the progress logs is only read when with_logs is set
+        """
+        members = cls.query_members(district, group)
+        if unit is not None:
+            members = [member for member in members if member.get('unit') == unit]
+
+        completed = {}
+        progress = {}
+        for member in members:
+            sub = split_key(member['tag'])[1]
+            completed[sub] = [{**entry, 'unit': member.get('unit')} for entry in
+                              reversed(member.get(COMPLETED_ATTRIBUTE, []))]
+            progress[sub] = [{**entry, 'unit': member.get('unit'), 'log': None} for entry in
+                             reversed(member.get(PROGRESS_ATTRIBUTE, []))]
+
+        if with_logs:
+            cls._fill_logs(progress)
+
+        counts = {LogTag.COMPLETED: sum(len(entries) for entries in completed.values()),
+                  LogTag.PROGRESS: sum(len(entries) for entries in progress.values())}
+        return {
+            'log_count': {tag.short: counts.get(tag, 0) for tag in LogTag},
+            'completed_objectives': completed,
+            'progress_logs': progress
+        }
+
+    @staticmethod
+    def _fill_logs(progress: Dict[str, List[dict]]):
+        keys = []
+        entries = []
+        for sub, sub_entries in progress.items():
+            for entry in sub_entries:
+                line = entry['line'] if entry['subline'] is None else f"{entry['line']}.{entry['subline']}"
+                tag = LogTag.PROGRESS.join(join_key(entry['stage'], entry['area'], line)).upper()
+                keys.append(LogKey(sub, join_key(tag, entry['timestamp'])))
+                entries.append(entry)
+        if len(keys) == 0:
+            return
+        logs = {(log.sub, log.tag): log.log for log in
+                LogsService.batch_get(keys, attributes=['user', 'tag', 'log'])}
+        for key, entry in zip(keys, entries):
+            entry['log'] = logs.get((key.sub, key.tag))
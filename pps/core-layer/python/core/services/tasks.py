@@ -1,24 +1,26 @@
-import json
-import math
-import os
 import time
 from datetime import timedelta, datetime, timezone
-from typing import List, Union, Optional
+from typing import List, Union, Optional, Tuple
 
-import jwt
 from core import ModelService
+from core.auth.tokens import tokens
 from core.aws.event import Authorizer
+from core.db.buffer import write_buffer
 from core.db.model import Operator, UpdateReturnValues
 from core.db.results import GetResult, QueryResult
+from core.db.transaction import TransactionCanceledError, transact_write
 from core.exceptions.forbidden import ForbiddenException
 from core.exceptions.invalid import InvalidException
 from core.exceptions.notfound import NotFoundException
+from core.services.logs import LogsService, LogTag
 from core.services.objectives import ObjectivesService, ScoreConfiguration
 from core.services.rewards import RewardsFactory, RewardReason
+from core.services.stats import GroupStatsService
 from core.utils import join_key
 from core.utils.key import split_key
-from jwt.utils import get_int_from_datetime
-from schema import Schema, SchemaError
+
+
+COMPLETE_TASK_ATTEMPTS = 3
 
 
 class ObjectiveKey:
@@ -122,21 +124,7 @@ class Task:
 
     @classmethod
     def generate_objective_token(cls, objective_key: str, authorizer: Authorizer, duration: timedelta = None):
-        if duration is None:
-            duration = timedelta(days=1)
-        jwk_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'jwk.json')
-        with open(jwk_path, 'r') as f:
-            jwk = jwt.jwk_from_dict(json.load(f))
-        encoder = jwt.JWT()
-
-        now = datetime.now(timezone.utc)
-        payload = {
-            'sub': authorizer.sub,
-            "iat": get_int_from_datetime(now),
-            "exp": get_int_from_datetime(now + duration),
-            "objective": objective_key
-        }
-        return encoder.encode(payload, jwk)
+        return tokens.encode_task(authorizer.sub, objective_key, duration)
 
 
 class TasksService(ModelService):
@@ -159,11 +147,12 @@ class TasksService(ModelService):
         sort_key = (Operator.BEGINS_WITH, join_key(*args, '')) if len(args) > 0 else None
         return QueryResult.from_list(
             [
-                Task.from_db_dict(item) for item in interface.query(partition_key=sub, sort_key=sort_key,
-                                                                    attributes=['objective', 'original-objective',
-                                                                                'personal-objective',
-                                                                                'completed',
-                                                                                'tasks', 'user']).items
+                Task.from_db_dict(item) for item in interface.iter_query(partition_key=sub, sort_key=sort_key,
+                                                                         attributes=['objective',
+                                                                                     'original-objective',
+                                                                                     'personal-objective',
+                                                                                     'completed',
+                                                                                     'tasks', 'user'])
             ])
 
     """Active Task methods"""
@@ -203,19 +192,7 @@ class TasksService(ModelService):
 
     @classmethod
     def get_task_token_objective(cls, token: str, authorizer: Authorizer) -> str:
-        jwk_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'jwk.json')
-        with open(jwk_path, 'r') as f:
-            jwk = jwt.jwk_from_dict(json.load(f))
-        decoded = jwt.JWT().decode(token, jwk)
-        try:
-            Schema({
-                "sub": str,
-                "objective": str,
-                "exp": int,
-                "iat": int
-            }).validate(decoded)
-        except SchemaError:
-            raise InvalidException("The given task token is not valid")
+        decoded = tokens.decode_task(token)
         if authorizer.sub != decoded['sub']:
             raise ForbiddenException("The given task token does not belong to this user")
         return decoded['objective']
@@ -232,60 +209,83 @@ class TasksService(ModelService):
             "target")
 
     @classmethod
-    def complete_active_task(cls, authorizer: Authorizer):
+    def complete_active_task(cls, authorizer: Authorizer) -> Optional[Tuple[dict, str]]:
+        """
+        Complete the active task in a single transaction that clears it and adds its score, stores it as completed,
+        logs the completion, adds it to the group stats and takes the reward token index. Returns the completed task
+        and its reward token, or None if there is no active task
+        """
         from core.services.beneficiaries import BeneficiariesService
-        old_active_task = BeneficiariesService.clear_active_task(authorizer,
-                                                                 return_values=UpdateReturnValues.UPDATED_OLD,
-                                                                 receive_score=True).get("target")
-        if old_active_task is None:
-            return None
-
-        interface = cls.get_interface()
-        old_active_task['completed'] = True
-        for subtask in old_active_task['tasks']:
-            subtask['completed'] = True
-        interface.create(authorizer.sub, old_active_task, old_active_task['objective'])
-        return old_active_task
+        beneficiaries = BeneficiariesService.get_interface()
+        for _ in range(COMPLETE_TASK_ATTEMPTS):
+            # read with native numbers, as the task is written back and floats can't be
+            beneficiary = beneficiaries.get(authorizer.sub,
+                                            attributes=['target', 'generated_token_last', 'group', 'unit-user'],
+                                            fast=True).item
+            task = beneficiary.get('target') if beneficiary is not None else None
+            if task is None:
+                return None
+            last_token_index = beneficiary.get('generated_token_last')
+
+            task['completed'] = True
+            for subtask in task['tasks']:
+                subtask['completed'] = True
+            area = split_key(task['objective'])[1]
+            log = LogsService.new_log(authorizer.sub, LogTag.COMPLETED.join(task['objective'].upper()),
+                                      'Completed an objective!', {})
+            operations = [
+                BeneficiariesService.complete_active_task_operation(authorizer.sub, area, last_token_index),
+                cls.get_interface().create_operation(authorizer.sub, task, task['objective']),
+                LogsService.put_operation(log)
+            ]
+            stats_operation = GroupStatsService.record_operation(beneficiary, log)
+            if stats_operation is not None:
+                operations.append(stats_operation)
+            try:
+                transact_write(operations)
+            except TransactionCanceledError as e:
+                if e.failed(0):
+                    # the active task or the token index changed after being read
+                    continue
+                raise
+            reward = RewardsFactory.get_reward_token_by_reason(
+                authorizer=authorizer, area=area, reason=RewardReason.COMPLETE_OBJECTIVE,
+                token_index=BeneficiariesService.next_token_index(last_token_index))
+            return task, reward
+        raise InvalidException('The active task changed while it was being completed')
 
     @classmethod
     def initialize(cls, authorizer: Authorizer, objectives: List[ObjectiveKey]):
         from core.services.beneficiaries import BeneficiariesService
-        cls._add_objectives_as_completed(authorizer, objectives)
+        # deferred, so the objectives are only written if the beneficiary wasn't initialized yet: the request's write
+        # buffer is discarded when marking it fails
+        cls._add_objectives_as_completed(authorizer, objectives, deferred=True)
         BeneficiariesService.mark_as_initialized(authorizer=authorizer)
         return RewardsFactory.get_reward_token_by_reason(authorizer=authorizer, reason=RewardReason.INITIALIZE,
                                                          area=None)
 
     @classmethod
-    def _add_objectives_as_completed(cls, authorizer: Authorizer, objectives: List[ObjectiveKey]):
-        # noinspection PyProtectedMember
-        model = cls.get_interface()._model
-        client = model.get_table().meta.client
+    def _add_objectives_as_completed(cls, authorizer: Authorizer, objectives: List[ObjectiveKey],
+                                     deferred: bool = False):
         now = datetime.now(timezone.utc)
         now = int(now.timestamp() * 1000)
-        n_chunks = math.ceil(len(objectives) / 25)
-        # do batch writes in chunks of 25 to avoid errors
-        for i_chunk in range(n_chunks):
-            start = i_chunk * 25
-            end = min((i_chunk + 1) * 25, len(objectives))
-            chunk = objectives[start:end]
-            request_items = {
-                model.__table_name__: [
-                    {
-                        'PutRequest': {
-                            'Item': {
-                                'completed': True,
-                                'created': now,
-                                'objective': join_key(authorizer.stage, key.area, f'{key.line}.{key.subline}'),
-                                'original-objective': ObjectivesService.get(authorizer.stage, key.area, key.line,
-                                                                            key.subline),
-                                'personal-objective': None,
-                                'score': 0,
-                                'tasks': [],
-                                'user': authorizer.sub
-                            },
-                        }
-                    } for key in chunk]
-            }
-            client.batch_write_item(
-                RequestItems=request_items
-            )
+        catalog = ObjectivesService.catalog(authorizer.stage)
+        items = [{
+            'completed': True,
+            'created': now,
+            'objective': join_key(authorizer.stage, key.area, f'{key.line}.{key.subline}'),
+            'original-objective': catalog.get(key.area, key.line, key.subline),
+            'personal-objective': None,
+            'score': 0,
+            'tasks': [],
+            'user': authorizer.sub
+        } for key in objectives]
+        interface = cls.get_interface()
+        if deferred and write_buffer.active:
+            for item in items:
+                interface.create_deferred(item['user'], item, item['objective'])
+            return None
+        with interface.batch_writer() as writer:
+            for item in items:
+                writer.put(item)
+        return writer.stats
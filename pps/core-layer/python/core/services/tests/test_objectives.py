@@ -1,7 +1,9 @@
+import json
+
 import pytest
 
 from core.exceptions.notfound import NotFoundException
-from core.services.objectives import ObjectivesService
+from core.services.objectives import ObjectivesService, ObjectivesCatalog
 
 
 def test_get_stage():
@@ -21,3 +23,33 @@ def test_get():
         ObjectivesService.get("puberty", "spirituality", 1, 3)
     ObjectivesService.get("puberty", "spirituality", 1, 1)
 
+
+def test_catalog():
+    catalog = ObjectivesCatalog('puberty', {
+        'corporality': [['1.1', '1.2'], ['2.1']],
+        'creativity': [['1.1']]
+    })
+    assert catalog.get('corporality', 1, 2) == '1.2'
+    assert catalog.get('corporality', 2, 1) == '2.1'
+    assert catalog.area('creativity') == [['1.1']]
+    for area, line, sub_line in [('spirituality', 1, 1), ('corporality', 3, 1), ('corporality', 0, 1),
+                                 ('corporality', 2, 2), ('corporality', 1, 0)]:
+        with pytest.raises(NotFoundException):
+            catalog.get(area, line, sub_line)
+    assert catalog.json is catalog.json
+    assert json.loads(catalog.json) == catalog.objectives
+
+
+def test_catalog_loaded_once(monkeypatch):
+    loaded = []
+
+    def load(stage):
+        loaded.append(stage)
+        return ObjectivesCatalog(stage, {'corporality': [['1.1']]})
+
+    monkeypatch.setattr(ObjectivesCatalog, 'load', staticmethod(load))
+    monkeypatch.setattr(ObjectivesService, '_catalogs', {})
+    assert ObjectivesService.get('puberty', 'corporality', 1, 1) == '1.1'
+    assert ObjectivesService.query_json('puberty') == '{"corporality": [["1.1"]]}'
+    assert ObjectivesService.get_area('puberty', 'corporality') == [['1.1']]
+    assert loaded == ['puberty']
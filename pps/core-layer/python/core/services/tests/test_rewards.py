@@ -1,3 +1,6 @@
+import functools
+import random
+import threading
 from unittest.mock import patch
 
 import pytest
@@ -7,9 +10,15 @@ import schema
 from boto3.dynamodb.conditions import Key
 from botocore.stub import Stubber
 from core.aws.event import Authorizer
+from core.db.transaction import TransactionCanceledError
+from core.db.fanout import gather
 from core.services.logs import LogsService
+from core.exceptions.invalid import InvalidException
+from core.exceptions.notfound import NotFoundException
+from core.services.beneficiaries import BeneficiariesService
+from core.services.inventory import InventoryService
 from core.services.rewards import RewardsService, RewardSet, RewardType, RewardProbability, RewardRarity, \
-    RewardReason
+    RewardReason, RewardsCatalog, rewards_catalog, RewardsFactory, reward_templates, REWARD_TEMPLATES_VERSION
 from freezegun import freeze_time
 
 
@@ -22,6 +31,13 @@ def ddb_stubber():
     ddb_stubber.deactivate()
 
 
+@pytest.fixture(autouse=True)
+def empty_catalog():
+    rewards_catalog.invalidate()
+    yield
+    rewards_catalog.invalidate()
+
+
 @freeze_time('2020-01-01')
 def test_reward_token(ddb_stubber: Stubber):
     authorizer = Authorizer({
@@ -85,7 +101,9 @@ def test_reward_token(ddb_stubber: Stubber):
 
 
 @freeze_time('2020-01-01')
-def test_claim_reward(ddb_stubber: Stubber):
+def test_claim_reward(ddb_stubber: Stubber, monkeypatch):
+    # a single catalog load in flight, so the stubbed responses are requested in order
+    monkeypatch.setenv('DB_MAX_IN_FLIGHT', '1')
     authorizer = Authorizer({
         "claims": {
             "sub": "abcABC123"
@@ -117,24 +135,6 @@ def test_claim_reward(ddb_stubber: Stubber):
 
     ddb_stubber.add_response('update_item', update_response, update_params)
 
-    update_response = {
-        'Attributes': {
-            'n_claimed_tokens': {'N': str(10)}
-        }
-    }
-
-    update_params = {
-        'ConditionExpression': '#attr_n_claimed_tokens < :val_n_claimed_tokens',
-        'ExpressionAttributeNames': {'#attr_n_claimed_tokens': 'n_claimed_tokens'},
-        'ExpressionAttributeValues': {':val_n_claimed_tokens': 10},
-        'Key': {'user': 'abcABC123'},
-        'ReturnValues': 'UPDATED_NEW',
-        'TableName': 'beneficiaries',
-        'UpdateExpression': 'SET #attr_n_claimed_tokens=:val_n_claimed_tokens'
-    }
-
-    ddb_stubber.add_response('update_item', update_response, update_params)
-
     for reward in static_rewards.rewards + box_rewards[0].rewards:
         if reward.type == RewardType.POINTS:
             continue
@@ -153,136 +153,94 @@ def test_claim_reward(ddb_stubber: Stubber):
                 }
             ]
         }
-        lowest = 0
-        highest = -99999 if reward.rarity == RewardRarity.RARE else 99999
         params = {
             'ExpressionAttributeNames': {'#attr_category': 'category',
                                          '#attr_description': 'description',
                                          '#attr_price': 'price',
-                                         '#attr_release_id': 'release-id'},
-            'KeyConditionExpression':
-                Key('category').eq(reward.type.name) & Key('release-id').between(min(lowest, highest),
-                                                                                 max(lowest, highest)),
-            'Limit': 1,
-            'ProjectionExpression': '#attr_category, #attr_description, #attr_release_id, #attr_price',
+                                         '#attr_release_id': 'release-id',
+                                         '#attr_weight': 'weight'},
+            'KeyConditionExpression': Key('category').eq(reward.type.name),
+            'ProjectionExpression': '#attr_category, #attr_description, #attr_release_id, #attr_price, '
+                                    '#attr_weight',
             'TableName': 'rewards'
         }
         ddb_stubber.add_response('query', response, params)
 
-    batch_response = {
+    def reward_data(category: str) -> dict:
+        return {'category': category, 'rarity': 'RARE', 'description': 'A description', 'id': 12345, 'release': 1}
 
-    }
+    def inventory_update(category: str, won: int, counts: str) -> dict:
+        return {'Update': {
+            'TableName': 'logs',
+            'Key': {'user': 'INVENTORY::abcABC123', 'tag': category},
+            'UpdateExpression': 'SET #attr_rewards.#attr_rewards_12345=:val_rewards_12345, '
+                                '#attr_won.#attr_won_12345=:val_won_12345' + counts,
+            'ConditionExpression': 'attribute_exists(#attr_rewards)',
+            'ExpressionAttributeNames': {
+                '#attr_counts': 'counts',
+                '#attr_counts_12345': '12345',
+                '#attr_rewards': 'rewards',
+                '#attr_rewards_12345': '12345',
+                '#attr_won': 'won',
+                '#attr_won_12345': '12345'
+            },
+            'ExpressionAttributeValues': {':val_counts_12345': 1, ':val_rewards_12345': reward_data(category),
+                                          ':val_won_12345': won}
+        }}
 
-    batch_params = {
-        'RequestItems': {
-            'logs': [
-                {
-                    'PutRequest': {
-                        'Item': {
-                            'user': 'abcABC123',
-                            'tag': 'REWARD::POINTS::' + str(1577836800000),
-                            'timestamp': 1577836800000,
-                            'log': 'Won a reward',
-                            'data': {
-                                'category': 'POINTS',
-                                'description': {
-                                    'amount': 20
-                                },
-                                'rarity': 'COMMON',
-                                'release': 0
-                            }
-                        }
-                    }
-                },
-                {
-                    'PutRequest': {
-                        'Item': {
-                            'user': 'abcABC123',
-                            'tag': 'REWARD::POINTS::' + str(1577836800001),
-                            'timestamp': 1577836800001,
-                            'log': 'Won a reward',
-                            'data': {
-                                'category': 'POINTS',
-                                'rarity': 'COMMON',
-                                'release': 0,
-                                'description': {
-                                    'amount': 20
-                                }
-                            }
-                        }
-                    }
-                },
-                {
-                    'PutRequest': {
-                        'Item': {
-                            'user': 'abcABC123',
-                            'tag': 'REWARD::ZONE::12345::' + str(1577836800002),
-                            'timestamp': 1577836800002,
-                            'log': 'Won a reward',
-                            'data': {
-                                'category': 'ZONE',
-                                'rarity': 'RARE',
-                                'description': 'A description',
-                                'id': 12345,
-                                'release': 1,
-                            }
-                        }
-                    }
-                },
-                {
-                    'PutRequest': {
-                        'Item': {
-                            'user': 'abcABC123',
-                            'tag': 'REWARD::AVATAR::12345',
-                            'timestamp': 1577836800003,
-                            'log': 'Won a reward',
-                            'data': {
-                                'category': 'AVATAR',
-                                'rarity': 'RARE',
-                                'id': 12345,
-                                'release': 1,
-                                'description': 'A description'
-                            }
-                        }
-                    }
-                }
-            ]}
-    }
-    ddb_stubber.add_response('batch_write_item', batch_response, batch_params)
+    def log_put(tag: str, timestamp: int, data: dict) -> dict:
+        return {'Put': {
+            'TableName': 'logs',
+            'Item': {'user': 'abcABC123', 'tag': tag, 'timestamp': timestamp, 'log': 'Won a reward', 'data': data}
+        }}
 
-    ddb_stubber.add_response('update_item', {}, {
-        'ExpressionAttributeNames': {
-            '#attr_score': 'score',
-            '#attr_score_affectivity': 'affectivity',
-            '#attr_score_character': 'character',
-            '#attr_score_corporality': 'corporality',
-            '#attr_score_creativity': 'creativity',
-            '#attr_score_sociability': 'sociability',
-            '#attr_score_spirituality': 'spirituality'
-        },
-        'ExpressionAttributeValues': {
-            ':val_score_affectivity': 7,
-            ':val_score_character': 7,
-            ':val_score_corporality': 7,
-            ':val_score_creativity': 7,
-            ':val_score_sociability': 7,
-            ':val_score_spirituality': 7
-        },
-        'Key': {'user': 'abcABC123'},
-        'ReturnValues': 'UPDATED_NEW',
-        'TableName': 'beneficiaries',
-        'UpdateExpression': 'ADD #attr_score.#attr_score_corporality '
-                            ':val_score_corporality, '
-                            '#attr_score.#attr_score_creativity '
-                            ':val_score_creativity, #attr_score.#attr_score_character '
-                            ':val_score_character, '
-                            '#attr_score.#attr_score_affectivity '
-                            ':val_score_affectivity, '
-                            '#attr_score.#attr_score_sociability '
-                            ':val_score_sociability, '
-                            '#attr_score.#attr_score_spirituality '
-                            ':val_score_spirituality'
-    })
+    points = {'category': 'POINTS', 'description': {'amount': 20}, 'rarity': 'COMMON', 'release': 0}
+    # the token index, the inventories and the logs are written at once
+    ddb_stubber.add_response('transact_write_items', {}, {'TransactItems': [
+        {'Update': {
+            'TableName': 'beneficiaries',
+            'Key': {'user': 'abcABC123'},
+            'ConditionExpression': '#attr_n_claimed_tokens < :val_n_claimed_tokens',
+            'ExpressionAttributeNames': {
+                '#attr_n_claimed_tokens': 'n_claimed_tokens',
+                '#attr_score': 'score',
+                '#attr_score_affectivity': 'affectivity',
+                '#attr_score_character': 'character',
+                '#attr_score_corporality': 'corporality',
+                '#attr_score_creativity': 'creativity',
+                '#attr_score_sociability': 'sociability',
+                '#attr_score_spirituality': 'spirituality'
+            },
+            'ExpressionAttributeValues': {
+                ':val_n_claimed_tokens': 10,
+                ':val_score_affectivity': 7,
+                ':val_score_character': 7,
+                ':val_score_corporality': 7,
+                ':val_score_creativity': 7,
+                ':val_score_sociability': 7,
+                ':val_score_spirituality': 7
+            },
+            'UpdateExpression': 'SET #attr_n_claimed_tokens=:val_n_claimed_tokens '
+                                'ADD #attr_score.#attr_score_corporality '
+                                ':val_score_corporality, '
+                                '#attr_score.#attr_score_creativity '
+                                ':val_score_creativity, #attr_score.#attr_score_character '
+                                ':val_score_character, '
+                                '#attr_score.#attr_score_affectivity '
+                                ':val_score_affectivity, '
+                                '#attr_score.#attr_score_sociability '
+                                ':val_score_sociability, '
+                                '#attr_score.#attr_score_spirituality '
+                                ':val_score_spirituality'
+        }},
+        inventory_update('ZONE', 1577836800002, ' ADD #attr_counts.#attr_counts_12345 :val_counts_12345'),
+        # avatars are counted once, as their logs
+        inventory_update('AVATAR', 1577836800003, ', #attr_counts.#attr_counts_12345=:val_counts_12345'),
+        log_put('REWARD::POINTS::' + str(1577836800000), 1577836800000, points),
+        log_put('REWARD::POINTS::' + str(1577836800001), 1577836800001, points),
+        log_put('REWARD::ZONE::12345::' + str(1577836800002), 1577836800002, reward_data('ZONE')),
+        log_put('REWARD::AVATAR::12345', 1577836800003, reward_data('AVATAR'))
+    ]})
 
     token = RewardsService.generate_reward_token(authorizer, static=static_rewards, boxes=box_rewards)
     with patch('random.randint', lambda a, b: 0 if a < 0 else b):
@@ -324,36 +282,157 @@ def test_claim_reward(ddb_stubber: Stubber):
 
 def test_get_random(ddb_stubber: Stubber):
     params = {
-        'KeyConditionExpression': Key('category').eq('AVATAR') & Key('release-id').between(0, 99999),
-        'ProjectionExpression': '#attr_category, #attr_description, #attr_release_id, #attr_price',
+        'KeyConditionExpression': Key('category').eq('AVATAR'),
+        'ProjectionExpression': '#attr_category, #attr_description, #attr_release_id, #attr_price, #attr_weight',
         'ExpressionAttributeNames': {
             '#attr_category': 'category',
             '#attr_description': 'description',
             '#attr_price': 'price',
-            '#attr_release_id': 'release-id'
+            '#attr_release_id': 'release-id',
+            '#attr_weight': 'weight'
         },
-        'Limit': 1,
         'TableName': 'rewards'}
     response = {
         'Items': [
             {
-                'category': {
-                    'S': 'AVATAR'
-                },
-                'description': {
-                    'S': 'A description'
-                },
-                'release-id': {
-                    'N': str(112345)
-                }
-            }
+                'category': {'S': 'AVATAR'},
+                'description': {'S': f'Reward {release_id}'},
+                'release-id': {'N': str(release_id)}
+            } for release_id in [-100001, -5, 0, 12345, 112345, 212345]
         ]
     }
     ddb_stubber.add_response('query', response, params)
-    with patch('random.randint', lambda a, b: b):
-        reward = RewardsService.get_random(RewardType.AVATAR, 1, RewardRarity.COMMON)
-    assert reward.release == 2
-    assert reward.id == 112345
-    assert reward.type == RewardType.AVATAR
-    assert reward.description == 'A description'
+    with patch('random.randrange', lambda n: n - 1):
+        reward = RewardsService.get_random(RewardType.AVATAR, 2, RewardRarity.COMMON)
+        assert reward.release == 2
+        assert reward.id == 112345
+        assert reward.type == RewardType.AVATAR
+        assert reward.description == 'Reward 112345'
+        # served by the snapshot, without querying again
+        assert RewardsService.get_random(RewardType.AVATAR, 1, RewardRarity.COMMON).id == 12345
+        assert RewardsService.get_random(RewardType.AVATAR, 1, RewardRarity.RARE).id == 5
+        assert RewardsService.get_random(RewardType.AVATAR, 3, RewardRarity.RARE).id == 100001
+    with pytest.raises(NotFoundException):
+        rewards_catalog.snapshot(RewardType.AVATAR).pick(0, RewardRarity.COMMON)
     ddb_stubber.assert_no_pending_responses()
+
+
+def test_weighted_pick():
+    items = [{'category': 'ZONE', 'description': 'Rare', 'release-id': 1, 'weight': 1},
+             {'category': 'ZONE', 'description': 'Common', 'release-id': 2, 'weight': 9},
+             {'category': 'ZONE', 'description': 'Next release', 'release-id': 100001, 'weight': 1000}]
+    with patch.object(RewardsService, 'query_category', lambda category: items):
+        picks = rewards_catalog.snapshot(RewardType.ZONE).pick_many(1, RewardRarity.COMMON, 10000,
+                                                                    random.Random(7))
+        again = [RewardsService.get_random(RewardType.ZONE, 1, RewardRarity.COMMON, random.Random(7))
+                 for _ in range(3)]
+    assert {reward.description for reward in picks} == {'Rare', 'Common'}
+    assert 0.08 < sum(reward.description == 'Rare' for reward in picks) / len(picks) < 0.12
+    # deterministic under a seed
+    assert len({reward.id for reward in again}) == 1
+
+
+def test_catalog_ttl():
+    now = [0.0]
+    loads = []
+
+    catalog = RewardsCatalog(ttl=10, clock=lambda: now[0])
+    with patch.object(RewardsService, 'query_category', lambda category: loads.append(category) or [
+        {'category': category.name, 'description': 'A reward', 'release-id': 1}
+    ]):
+        snapshot = catalog.snapshot(RewardType.ZONE)
+        now[0] = 9
+        assert catalog.snapshot(RewardType.ZONE) is snapshot
+        now[0] = 10
+        assert catalog.snapshot(RewardType.ZONE) is not snapshot
+        catalog.invalidate(RewardType.ZONE)
+        catalog.snapshot(RewardType.ZONE)
+    assert loads == [RewardType.ZONE] * 3
+
+
+def test_catalog_concurrent_loads():
+    categories = [RewardType.ZONE, RewardType.DECORATION, RewardType.AVATAR]
+    # every load waits for the others, so it only returns if the categories load at the same time
+    barrier = threading.Barrier(len(categories), timeout=5)
+
+    def query_category(category):
+        barrier.wait()
+        return [{'category': category.name, 'description': 'A reward', 'release-id': 1}]
+
+    catalog = RewardsCatalog(ttl=10)
+    with patch.object(RewardsService, 'query_category', query_category):
+        snapshots = gather(*[functools.partial(catalog.snapshot, category) for category in categories],
+                           max_in_flight=len(categories))
+    assert [snapshot.category for snapshot in snapshots] == categories
+
+
+@freeze_time('2020-01-01')
+def test_template_token():
+    authorizer = Authorizer({"claims": {"sub": "abcABC123"}})
+    token = RewardsFactory.get_reward_token_by_reason(authorizer, area='corporality',
+                                                      reason=RewardReason.COMPLETE_OBJECTIVE, token_index=3)
+    decoded = jwt.JWT().decode(token, do_verify=False)
+    assert decoded == {
+        'sub': 'abcABC123',
+        'iat': 1577836800,
+        'exp': 1577836800 + 7 * 24 * 60 * 60,
+        'template': 'COMPLETE_OBJECTIVE',
+        'version': REWARD_TEMPLATES_VERSION,
+        'index': 3,
+        'area': 'corporality'
+    }
+    legacy_token = RewardsService.generate_reward_token(
+        authorizer, static=RewardSet([RewardProbability(RewardType.POINTS, RewardRarity.COMMON)]),
+        boxes=[RewardSet([RewardProbability(RewardType.NEEDS, RewardRarity.COMMON)])], token_index=4)
+    assert len(token) < len(legacy_token)
+
+    items = [{'category': category.name, 'description': 'A reward', 'release-id': release_id}
+             for category in RewardType for release_id in (-5, 5)]
+    with patch.object(RewardsService, 'query_category',
+                      lambda category: [item for item in items if item['category'] == category.name]), \
+            patch.object(BeneficiariesService, 'claim_reward_index_operation') as claim_index, \
+            patch('core.services.rewards.transact_write'):
+        rewards = RewardsService.claim_reward(authorizer, token, release=1, box_index=1)
+        assert [(reward.type, reward.rarity) for reward in rewards] == [
+            (RewardType.NEEDS, RewardRarity.RARE),
+            (RewardType.ZONE, RewardRarity.RARE),
+            (RewardType.POINTS, RewardRarity.RARE),
+            (RewardType.DECORATION, RewardRarity.RARE),
+            (RewardType.AVATAR, RewardRarity.COMMON),
+        ]
+        assert claim_index.call_args[0][1] == 3
+
+        # tokens embedding their rewards are still claimed
+        rewards = RewardsService.claim_reward(authorizer, legacy_token, release=1, box_index=0)
+        assert [reward.type for reward in rewards] == [RewardType.POINTS, RewardType.NEEDS]
+        assert claim_index.call_args[0][1] == 4
+
+    unknown_version = RewardsService.generate_reward_token(
+        authorizer, template=reward_templates.current(RewardReason.INITIALIZE.value), token_index=5)
+    decoded = jwt.JWT().decode(unknown_version, do_verify=False)
+    assert decoded['template'] == 'INITIALIZE'
+    with pytest.raises(InvalidException):
+        RewardsService.token_reward_sets({**decoded, 'version': REWARD_TEMPLATES_VERSION + 1})
+
+
+@freeze_time('2020-01-01')
+def test_claim_builds_inventories():
+    authorizer = Authorizer({"claims": {"sub": "abcABC123"}})
+    token = RewardsService.generate_reward_token(
+        authorizer, static=RewardSet([RewardProbability(RewardType.POINTS, RewardRarity.COMMON),
+                                      RewardProbability(RewardType.ZONE, RewardRarity.COMMON)]), token_index=3)
+    items = [{'category': 'ZONE', 'description': 'A reward', 'release-id': 5}]
+    with patch.object(RewardsService, 'query_category', lambda category: items), \
+            patch('core.services.rewards.transact_write', side_effect=[
+                TransactionCanceledError([None, 'ConditionalCheckFailed', None, None]), None
+            ]) as transact, patch.object(InventoryService, 'get') as get_inventory:
+        RewardsService.claim_reward(authorizer, token, release=1)
+        # the zone inventory didn't exist yet, so it's built from the logs before writing the claim again
+        get_inventory.assert_called_once_with('abcABC123', RewardType.ZONE)
+        assert transact.call_count == 2
+
+    with patch.object(RewardsService, 'query_category', lambda category: items), \
+            patch('core.services.rewards.transact_write', side_effect=TransactionCanceledError(
+                ['ConditionalCheckFailed', None, None, None])):
+        with pytest.raises(InvalidException):
+            RewardsService.claim_reward(authorizer, token, release=1)
@@ -0,0 +1,40 @@
+import importlib
+from types import ModuleType
+
+__all__ = ['LazyModule', 'lazy_import']
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is only imported when one of its attributes is first used
+    """
+
+    def __init__(self, name: str):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__dict__['_name'])
+            self.__dict__['_module'] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__['_module'] is not None
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Import a module on first use, keeping heavy dependencies (boto3, jwt, schema, yaml) out of the cold start of
+    the functions that don't need them
+    """
+    return LazyModule(name)
@@ -0,0 +1,63 @@
+import random
+from typing import List, Sequence
+
+__all__ = ['AliasTable']
+
+
+class AliasTable:
+    """
+    Weighted sampling in constant time per draw with Vose's alias method. The table is built once from the weights,
+    in linear time; each draw takes a random column and either keeps it or jumps to its alias. Draws only depend on
+    the given random generator, so a seeded random.Random makes them reproducible
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("At least one weight is needed")
+        if any(weight < 0 for weight in weights):
+            raise ValueError("Weights can't be negative")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("At least one weight must be positive")
+
+        self.n = n
+        self.probabilities: List[float] = [0.0] * n
+        self.aliases: List[int] = list(range(n))
+
+        scaled = [weight * n / total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while len(small) > 0 and len(large) > 0:
+            less = small.pop()
+            more = large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1
+            (small if scaled[more] < 1 else large).append(more)
+        # whatever is left is 1 up to rounding errors
+        for i in large + small:
+            self.probabilities[i] = 1.0
+
+    def sample(self, rng: random.Random = None) -> int:
+        """
+        Index of a weight, drawn with probability proportional to it
+        """
+        rng = rng or random
+        column = rng.randrange(self.n)
+        if self.probabilities[column] >= 1.0 or rng.random() < self.probabilities[column]:
+            return column
+        return self.aliases[column]
+
+    def sample_many(self, k: int, rng: random.Random = None) -> List[int]:
+        rng = rng or random
+        return [self.sample(rng) for _ in range(k)]
+
+    def probability(self, index: int) -> float:
+        """
+        Probability of drawing the given index, recovered from the table
+        """
+        own = self.probabilities[index]
+        aliased = sum(1.0 - self.probabilities[i] for i in range(self.n)
+                      if self.aliases[i] == index and i != index)
+        return (own + aliased) / self.n
@@ -0,0 +1,14 @@
+import sys
+
+from ..lazy import lazy_import
+
+
+def test_lazy_import():
+    sys.modules.pop('colorsys', None)
+    colorsys = lazy_import('colorsys')
+    assert not colorsys.loaded
+    assert 'colorsys' not in sys.modules
+
+    assert colorsys.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert colorsys.loaded
+    assert 'colorsys' in sys.modules
@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from ..sampling import AliasTable
+
+
+def test_alias_table():
+    weights = [1, 2, 3, 0, 4]
+    table = AliasTable(weights)
+    for i, weight in enumerate(weights):
+        assert table.probability(i) == pytest.approx(weight / sum(weights))
+
+    draws = table.sample_many(50000, random.Random(1))
+    assert 3 not in draws
+    for i, weight in enumerate(weights):
+        assert draws.count(i) / len(draws) == pytest.approx(weight / sum(weights), abs=0.01)
+
+    # deterministic under a seed
+    assert table.sample_many(100, random.Random(5)) == table.sample_many(100, random.Random(5))
+    assert AliasTable([2.5]).sample_many(3) == [0, 0, 0]
+
+
+def test_alias_table_errors():
+    with pytest.raises(ValueError):
+        AliasTable([])
+    with pytest.raises(ValueError):
+        AliasTable([0, 0])
+    with pytest.raises(ValueError):
+        AliasTable([1, -1])
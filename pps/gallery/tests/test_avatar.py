@@ -44,88 +44,33 @@ def test_get_avatar(ddb_stubber: Stubber):
 
 
 def test_update_avatar(ddb_stubber: Stubber):
-    get_params = {
-        'RequestItems': {
-            'logs': {
-                'Keys': [
-                    {
-                        'tag': 'REWARD::AVATAR::1',
-                        'user': 'user-sub'
-                    },
-                    {
-                        'tag': 'REWARD::AVATAR::2',
-                        'user': 'user-sub'
-                    },
-                    {
-                        'tag': 'REWARD::AVATAR::4',
-                        'user': 'user-sub'
-                    },
-                ],
-                'AttributesToGet': ['data', 'tag'],
+    def avatar_part(id_: int) -> dict:
+        return {
+            'M': {
+                'category': {'S': 'AVATAR'},
+                'release': {'N': str(0)},
+                'id': {'N': str(id_)},
+                'rarity': {'S': 'COMMON'},
+                'description': {
+                    'M': {
+                        'description': {
+                            'M': {'description': {'M': {}}}
+                        }
+                    }
+                }
             }
         }
-    }
 
-    ddb_stubber.add_response('batch_get_item', {
-        'Responses': {
-            'logs': [
-                {
-                    'data': {
-                        'M': {
-                            'category': {'S': 'AVATAR'},
-                            'release': {'N': str(0)},
-                            'id': {'N': str(1)},
-                            'rarity': {'S': 'COMMON'},
-                            'description': {
-                                'M': {
-                                    'description': {
-                                        'M': {'description': {'M': {}}}
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    'tag': {'S': "REWARD::AVATAR::1"}
-                },
-                {
-                    'data': {
-                        'M': {
-                            'category': {'S': 'AVATAR'},
-                            'release': {'N': str(0)},
-                            'id': {'N': str(2)},
-                            'rarity': {'S': 'COMMON'},
-                            'description': {
-                                'M': {
-                                    'description': {
-                                        'M': {'description': {'M': {}}}
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    'tag': {'S': "REWARD::AVATAR::2"}
-                },
-                {
-                    'data': {
-                        'M': {
-                            'category': {'S': 'AVATAR'},
-                            'release': {'N': str(0)},
-                            'id': {'N': str(4)},
-                            'rarity': {'S': 'COMMON'},
-                            'description': {
-                                'M': {
-                                    'description': {
-                                        'M': {'description': {'M': {}}}
-                                    }
-                                }
-                            }
-                        }
-                    },
-                    'tag': {'S': "REWARD::AVATAR::4"}
-                }
-            ]
+    ddb_stubber.add_response('get_item', {
+        'Item': {
+            'rewards': {'M': {str(id_): avatar_part(id_) for id_ in (1, 2, 3, 4)}},
+            'counts': {'M': {str(id_): {'N': '1'} for id_ in (1, 2, 3, 4)}}
         }
-    }, get_params)
+    }, {
+        'TableName': 'logs',
+        'Key': {'user': 'INVENTORY::user-sub', 'tag': 'AVATAR'},
+        'ProjectionExpression': 'rewards, counts, won'
+    })
     ddb_stubber.add_response('update_item',
                              {},
                              {'ExpressionAttributeNames': {'#attr_avatar': 'avatar'},
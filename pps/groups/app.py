@@ -1,5 +1,4 @@
 import os
-from typing import List, Dict
 
 from core import db, HTTPEvent
 from core.auth import CognitoService
@@ -11,9 +10,8 @@ from core.exceptions.notfound import NotFoundException
 from core.router.router import Router
 from core.services.beneficiaries import BeneficiariesService
 from core.services.groups import GroupsService
-from core.services.logs import LogsService, Log, LogTag
+from core.services.stats import GroupStatsService
 from core.utils.consts import VALID_UNITS
-from core.utils.key import split_line
 from schema import SchemaError, Schema
 
 
@@ -104,45 +102,8 @@ def get_group_stats(event: HTTPEvent):
         unit = str(unit).lower()
         if unit not in VALID_UNITS:
             unit = None
-    stats = {}
-    beneficiaries = BeneficiariesService \
-        .query_group(district_code, code, attributes=['user', 'unit-user']) if unit is None else \
-        BeneficiariesService.query_unit(district_code, code, unit, attributes=['user', 'unit-user'])
-    logs: List[Log] = []
-    progress_logs: Dict[str, Dict[str, str]] = {}
-    complete_logs: Dict[str, Dict[str, str]] = {}
-    units = {}
-    for beneficiary in beneficiaries:
-        sub = beneficiary.user_sub
-        units[sub] = beneficiary.unit
-        beneficiary_logs = LogsService.query_stats_tags(user=sub)
-        logs += beneficiary_logs
-        progress_logs[sub] = [log for log in beneficiary_logs if log.parent_tag == LogTag.PROGRESS]
-        complete_logs[sub] = [log for log in beneficiary_logs if log.parent_tag == LogTag.COMPLETED]
-
-    stats['log_count'] = {
-        tag.short: len([log for log in logs if log.parent_tag == tag]) for tag in LogTag
-    }
-
-    stats['completed_objectives'] = {sub: [{
-        'stage': log.tags[2],
-        'area': log.tags[3],
-        'unit': units[sub],
-        'line': split_line(log.tags[4])[0],
-        'subline': split_line(log.tags[4])[1],
-        'timestamp': log.timestamp
-    } for log in logs] for sub, logs in complete_logs.items()}
-
-    stats['progress_logs'] = {sub: [{
-        'stage': log.tags[2],
-        'area': log.tags[3],
-        'unit': units[sub],
-        'line': split_line(log.tags[4])[0],
-        'subline': split_line(log.tags[4])[1],
-        'timestamp': log.timestamp,
-        'log': log.log if event.authorizer.sub in response.item['scouters'].keys() else None
-    } for log in logs] for sub, logs in progress_logs.items()}
-
+    stats = GroupStatsService.get_stats(district_code, code, unit,
+                                        with_logs=event.authorizer.sub in response.item['scouters'].keys())
     return JSONResponse(stats)
 
 
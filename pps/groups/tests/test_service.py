@@ -134,6 +134,20 @@ def test_join(ddb_stubber: Stubber):
 
     ddb_stubber.add_response('get_item', group_response, group_params)
     ddb_stubber.add_response('put_item', beneficiary_response, beneficiary_params)
+    ddb_stubber.add_response('update_item', {}, {
+        'TableName': 'logs',
+        'Key': {'user': 'GROUP::district::group', 'tag': 'MEMBER::u-sub'},
+        'ReturnValues': 'UPDATED_NEW',
+        'UpdateExpression': 'SET #attr_unit=:val_unit, '
+                            '#attr_completed=list_append(if_not_exists(#attr_completed, :val_completed_empty), '
+                            ':val_completed), '
+                            '#attr_progress=list_append(if_not_exists(#attr_progress, :val_progress_empty), '
+                            ':val_progress)',
+        'ExpressionAttributeNames': {'#attr_unit': 'unit', '#attr_completed': 'completed',
+                                     '#attr_progress': 'progress'},
+        'ExpressionAttributeValues': {':val_unit': 'scouts', ':val_completed': [], ':val_completed_empty': [],
+                                      ':val_progress': [], ':val_progress_empty': []}
+    })
 
     response = join_group(HTTPEvent({
         "pathParameters": {
@@ -163,16 +177,31 @@ def test_join(ddb_stubber: Stubber):
     ddb_stubber.assert_no_pending_responses()
 
 
-def test_stats(ddb_stubber: Stubber):
-    group_params = {
-        'TableName': 'groups',
-        'Key': {
+def stats_event(sub: str) -> HTTPEvent:
+    return HTTPEvent({
+        "pathParameters": {
             "district": "district",
-            "code": "group"
+            "group": "group"
         },
-        'ProjectionExpression': 'scouters'
-    }
-    group_response = {
+        "requestContext": {
+            "authorizer": {
+                "claims": {
+                    "sub": sub,
+                    "nickname": "Nick Name",
+                    "name": "Name",
+                    "family_name": "Family",
+                    "cognito:username": "mail@mail.com",
+                    "birthdate": "01-01-2020",
+                    "gender": "scouts",
+                    "cognito:groups": ["Beneficiaries"]
+                }
+            }
+        }
+    })
+
+
+def add_group_response(ddb_stubber: Stubber):
+    ddb_stubber.add_response('get_item', {
         "Item": {
             "scouters": {
                 "M": {
@@ -180,8 +209,74 @@ def test_stats(ddb_stubber: Stubber):
                 }
             }
         }
-    }
+    }, {
+        'TableName': 'groups',
+        'Key': {
+            "district": "district",
+            "code": "group"
+        },
+        'ProjectionExpression': 'scouters'
+    })
+
+
+aggregate_params = {
+    'KeyConditionExpression': Key('user').eq('GROUP::district::group'),
+    'TableName': 'logs'
+}
+
+
+def entry_map(line: int, timestamp: int) -> dict:
+    return {'M': {
+        'stage': {'S': 'PUBERTY'},
+        'area': {'S': 'CORPORALITY'},
+        'line': {'N': '1'},
+        'subline': {'N': str(line)},
+        'timestamp': {'N': str(timestamp)}
+    }}
+
+
+def test_stats(ddb_stubber: Stubber):
+    add_group_response(ddb_stubber)
+    ddb_stubber.add_response('query', {
+        'Items': [
+            {'user': {'S': 'GROUP::district::group'}, 'tag': {'S': 'MEMBER::user-sub-1'}, 'unit': {'S': 'scouts'},
+             'completed': {'L': [entry_map(1, 1), entry_map(2, 2)]}, 'progress': {'L': [entry_map(3, 3)]}},
+            {'user': {'S': 'GROUP::district::group'}, 'tag': {'S': 'MEMBER::user-sub-2'}, 'unit': {'S': 'guides'},
+             'completed': {'L': []}, 'progress': {'L': [entry_map(1, 4)]}},
+            {'user': {'S': 'GROUP::district::group'}, 'tag': {'S': 'SUMMARY'}},
+        ]
+    }, aggregate_params)
+    ddb_stubber.add_response('batch_get_item', {
+        'Responses': {'logs': [
+            {'user': {'S': 'user-sub-1'}, 'tag': {'S': 'STATS::PROGRESS::PUBERTY::CORPORALITY::1.3::3'},
+             'log': {'S': 'A log!'}},
+        ]}
+    }, {'RequestItems': {'logs': {
+        'Keys': [
+            {'user': 'user-sub-1', 'tag': 'STATS::PROGRESS::PUBERTY::CORPORALITY::1.3::3'},
+            {'user': 'user-sub-2', 'tag': 'STATS::PROGRESS::PUBERTY::CORPORALITY::1.1::4'},
+        ],
+        'ProjectionExpression': '#attr_user, #attr_tag, #attr_log',
+        'ExpressionAttributeNames': {'#attr_user': 'user', '#attr_tag': 'tag', '#attr_log': 'log'}
+    }}})
+
+    response = get_group_stats(stats_event('scouter-sub'))
+    assert response.status == 200
+    assert response.body['log_count'] == {'REWARD': 0, 'PROGRESS': 2, 'COMPLETED': 2}
+    completed_objectives = response.body['completed_objectives']
+    assert [objective['subline'] for objective in completed_objectives['user-sub-1']] == [2, 1]
+    assert completed_objectives['user-sub-2'] == []
+    progress_logs = response.body['progress_logs']
+    assert progress_logs['user-sub-1'] == [{'stage': 'PUBERTY', 'area': 'CORPORALITY', 'line': 1, 'subline': 3,
+                                            'timestamp': 3, 'unit': 'scouts', 'log': 'A log!'}]
+    assert progress_logs['user-sub-2'][0]['log'] is None
+
+    ddb_stubber.assert_no_pending_responses()
 
+
+def test_stats_rebuild(ddb_stubber: Stubber, monkeypatch):
+    # a single query in flight, so the stubbed responses are requested in order
+    monkeypatch.setenv('DB_MAX_IN_FLIGHT', '1')
     beneficiary_params = {
         'IndexName': 'ByGroup',
         'KeyConditionExpression': Key('group').eq('district::group'),
@@ -191,50 +286,54 @@ def test_stats(ddb_stubber: Stubber):
     }
     beneficiary_response = {
         "Items": [
-            {"user": {"S": "user-sub-1"}},
-            {"user": {"S": "user-sub-2"}}
+            {"user": {"S": "user-sub-1"}, "unit-user": {"S": "scouts::user-sub-1"}},
+            {"user": {"S": "user-sub-2"}, "unit-user": {"S": "scouts::user-sub-2"}}
         ]
     }
 
-    ddb_stubber.add_response('get_item', group_response, group_params)
+    add_group_response(ddb_stubber)
+    ddb_stubber.add_response('query', {'Items': []}, aggregate_params)
     ddb_stubber.add_response('query', beneficiary_response, beneficiary_params)
 
     for u in ['user-sub-1', 'user-sub-2']:
         log_params = {
             'KeyConditionExpression': Key('user').eq(u) & Key('tag').begins_with('STATS::'),
-            'ScanIndexForward': False,
+            'ScanIndexForward': True,
+            'ProjectionExpression': '#attr_tag, #attr_timestamp',
+            'ExpressionAttributeNames': {'#attr_tag': 'tag', '#attr_timestamp': 'timestamp'},
             'TableName': 'logs'
         }
+        last_key = {'user': {'S': u}, 'tag': {'S': 'STATS::PROGRESS::puberty::corporality::1.3'}}
         ddb_stubber.add_response('query', {
             'Items': [
                 {'tag': {'S': 'STATS::COMPLETED::puberty::corporality::1.1'}},
                 {'tag': {'S': 'STATS::COMPLETED::puberty::corporality::1.2'}},
                 {'tag': {'S': 'STATS::PROGRESS::puberty::corporality::1.3'}},
+            ],
+            'LastEvaluatedKey': last_key
+        }, log_params)
+        ddb_stubber.add_response('query', {
+            'Items': [
                 {'tag': {'S': 'STATS::COMPLETED::puberty::corporality::1.3'}},
                 {'tag': {'S': 'STATS::PROGRESS::puberty::corporality::1.3'}},
             ]
-        }, log_params)
+        }, {**log_params, 'ExclusiveStartKey': {'user': u, 'tag': 'STATS::PROGRESS::puberty::corporality::1.3'}})
+        # missing from the aggregate when it was read, so only created if nothing was recorded in the meantime
+        ddb_stubber.add_response('put_item', {}, {
+            'TableName': 'logs',
+            'Item': {'user': 'GROUP::district::group', 'tag': 'MEMBER::' + u, 'unit': 'scouts', 'completed': ANY,
+                     'progress': ANY},
+            'ConditionExpression': 'attribute_not_exists(tag)',
+            'ReturnValues': 'NONE'
+        })
+    ddb_stubber.add_response('put_item', {}, {
+        'TableName': 'logs',
+        'Item': {'user': 'GROUP::district::group', 'tag': 'SUMMARY'},
+        'ConditionExpression': 'attribute_not_exists(tag)',
+        'ReturnValues': 'NONE'
+    })
 
-    response = get_group_stats(HTTPEvent({
-        "pathParameters": {
-            "district": "district",
-            "group": "group"
-        },
-        "requestContext": {
-            "authorizer": {
-                "claims": {
-                    "sub": "u-sub",
-                    "nickname": "Nick Name",
-                    "name": "Name",
-                    "family_name": "Family",
-                    "cognito:username": "mail@mail.com",
-                    "birthdate": "01-01-2020",
-                    "gender": "scouts",
-                    "cognito:groups": ["Beneficiaries"]
-                }
-            }
-        }
-    }))
+    response = get_group_stats(stats_event('u-sub'))
     assert response.status == 200
 
     log_count = response.body['log_count']
@@ -250,5 +349,69 @@ def test_stats(ddb_stubber: Stubber):
         progress_logs['user-sub-1'] + progress_logs['user-sub-2']
     )
     assert log_count['PROGRESS'] == 2 * 2
+    # newest first
+    assert completed_objectives['user-sub-1'][0]['subline'] == 3
+    assert completed_objectives['user-sub-1'][0]['unit'] == 'scouts'
+
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_stats_rebuild_conflict(ddb_stubber: Stubber, monkeypatch):
+    monkeypatch.setenv('DB_MAX_IN_FLIGHT', '1')
+    member = {'user': {'S': 'GROUP::district::group'}, 'tag': {'S': 'MEMBER::user-sub-1'}, 'unit': {'S': 'scouts'},
+              'completed': {'L': [entry_map(1, 1)]}}
+    log_params = {
+        'KeyConditionExpression': Key('user').eq('user-sub-1') & Key('tag').begins_with('STATS::'),
+        'ScanIndexForward': True,
+        'ProjectionExpression': '#attr_tag, #attr_timestamp',
+        'ExpressionAttributeNames': {'#attr_tag': 'tag', '#attr_timestamp': 'timestamp'},
+        'TableName': 'logs'
+    }
+    update_params = {
+        'TableName': 'logs',
+        'Key': {'user': 'GROUP::district::group', 'tag': 'MEMBER::user-sub-1'},
+        'UpdateExpression': ANY,
+        'ConditionExpression': ANY,
+        'ExpressionAttributeNames': ANY,
+        'ExpressionAttributeValues': ANY,
+        'ReturnValues': 'UPDATED_NEW'
+    }
+
+    add_group_response(ddb_stubber)
+    # a member recorded before the aggregate was marked as built
+    ddb_stubber.add_response('query', {'Items': [member]}, aggregate_params)
+    ddb_stubber.add_response('query', {'Items': [
+        {"user": {"S": "user-sub-1"}, "unit-user": {"S": "scouts::user-sub-1"}}
+    ]}, {
+        'IndexName': 'ByGroup',
+        'KeyConditionExpression': Key('group').eq('district::group'),
+        'ExpressionAttributeNames': {'#attr_user': 'user', '#attr_unit_user': 'unit-user'},
+        'ProjectionExpression': '#attr_user, #attr_unit_user',
+        'TableName': 'beneficiaries'
+    })
+    ddb_stubber.add_response('query', {'Items': [
+        {'tag': {'S': 'STATS::COMPLETED::puberty::corporality::1.1'}}
+    ]}, log_params)
+    # another completed objective is appended while the logs are read
+    ddb_stubber.add_client_error('update_item', 'ConditionalCheckFailedException', expected_params=update_params)
+    ddb_stubber.add_response('get_item', {'Item': {**member, 'completed': {'L': [entry_map(1, 1), entry_map(2, 2)]}}},
+                             {'TableName': 'logs',
+                              'Key': {'user': 'GROUP::district::group', 'tag': 'MEMBER::user-sub-1'}})
+    ddb_stubber.add_response('query', {'Items': [
+        {'tag': {'S': 'STATS::COMPLETED::puberty::corporality::1.1'}},
+        {'tag': {'S': 'STATS::COMPLETED::puberty::corporality::1.2'}}
+    ]}, log_params)
+    ddb_stubber.add_response('update_item', {}, update_params)
+    ddb_stubber.add_response('put_item', {}, {
+        'TableName': 'logs',
+        'Item': {'user': 'GROUP::district::group', 'tag': 'SUMMARY'},
+        'ConditionExpression': 'attribute_not_exists(tag)',
+        'ReturnValues': 'NONE'
+    })
+
+    response = get_group_stats(stats_event('u-sub'))
+    assert response.status == 200
+    assert response.body['log_count']['COMPLETED'] == 2
+    assert [objective['subline'] for objective in response.body['completed_objectives']['user-sub-1']] == [2, 1]
 
     ddb_stubber.assert_no_pending_responses()
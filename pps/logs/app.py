@@ -8,6 +8,7 @@ from core.exceptions.invalid import InvalidException
 from core.router.router import Router
 from core.services.logs import LogsService, LogTag
 from core.services.rewards import RewardsFactory, RewardReason
+from core.services.stats import GroupStatsService
 from core.services.tasks import TasksService
 from core.utils.key import split_key, join_key
 from schema import Schema, Optional
@@ -68,7 +69,9 @@ def create_log(event: HTTPEvent):
                                                                                area=split_key(objective)[1],
                                                                                reason=RewardReason.PROGRESS_LOG)
 
-    log = LogsService.create(user_sub, tag, log_text=log, data=body.get('data'), append_timestamp_to_tag=True)
+    # users only post progress logs, written in a transaction with their entry in the group stats
+    log = LogsService.new_log(user_sub, tag, log_text=log, data=body.get('data'), append_timestamp_to_tag=True)
+    GroupStatsService.record(log)
     response_body['item'] = log.to_api_map()
 
     return JSONResponse(body=response_body)
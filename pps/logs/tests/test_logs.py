@@ -101,16 +101,44 @@ def test_create(ddb_stubber: Stubber):
         'TableName': 'beneficiaries',
         'UpdateExpression': 'ADD #attr_generated_token_last :val_generated_token_last'
         })
-    ddb_stubber.add_response('put_item', {}, {
-        'Item': {
-            'user': 'u-sub',
-            'tag': 'STATS::PROGRESS::PUBERTY::CORPORALITY::1.1::1577836800000',
-            'timestamp': 1577836800000,
-            'log': 'A log!',
-            'data': {'key': 1234}
-        },
-        'ReturnValues': 'NONE',
-        'TableName': 'logs'
+    ddb_stubber.add_response('get_item', {
+        'Item': {'group': {'S': 'district::group'}, 'unit-user': {'S': 'scouts::u-sub'}}
+    }, {
+        'TableName': 'beneficiaries',
+        'Key': {'user': 'u-sub'},
+        'ProjectionExpression': '#model_group, #model_unit_user',
+        'ExpressionAttributeNames': {'#model_group': 'group', '#model_unit_user': 'unit-user'}
+    })
+    ddb_stubber.add_response('transact_write_items', {}, {
+        'TransactItems': [
+            {
+                'Put': {
+                    'TableName': 'logs',
+                    'Item': {
+                        'user': 'u-sub',
+                        'tag': 'STATS::PROGRESS::PUBERTY::CORPORALITY::1.1::1577836800000',
+                        'timestamp': 1577836800000,
+                        'log': 'A log!',
+                        'data': {'key': 1234}
+                    }
+                }
+            },
+            {
+                'Update': {
+                    'TableName': 'logs',
+                    'Key': {'user': 'GROUP::district::group', 'tag': 'MEMBER::u-sub'},
+                    'UpdateExpression': 'SET #attr_unit=:val_unit, '
+                                        '#attr_progress=list_append(if_not_exists(#attr_progress, '
+                                        ':val_progress_empty), :val_progress)',
+                    'ExpressionAttributeNames': {'#attr_unit': 'unit', '#attr_progress': 'progress'},
+                    'ExpressionAttributeValues': {':val_unit': 'scouts', ':val_progress_empty': [],
+                                                  ':val_progress': [{
+                                                      'stage': 'PUBERTY', 'area': 'CORPORALITY', 'line': 1,
+                                                      'subline': 1, 'timestamp': 1577836800000
+                                                  }]}
+                }
+            }
+        ]
     })
 
     authorizer_map = {
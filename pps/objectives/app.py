@@ -22,13 +22,6 @@ def get_objective(stage: str, area: str, line: int, sub_line: int):
     return result
 
 
-def get_objectives(stage: str):
-    result = ObjectivesService.query(stage)
-    for obj in result.items:
-        process_objective(obj)
-    return result
-
-
 def get_handler(event: HTTPEvent) -> JSONResponse:
     # validate unit
     unit = event.params.get("unit").lower()
@@ -45,8 +38,8 @@ def get_handler(event: HTTPEvent) -> JSONResponse:
     area = event.params.get("area")
     line = event.params.get("line")
     if area is None and line is None:
-        # get all objectives from unit and stage
-        response = get_objectives(stage)
+        # get all objectives from unit and stage, serialized once per container
+        return JSONResponse(ObjectivesService.query(stage), serialized_body=ObjectivesService.query_json(stage))
     else:
         # get one objective
         area = area.lower()
@@ -5,7 +5,7 @@ from core.exceptions.invalid import InvalidException
 from core.exceptions.notfound import NotFoundException
 from core.router.router import Router
 from core.services.beneficiaries import BeneficiariesService
-from core.services.rewards import RewardsService, RewardType, Reward
+from core.services.rewards import RewardsService, RewardType, Reward, reward_templates
 from core.utils.consts import VALID_AREAS
 
 router = Router()
@@ -45,7 +45,7 @@ def get_my_rewards(event: HTTPEvent):
     category_name: str = event.params.get('category')
     category = RewardType.from_value(category_name.upper())
     return JSONResponse({
-        'rewards': [log.to_api_map() for log in RewardsService.get_user_rewards(event.authorizer, category)]
+        'rewards': RewardsService.get_user_rewards(event.authorizer, category)
     })
 
 
@@ -65,8 +65,11 @@ def create_item(event: HTTPEvent):
     body['release'] = release
 
     reward = Reward.from_api_map(body)
+    weight = body.get('weight')
+    if weight is not None and (not isinstance(weight, int) or isinstance(weight, bool)):
+        raise InvalidException('The weight of a reward must be an int')
     result = RewardsService.create(reward.description, reward.type, reward.release,
-                                   reward.rarity, reward.price)
+                                   reward.rarity, reward.price, weight)
     reward = Reward.from_db_map(result.item)
     return JSONResponse({
         'message': 'Created item',
@@ -123,6 +126,18 @@ def claim_reward(event: HTTPEvent):
     return JSONResponse({'message': 'Claimed rewards!', 'rewards': [reward.to_api_map() for reward in rewards]})
 
 
+def get_template(event: HTTPEvent):
+    try:
+        version = int(event.params['version'])
+    except ValueError:
+        raise NotFoundException(f"Unknown version {event.params['version']}, it should be an int")
+    template = reward_templates.get(event.params['template'].upper(), version)
+    if template is None:
+        raise NotFoundException(f"Unknown reward template {event.params['template']} version {version}")
+    return JSONResponse(template.to_api_map())
+
+
+router.get("/api/rewards/templates/{template}/{version}/", get_template)
 router.get("/api/rewards/{category}/{release}/", list_shop_category)
 router.get("/api/rewards/{category}/{release}/{id}/", get_item)
 router.get("/api/rewards/mine/{category}", get_my_rewards)
@@ -187,26 +187,121 @@ def test_buy(ddb_stubber: Stubber):
     ddb_stubber.assert_no_pending_responses()
 
 
+def my_rewards_event(category: str) -> HTTPEvent:
+    return HTTPEvent({
+        "pathParameters": {
+            "category": category,
+        },
+        "requestContext": {
+            "authorizer": {
+                "claims": {
+                    "sub": "u-sub"
+                }
+            }
+        }
+    })
+
+
 def test_get_my_rewards(ddb_stubber: Stubber):
-    query_response = {
-        'Items': [{
-            'user': {'S': 'u-sub'},
-            'tag': {'S': 'REWARD::AVATAR'},
-            'timestamp': {'N': str(123456)},
-            'log': {'S': 'A log'},
-            'data': {'M': {'description': {'S': 'An item description'}}},
-        }]
-    }
+    def reward(id_: int) -> dict:
+        return {'M': {'category': {'S': 'AVATAR'}, 'id': {'N': str(id_)}, 'release': {'N': '1'},
+                      'rarity': {'S': 'COMMON'}, 'description': {'S': f'Reward {id_}'}}}
+
+    ddb_stubber.add_response('get_item', {
+        'Item': {
+            'rewards': {'M': {str(id_): reward(id_) for id_ in (30, 4, 100001)}},
+            'counts': {'M': {'30': {'N': '1'}, '4': {'N': '1'}, '100001': {'N': '1'}}},
+            'won': {'M': {'30': {'N': '3'}, '4': {'N': '1'}, '100001': {'N': '2'}}}
+        }
+    }, {
+        'TableName': 'logs',
+        'Key': {'user': 'INVENTORY::u-sub', 'tag': 'AVATAR'},
+        'ProjectionExpression': 'rewards, counts, won'
+    })
 
-    query_params = {
+    response = get_my_rewards(my_rewards_event('avatar'))
+    assert response.status == 200
+    # the maps of the reward logs, newest first
+    assert response.body == {'rewards': [{
+        'tag': f'REWARD::AVATAR::{id_}',
+        'user': 'u-sub',
+        'log': 'Won a reward',
+        'timestamp': timestamp,
+        'data': {'category': 'AVATAR', 'id': id_, 'release': 1, 'rarity': 'COMMON', 'description': f'Reward {id_}'},
+        'count': 1
+    } for id_, timestamp in ((30, 3), (100001, 2), (4, 1))]}
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_get_my_rewards_logs(ddb_stubber: Stubber):
+    ddb_stubber.add_response('query', {
+        'Items': [{'user': {'S': 'u-sub'}, 'tag': {'S': 'REWARD::POINTS::1'}, 'timestamp': {'N': '1'},
+                   'log': {'S': 'Won a reward'}, 'data': {'M': {'category': {'S': 'POINTS'}}}}]
+    }, {
         'TableName': 'logs',
-        'KeyConditionExpression': Key('user').eq('u-sub') & Key('tag').begins_with('REWARD::AVATAR'),
+        'KeyConditionExpression': Key('user').eq('u-sub') & Key('tag').begins_with('REWARD::POINTS'),
         'ScanIndexForward': False
-    }
-    ddb_stubber.add_response('query', query_response, query_params)
-    response = get_my_rewards(HTTPEvent({
+    })
+    # points aren't kept in the inventory, their logs are listed
+    response = get_my_rewards(my_rewards_event('points'))
+    assert response.status == 200
+    assert response.body == {'rewards': [{'tag': 'REWARD::POINTS::1', 'user': 'u-sub', 'log': 'Won a reward',
+                                          'timestamp': 1, 'data': {'category': 'POINTS'}}]}
+    ddb_stubber.assert_no_pending_responses()
+
+
+def test_get_my_rewards_migration(ddb_stubber: Stubber):
+    # noinspection PyProtectedMember
+    client_stubber = Stubber(RewardsService.get_interface()._model.get_client())
+    client_stubber.activate()
+    ddb_stubber.add_response('get_item', {}, {
+        'TableName': 'logs',
+        'Key': {'user': 'INVENTORY::u-sub', 'tag': 'ZONE'},
+        'ProjectionExpression': 'rewards, counts, won'
+    })
+    client_stubber.add_response('query', {
+        'Items': [{
+            'tag': {'S': f'REWARD::ZONE::{id_}::{timestamp}'},
+            'timestamp': {'N': str(timestamp)},
+            'data': {'M': {'category': {'S': 'ZONE'}, 'id': {'N': str(id_)}, 'description': {'S': 'A zone'}}},
+        } for id_, timestamp in ((5, 2), (7, 1), (7, 3))]
+    }, {
+        'TableName': 'logs',
+        'KeyConditionExpression': '(#n0 = :v0 AND begins_with(#n1, :v1))',
+        'ProjectionExpression': '#attr_tag, #attr_timestamp, #attr_data',
+        'ExpressionAttributeNames': {'#attr_tag': 'tag', '#attr_timestamp': 'timestamp', '#attr_data': 'data',
+                                     '#n0': 'user', '#n1': 'tag'},
+        'ExpressionAttributeValues': {':v0': {'S': 'u-sub'}, ':v1': {'S': 'REWARD::ZONE::'}},
+        'ScanIndexForward': True
+    })
+    ddb_stubber.add_response('put_item', {}, {
+        'TableName': 'logs',
+        'Item': {
+            'user': 'INVENTORY::u-sub',
+            'tag': 'ZONE',
+            'rewards': {
+                '7': {'category': 'ZONE', 'id': 7, 'description': 'A zone'},
+                '5': {'category': 'ZONE', 'id': 5, 'description': 'A zone'}
+            },
+            'counts': {'7': 2, '5': 1},
+            'won': {'7': 3, '5': 2}
+        },
+        'ConditionExpression': 'attribute_not_exists(tag)',
+        'ReturnValues': 'NONE'
+    })
+    response = get_my_rewards(my_rewards_event('zone'))
+    assert [(item['tag'], item['count']) for item in response.body['rewards']] == [('REWARD::ZONE::7::3', 2),
+                                                                                   ('REWARD::ZONE::5::2', 1)]
+    ddb_stubber.assert_no_pending_responses()
+    client_stubber.assert_no_pending_responses()
+    client_stubber.deactivate()
+
+
+def test_get_template():
+    event = HTTPEvent({
         "pathParameters": {
-            "category": "avatar",
+            "template": "progress_log",
+            "version": "1"
         },
         "requestContext": {
             "authorizer": {
@@ -215,6 +310,16 @@ def test_get_my_rewards(ddb_stubber: Stubber):
                 }
             }
         }
-    }))
+    })
+    response = get_template(event)
     assert response.status == 200
-    ddb_stubber.assert_no_pending_responses()
+    Schema({
+        'id': 'PROGRESS_LOG',
+        'version': 1,
+        'static': [{'type': 'NEEDS', 'rarity': 'COMMON'}, {'type': 'POINTS', 'rarity': 'COMMON'}],
+        'boxes': [[{'type': str, 'rarity': str}]] * 5
+    }).validate(response.body)
+
+    event.params['version'] = '2'
+    with pytest.raises(NotFoundException):
+        get_template(event)
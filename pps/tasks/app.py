@@ -1,7 +1,6 @@
 import time
 from typing import List, Optional
 
-from core.utils.key import split_key
 from schema import Schema, SchemaError
 
 from core import HTTPEvent, JSONResponse
@@ -9,7 +8,6 @@ from core.aws.errors import HTTPError
 from core.exceptions.notfound import NotFoundException
 from core.router.router import Router
 from core.services.logs import LogsService, LogTag
-from core.services.rewards import RewardsFactory, RewardReason
 from core.services.tasks import TasksService, ObjectiveKey, Task
 from core.utils import join_key
 from core.utils.consts import VALID_STAGES, VALID_AREAS
@@ -119,26 +117,18 @@ def complete_active_task(event: HTTPEvent) -> JSONResponse:
 
     if event.authorizer.sub != sub and not event.authorizer.is_scouter:
         return JSONResponse.generate_error(HTTPError.FORBIDDEN, "You have no access to this resource with this user")
-    completed_task = TasksService.complete_active_task(event.authorizer)
-    if completed_task is None:
+    completed = TasksService.complete_active_task(event.authorizer)
+    if completed is None:
         return JSONResponse.generate_error(HTTPError.NOT_FOUND, "No active task found")
 
-    area = split_key(completed_task['objective'])[1]
-
-    response = JSONResponse(
+    completed_task, reward = completed
+    return JSONResponse(
         {
             'message': 'Completed task',
             'task': completed_task,
-            'reward': RewardsFactory.get_reward_token_by_reason(
-                authorizer=event.authorizer,
-                area=area,
-                reason=RewardReason.COMPLETE_OBJECTIVE
-            ),
+            'reward': reward,
         }
     )
-    LogsService.create(event.authorizer.sub, LogTag.COMPLETED.join(completed_task['objective'].upper()),
-                       'Completed an objective!', {})
-    return response
 
 
 # DELETE /api/users/{sub}/tasks/active/complete/
@@ -1,6 +1,5 @@
 import json
 from datetime import datetime, timezone
-from decimal import Decimal
 from unittest.mock import patch
 
 import jwt
@@ -23,6 +22,15 @@ def ddb_stubber():
     ddb_stubber.deactivate()
 
 
+@pytest.fixture(scope="function")
+def client_stubber():
+    # noinspection PyProtectedMember
+    client_stubber = Stubber(TasksService.get_interface()._model.get_client())
+    client_stubber.activate()
+    yield client_stubber
+    client_stubber.deactivate()
+
+
 def test_list_user_tasks(ddb_stubber: Stubber):
     params = {
         'KeyConditionExpression': Key('user').eq('user-sub'),
@@ -390,71 +398,27 @@ def test_update_task(ddb_stubber: Stubber):
 
 
 @freeze_time('2020-01-01')
-def test_complete_task(ddb_stubber: Stubber):
+def test_complete_task(ddb_stubber: Stubber, client_stubber: Stubber):
     now = int(time.time())
 
     get_params = {
-        'Key': {'user': 'user-sub'},
-        'ProjectionExpression': 'target',
+        'Key': {'user': {'S': 'user-sub'}},
+        'ProjectionExpression': 'target, generated_token_last, #model_group, #model_unit_user',
+        'ExpressionAttributeNames': {'#model_group': 'group', '#model_unit_user': 'unit-user'},
         'TableName': 'beneficiaries'
     }
 
     get_response = {
         'Item': {
-            'user': {'S': 'abcABC1234'},
+            'generated_token_last': {'N': str(9)},
             'group': {'S': 'district::group'},
-            'unit-user': {'S': 'unit::abcABC12345'},
-            'full-name': {'S': 'Name'},
-            'nickname': {'S': 'Name'},
-            'birthdate': {'S': '01-01-2001'},
-            'score': {'M': {}},
-            'n_tasks': {'M': {}},
-            'bought_items': {'M': {}},
-            'set_base_tasks': {'BOOL': False},
+            'unit-user': {'S': 'scouts::user-sub'},
             'target': {
-                'M': {
-                    'original-objective': {'S': 'Original'},
-                    'personal-objective': {'S': 'Personal'},
-                    'objective': {'S': 'puberty::corporality::2.1'},
-                    'score': {'N': str(0)}
-                }
-            }
-        }
-    }
-
-    beneficiary_update_params = {
-        'TableName': 'beneficiaries',
-        'Key': {'user': 'user-sub'},
-        'ReturnValues': 'UPDATED_OLD',
-        'UpdateExpression': 'SET #attr_target=:val_target ADD #attr_score.#attr_score_corporality :val_score_corporality, '
-                            '#attr_n_tasks.#attr_n_tasks_corporality :val_n_tasks_corporality',
-        'ExpressionAttributeNames': {
-            '#attr_score': 'score',
-            '#attr_n_tasks': 'n_tasks',
-            '#attr_n_tasks_corporality': 'corporality',
-            '#attr_score_corporality': 'corporality',
-            '#attr_target': 'target',
-        },
-        'ConditionExpression': Attr('target').ne(None),
-        'ExpressionAttributeValues': {
-            ':val_target': None,
-            ':val_n_tasks_corporality': 1,
-            ':val_score_corporality': 80
-        }
-    }
-    beneficiary_update_response = {
-        "Attributes": {
-            'n_tasks': {
-                'M': {
-                    'corporality': {'N': str(2)}  # this is one less than its current value
-                }
-            },
-            "target": {
                 'M': {
                     'tasks': {'L': [
                         {
                             'M': {
-                                'completed': {'BOOL': True},
+                                'completed': {'BOOL': False},
                                 'description': {'S': 'Sub-task 1'},
                             }
                         },
@@ -474,66 +438,84 @@ def test_complete_task(ddb_stubber: Stubber):
         }
     }
 
-    tasks_params = {
-        'TableName': 'tasks',
-        'ReturnValues': 'NONE',
-        'Item': {
-            'completed': True,
-            'created': ANY,
-            'objective': 'puberty::corporality::2.1',
-            'original-objective': ANY,
-            'personal-objective': 'A new task',
-            'tasks': [{'completed': True, 'description': 'Sub-task 1'},
-                      {'completed': True, 'description': 'Sub-task 2'}],
-            'user': 'user-sub',
-        }
-    }
-
-    tasks_response = {
-        'Attributes': {
-            'created': {'N': str(time.time())},
-            'objective': {'S': 'puberty::corporality::2.1'},
-            'original-objective': {'S': 'Original'},
-            'personal-objective': {'S': 'A new task'},
-            'tasks': {'L': [{'M': {'completed': {'BOOL': True}, 'description': {'S': 'Sub-task 1'}}},
-                      {'M': {'completed': {'BOOL': True}, 'description': {'S': 'Sub-task 2'}}}]},
-            'user': {'S': 'user-sub'},
-        }
-    }
-
-    update_response = {
-        'Attributes': {
-            'generated_token_last': {'N': str(10)}
-        }
-    }
-
-    update_params = {
-        'ExpressionAttributeNames': {'#attr_generated_token_last': 'generated_token_last'},
-        'ExpressionAttributeValues': {':val_generated_token_last': 1},
-        'Key': {'user': 'user-sub'},
-        'ReturnValues': 'UPDATED_NEW',
-        'TableName': 'beneficiaries',
-        'UpdateExpression': 'ADD #attr_generated_token_last :val_generated_token_last'
-    }
-    logs_params = {
-        'TableName': 'logs',
-        'ReturnValues': 'NONE',
-        'Item': {
-            'tag': 'STATS::COMPLETED::PUBERTY::CORPORALITY::2.1',
-            'log': 'Completed an objective!',
-            'data': {},
-            'timestamp': 1577836800000,
-            'user': 'user-sub'
-        }
+    transact_params = {
+        'TransactItems': [
+            {
+                'Update': {
+                    'TableName': 'beneficiaries',
+                    'Key': {'user': 'user-sub'},
+                    'UpdateExpression': 'SET #attr_target=:val_target, '
+                                        '#attr_generated_token_last=:val_generated_token_last '
+                                        'ADD #attr_score.#attr_score_corporality :val_score_corporality, '
+                                        '#attr_n_tasks.#attr_n_tasks_corporality :val_n_tasks_corporality',
+                    'ExpressionAttributeNames': {
+                        '#attr_score': 'score',
+                        '#attr_n_tasks': 'n_tasks',
+                        '#attr_n_tasks_corporality': 'corporality',
+                        '#attr_score_corporality': 'corporality',
+                        '#attr_target': 'target',
+                        '#attr_generated_token_last': 'generated_token_last',
+                        '#n0': 'target',
+                        '#n1': 'generated_token_last',
+                    },
+                    'ConditionExpression': '(#n0 <> :v0 AND #n1 = :v1)',
+                    'ExpressionAttributeValues': {
+                        ':v0': None,
+                        ':v1': 9,
+                        ':val_target': None,
+                        ':val_generated_token_last': 10,
+                        ':val_n_tasks_corporality': 1,
+                        ':val_score_corporality': 80
+                    }
+                }
+            },
+            {
+                'Put': {
+                    'TableName': 'tasks',
+                    'Item': {
+                        'completed': True,
+                        'created': now,
+                        'objective': 'puberty::corporality::2.1',
+                        'original-objective': ANY,
+                        'personal-objective': 'A new task',
+                        'tasks': [{'completed': True, 'description': 'Sub-task 1'},
+                                  {'completed': True, 'description': 'Sub-task 2'}],
+                        'user': 'user-sub',
+                    }
+                }
+            },
+            {
+                'Put': {
+                    'TableName': 'logs',
+                    'Item': {
+                        'tag': 'STATS::COMPLETED::PUBERTY::CORPORALITY::2.1',
+                        'log': 'Completed an objective!',
+                        'data': {},
+                        'timestamp': 1577836800000,
+                        'user': 'user-sub'
+                    }
+                }
+            },
+            {
+                'Update': {
+                    'TableName': 'logs',
+                    'Key': {'user': 'GROUP::district::group', 'tag': 'MEMBER::user-sub'},
+                    'UpdateExpression': 'SET #attr_unit=:val_unit, #attr_completed=list_append('
+                                        'if_not_exists(#attr_completed, :val_completed_empty), :val_completed)',
+                    'ExpressionAttributeNames': {'#attr_unit': 'unit', '#attr_completed': 'completed'},
+                    'ExpressionAttributeValues': {
+                        ':val_unit': 'scouts',
+                        ':val_completed_empty': [],
+                        ':val_completed': [{'stage': 'PUBERTY', 'area': 'CORPORALITY', 'line': 2, 'subline': 1,
+                                            'timestamp': 1577836800000}]
+                    }
+                }
+            }
+        ]
     }
 
-    logs_response = {}
-
-    ddb_stubber.add_response('get_item', get_response, get_params)
-    ddb_stubber.add_response('update_item', beneficiary_update_response, beneficiary_update_params)
-    ddb_stubber.add_response('put_item', tasks_response, tasks_params)
-    ddb_stubber.add_response('update_item', update_response, update_params)
-    ddb_stubber.add_response('put_item', logs_response, logs_params)
+    client_stubber.add_response('get_item', get_response, get_params)
+    ddb_stubber.add_response('transact_write_items', {}, transact_params)
 
     response = complete_active_task(HTTPEvent({
         "pathParameters": {
@@ -554,7 +536,7 @@ def test_complete_task(ddb_stubber: Stubber):
                 {'completed': True, 'description': 'Sub-task 2'},
             ],
             'personal-objective': 'A new task',
-            'created': Decimal(now),
+            'created': now,
             'objective': 'puberty::corporality::2.1',
             'original-objective': 'Comprendo que los cambios que se estan '
                                   'produciendo en mi cuerpo influyen en mi manera de ser.',
@@ -570,22 +552,11 @@ def test_complete_task(ddb_stubber: Stubber):
         'iat': 1577836800,
         'exp': 1577836800 + 7 * 24 * 60 * 60,
         'area': 'corporality',
-        'reason': 'COMPLETE_OBJECTIVE',
-        'static': [
-            {'type': 'NEEDS', 'rarity': 'RARE'},
-            {'type': 'ZONE', 'rarity': 'RARE'},
-            {'type': 'POINTS', 'rarity': 'RARE'},
-        ],
-        'boxes': [
-            [{'type': 'AVATAR', 'rarity': 'RARE'},
-             {'type': 'DECORATION', 'rarity': 'COMMON'}],
-            [{'type': 'DECORATION', 'rarity': 'RARE'},
-             {'type': 'AVATAR', 'rarity': 'COMMON'}],
-            [{'type': 'AVATAR', 'rarity': 'RARE'},
-             {'type': 'DECORATION', 'rarity': 'RARE'}]
-        ]
+        'template': 'COMPLETE_OBJECTIVE',
+        'version': 1
     }).validate(decoded)
     ddb_stubber.assert_no_pending_responses()
+    client_stubber.assert_no_pending_responses()
 
 
 @freeze_time("2020-01-01")
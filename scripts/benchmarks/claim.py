@@ -0,0 +1,147 @@
+"""
+Latency benchmark of the reward claim pipeline: the previous sequential pipeline (conditional token index update, a
+range query per reward, logs batch write and a separate score update) against RewardsService.claim_reward, for
+COMPLETE_OBJECTIVE tokens. The current pipeline also updates the reward inventories, which the previous one didn't
+have. Runs against dynamodb-local (docker-compose up dynamodb-local) by default, creating the
+tables of the template and seeding rewards when needed, or against the in-memory backend with --memory
+"""
+import os
+import random
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '../../pps/core-layer/python'))
+
+SUB = 'benchmark-claimer'
+
+
+def configure_environment(args):
+    # neither backend enforces the provisioned capacity of the template, pacing would only slow the seeding down
+    os.environ.setdefault('DB_RATE_LIMIT_SHARE', '0')
+    if args.memory:
+        os.environ['DB_BACKEND'] = 'memory'
+    else:
+        os.environ['DB_ENDPOINT_URL'] = args.endpoint
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+
+def create_tables():
+    from core import db
+    from core.db.memory.template import load_table_definitions
+
+    existing = set(db.client.list_tables()['TableNames'])
+    for definition in load_table_definitions():
+        if definition['TableName'] not in existing:
+            db.client.create_table(**definition)
+
+
+def seed(rewards_per_category: int):
+    from core.services.beneficiaries import BeneficiariesService
+    from core.services.rewards import RewardsService, RewardType
+    from core.utils.consts import VALID_AREAS
+
+    with RewardsService.get_interface().batch_writer() as writer:
+        for category in (RewardType.AVATAR, RewardType.DECORATION, RewardType.ZONE):
+            for i in range(1, rewards_per_category + 1):
+                for sign in (1, -1):
+                    writer.put({'category': category.name, 'release-id': sign * i * 7,
+                                'description': {'name': f'{category.name} {i}'}, 'rarity': 'RARE' if sign < 0 else
+                                'COMMON'})
+    BeneficiariesService.get_interface().create(SUB, {
+        'n_claimed_tokens': -1,
+        'generated_token_last': -1,
+        'score': {area: 0 for area in VALID_AREAS}
+    })
+
+
+def legacy_get_random(category, release, rarity):
+    from core.db.model import Operator
+    from core.services.rewards import Reward, RewardsService, REWARDS_PER_RELEASE, RewardRarity
+
+    reward = Reward.factory(category, rarity)
+    if reward is not None:
+        return reward
+    top = abs(release * REWARDS_PER_RELEASE - 1)
+    if rarity == RewardRarity.RARE:
+        top = -top
+    lowest = min(0, top)
+    highest = max(0, top)
+    random_point = random.randint(lowest, highest)
+    index = RewardsService.get_interface()
+    attributes = ['category', 'description', 'release-id', 'price']
+    result = index.query(category.name, (Operator.BETWEEN, lowest, random_point), attributes=attributes, limit=1)
+    if len(result.items) == 0:
+        result = index.query(category.name, (Operator.BETWEEN, random_point, highest), attributes=attributes,
+                             limit=1)
+    return Reward.from_db_map(result.items[0])
+
+
+def legacy_claim(authorizer, probabilities, index: int, area: str):
+    from core.services.beneficiaries import BeneficiariesService
+    from core.services.logs import LogsService, Log, LogTag
+    from core.services.rewards import RewardsService
+    from core.utils import join_key
+
+    BeneficiariesService.set_reward_index(authorizer, index)
+    rewards = [legacy_get_random(probability.type, 1, probability.rarity) for probability in probabilities]
+    LogsService.batch_create(logs=[Log(sub=authorizer.sub, tag=join_key(LogTag.REWARD.name, reward.type.name,
+                                                                        reward.id),
+                                       log='Won a reward', data=reward.to_api_map(), append_timestamp=True)
+                                   for reward in rewards])
+    BeneficiariesService.add_score(authorizer.sub, RewardsService.reward_scores(rewards, area))
+
+
+def summary(name: str, times):
+    times = sorted(times)
+    p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+    print(f"{name}: p50 {statistics.median(times) * 1000:.2f} ms, p95 {p95 * 1000:.2f} ms, "
+          f"mean {statistics.mean(times) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument('--endpoint', default='http://localhost:8000', help='dynamodb-local endpoint')
+    parser.add_argument('--memory', action='store_true', help='Use the in-memory backend instead')
+    parser.add_argument('--claims', type=int, default=50, help='Claims per pipeline')
+    parser.add_argument('--rewards', type=int, default=200, help='Rewards per category and rarity')
+    args = parser.parse_args()
+    configure_environment(args)
+
+    from core.aws.event import Authorizer
+    from core.services.rewards import RewardsService, RewardsFactory, RewardReason, REWARDS_BY_REASON, \
+        rewards_catalog
+
+    if not args.memory:
+        create_tables()
+    seed(args.rewards)
+
+    authorizer = Authorizer({'claims': {'sub': SUB}})
+    reason = REWARDS_BY_REASON[RewardReason.COMPLETE_OBJECTIVE]
+    probabilities = reason['static'].rewards + reason['boxes'][0].rewards
+    token_index = 0
+
+    legacy_times = []
+    for _ in range(args.claims):
+        start = time.perf_counter()
+        legacy_claim(authorizer, probabilities, token_index, 'corporality')
+        legacy_times.append(time.perf_counter() - start)
+        token_index += 1
+
+    rewards_catalog.invalidate()
+    tokens = [RewardsFactory.get_reward_token_by_reason(authorizer, area='corporality',
+                                                        reason=RewardReason.COMPLETE_OBJECTIVE,
+                                                        token_index=token_index + i) for i in range(args.claims)]
+    pipeline_times = []
+    for token in tokens:
+        start = time.perf_counter()
+        RewardsService.claim_reward(authorizer, token, release=1, box_index=0)
+        pipeline_times.append(time.perf_counter() - start)
+
+    summary('sequential', legacy_times)
+    summary('pipeline (first claim loads the catalog)', pipeline_times)
+    summary('pipeline, warm catalog', pipeline_times[1:])
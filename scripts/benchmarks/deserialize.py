@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of the item decoding paths for large logs and tasks query pages: the resource path (boto3's
+TypeDeserializer into Decimal, then results.clean_item, then JSONResponse.clean_for_json) against the fast path
+(core.db.wire.decode_item straight into native values, then JSONResponse.clean_for_json)
+"""
+import os
+import sys
+import timeit
+from argparse import ArgumentParser
+
+from boto3.dynamodb.types import TypeDeserializer
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '../../pps/core-layer/python'))
+
+from core.aws.response import JSONResponse  # noqa: E402
+from core.db.results import clean_item  # noqa: E402
+from core.db.wire import decode_item, encode_item  # noqa: E402
+
+
+def logs_page(size: int):
+    return [encode_item({
+        'tag': f'PROGRESS::PUBERTY::CORPORALITY::1.{i % 5}::{1620000000000 + i}',
+        'user': 'a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1',
+        'log': f'Progress log number {i} of the current objective',
+        'timestamp': 1620000000000 + i,
+        'data': {'score': i % 10, 'ratio': i / 7, 'completed': i % 2 == 0}
+    }) for i in range(size)]
+
+
+def tasks_page(size: int):
+    return [encode_item({
+        'sub': 'a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1',
+        'objective': f'PUBERTY::CORPORALITY::1.{i}',
+        'completed': i % 2 == 0,
+        'created': 1620000000000 + i,
+        'score': 80,
+        'original-objective': 'Participate in physical activities with the patrol',
+        'personal-objective': 'Go running with my patrol every week',
+        'tasks': [{'completed': j % 2 == 0, 'description': f'Subtask {j}'} for j in range(5)]
+    }) for i in range(size)]
+
+
+def resource_path(page):
+    deserializer = TypeDeserializer()
+    items = [clean_item({key: deserializer.deserialize(value) for key, value in item.items()}) for item in page]
+    return JSONResponse.clean_for_json({'items': items})
+
+
+def fast_path(page):
+    return JSONResponse.clean_for_json({'items': [decode_item(item) for item in page]})
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument('--size', type=int, default=1000, help='Items per page')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for name, page in (('logs', logs_page(args.size)), ('tasks', tasks_page(args.size))):
+        resource_time = min(timeit.repeat(lambda: resource_path(page), number=1, repeat=args.repeat))
+        fast_time = min(timeit.repeat(lambda: fast_path(page), number=1, repeat=args.repeat))
+        print(f"{name} page of {args.size} items: resource {resource_time * 1000:.2f} ms, "
+              f"fast {fast_time * 1000:.2f} ms ({resource_time / fast_time:.1f}x)")
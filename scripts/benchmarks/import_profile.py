@@ -0,0 +1,71 @@
+"""
+Import-time profile of every Lambda entry point (pps/*/app.py): imports each handler module in a fresh interpreter
+with `python -X importtime` and reports the cumulative milliseconds per module, along with which of the heavy
+dependencies (boto3, botocore, jwt, schema, yaml) were loaded before the first invocation
+"""
+import glob
+import json
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+from typing import Dict, List
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+pps_path = os.path.realpath(os.path.join(dir_path, '../../pps'))
+layer_path = os.path.join(pps_path, 'core-layer/python')
+
+HEAVY_MODULES = ('boto3', 'botocore', 'jwt', 'schema', 'yaml')
+
+
+def entry_points() -> List[str]:
+    return sorted(os.path.dirname(path) for path in glob.glob(os.path.join(pps_path, '*/app.py')))
+
+
+def profile(function_path: str) -> Dict[str, float]:
+    """
+    Cumulative import time in milliseconds of each module imported by an entry point
+    """
+    env = {**os.environ, 'PYTHONPATH': layer_path, 'PYTHONDONTWRITEBYTECODE': '1'}
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=function_path, env=env,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Could not import {function_path}/app.py:\n{process.stderr}")
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def best_profile(function_path: str, repeat: int) -> Dict[str, float]:
+    runs = [profile(function_path) for _ in range(repeat)]
+    return {name: min(run.get(name, first) for run in runs) for name, first in runs[0].items()}
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument('--top', type=int, default=10, help='Modules listed per entry point')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per entry point, keeping the fastest time')
+    parser.add_argument('--json', action='store_true', help='Print the whole profile as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for path in entry_points():
+        times = best_profile(path, args.repeat)
+        report[os.path.basename(path)] = {
+            'total': times.get('app', 0.0),
+            'heavy': [module for module in HEAVY_MODULES if module in times],
+            'modules': dict(sorted(times.items(), key=lambda item: -item[1]))
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        sys.exit()
+    for name, entry in report.items():
+        heavy = ', '.join(entry['heavy']) if len(entry['heavy']) > 0 else 'none'
+        print(f"{name}/app.py: {entry['total']:.1f} ms (heavy dependencies: {heavy})")
+        for module, cumulative in list(entry['modules'].items())[1:args.top + 1]:
+            print(f"  {cumulative:8.1f} ms  {module}")
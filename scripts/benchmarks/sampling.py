@@ -0,0 +1,41 @@
+"""
+Micro-benchmark and drop rate check of the weighted reward sampling: builds an alias table over random per-item
+weights, measures single and batched draws and compares the observed drop rates of a seeded run with the expected
+ones
+"""
+import os
+import random
+import sys
+import timeit
+from argparse import ArgumentParser
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '../../pps/core-layer/python'))
+
+from core.utils.sampling import AliasTable  # noqa: E402
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument('--items', type=int, default=500, help='Rewards in the table')
+    parser.add_argument('--draws', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    weights = [rng.choice([1, 1, 1, 2, 5, 10]) for _ in range(args.items)]
+
+    build_time = min(timeit.repeat(lambda: AliasTable(weights), number=1, repeat=5))
+    table = AliasTable(weights)
+    single_time = min(timeit.repeat(lambda: table.sample(rng), number=args.draws, repeat=3)) / args.draws
+    batch_time = min(timeit.repeat(lambda: table.sample_many(args.draws, rng), number=1, repeat=3)) / args.draws
+    print(f"{args.items} items: build {build_time * 1000:.2f} ms, draw {single_time * 1e6:.2f} us, "
+          f"batched draw {batch_time * 1e6:.2f} us")
+
+    draws = table.sample_many(args.draws, random.Random(args.seed))
+    counts = [0] * args.items
+    for i in draws:
+        counts[i] += 1
+    total = sum(weights)
+    worst = max(abs(counts[i] / args.draws - weight / total) / (weight / total) for i, weight in enumerate(weights)
+                if weight == max(weights))
+    print(f"largest relative drop rate error of the heaviest items over {args.draws} draws: {worst:.1%}")
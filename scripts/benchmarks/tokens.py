@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of task and reward token signing and verification: reading the JWK file and building a new JWT
+instance on every call, as the services used to, against the shared core.auth.tokens service that loads the key
+material once, and of reward tokens embedding their reward sets against tokens naming a reward template
+"""
+import json
+import os
+import sys
+import timeit
+from argparse import ArgumentParser
+from datetime import datetime, timezone, timedelta
+
+import jwt
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(dir_path, '../../pps/core-layer/python'))
+
+from core.auth.tokens import tokens, DEFAULT_JWK_PATH  # noqa: E402
+
+REWARD_CLAIMS = {
+    'static': [{'type': 'NEEDS', 'rarity': 'COMMON'}, {'type': 'ZONE', 'rarity': 'COMMON'}],
+    'boxes': [[{'type': 'AVATAR', 'rarity': 'RARE'}, {'type': 'DECORATION', 'rarity': 'COMMON'}]],
+    'index': 12,
+    'area': 'corporality',
+    'reason': 'COMPLETE_OBJECTIVE'
+}
+TEMPLATE_CLAIMS = {
+    'template': 'COMPLETE_OBJECTIVE',
+    'version': 1,
+    'index': 12,
+    'area': 'corporality'
+}
+
+
+def legacy_encode(sub: str, claims: dict) -> str:
+    with open(DEFAULT_JWK_PATH, 'r') as f:
+        jwk = jwt.jwk_from_dict(json.load(f))
+    now = datetime.now(timezone.utc)
+    payload = {
+        'sub': sub,
+        'iat': jwt.utils.get_int_from_datetime(now),
+        'exp': jwt.utils.get_int_from_datetime(now + timedelta(days=7)),
+        **claims
+    }
+    return jwt.JWT().encode(payload, jwk)
+
+
+def legacy_decode(token: str) -> dict:
+    with open(DEFAULT_JWK_PATH, 'r') as f:
+        jwk = jwt.jwk_from_dict(json.load(f))
+    return jwt.JWT().decode(token, jwk)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument('--number', type=int, default=1000, help='Tokens per measure')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    token = tokens.encode_reward('a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1', REWARD_CLAIMS)
+    template_token = tokens.encode_reward('a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1', TEMPLATE_CLAIMS)
+    cases = (
+        ('encode', lambda: legacy_encode('a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1', REWARD_CLAIMS),
+         lambda: tokens.encode_reward('a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1', REWARD_CLAIMS)),
+        ('decode', lambda: legacy_decode(token), lambda: tokens.decode_reward(token)),
+    )
+    for name, legacy, cached in cases:
+        legacy_time = min(timeit.repeat(legacy, number=args.number, repeat=args.repeat)) / args.number
+        cached_time = min(timeit.repeat(cached, number=args.number, repeat=args.repeat)) / args.number
+        print(f"{name}: per call {legacy_time * 1e6:.1f} us, cached {cached_time * 1e6:.1f} us "
+              f"({legacy_time / cached_time:.1f}x)")
+
+    print(f"reward token size: embedded sets {len(token)} bytes, template {len(template_token)} bytes")
+    for name, embedded, template in (
+            ('encode', lambda: tokens.encode_reward('a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1', REWARD_CLAIMS),
+             lambda: tokens.encode_reward('a9e4a6a0-7b8e-4c0e-9a4f-4ab2c2f8e8b1', TEMPLATE_CLAIMS)),
+            ('decode', lambda: tokens.decode_reward(token), lambda: tokens.decode_reward(template_token))):
+        embedded_time = min(timeit.repeat(embedded, number=args.number, repeat=args.repeat)) / args.number
+        template_time = min(timeit.repeat(template, number=args.number, repeat=args.repeat)) / args.number
+        print(f"{name}: embedded sets {embedded_time * 1e6:.1f} us, template {template_time * 1e6:.1f} us")